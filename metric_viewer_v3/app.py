@@ -1,19 +1,41 @@
+import os
+import uuid
 import dash
-from dash import dcc, html
+from dash import dcc, html, DiskcacheManager
 import dash_bootstrap_components as dbc
+import diskcache
+from utils import CACHE_DIR
+from instrumentation import METRICS_ENABLED, instrument_app
 
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True, use_pages=True)
+# Background callbacks (Insights forecasts/correlations) run as local processes,
+# with job state kept on disk - no external broker needed
+background_callback_manager = DiskcacheManager(diskcache.Cache(os.path.join(CACHE_DIR, 'jobs')))
+
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True, use_pages=True,
+                background_callback_manager=background_callback_manager)
 app.title = "Business Metric Viewer"
 server = app.server
+if METRICS_ENABLED:
+    # per-callback latency/payload histograms on /metrics (see instrumentation.py)
+    instrument_app(app, spool_dir=os.path.join(CACHE_DIR, 'metrics-spool'), profile_dir=os.path.join(CACHE_DIR, 'profiles'))
+from data.live_tail import start_live_sources
+if not os.environ.get('METRIC_VIEWER_PRELOADED'):  # a preloading gunicorn master starts them per worker
+    start_live_sources()  # LIVE_TAIL_FILE / LIVE_TAIL_PORT feeds for the Overview live tail, if configured
 from components.navbar import navbar
 
-app.layout = html.Div([
-    dcc.Store(id="saved-timeseries-data", data={}, storage_type="memory"), 
-    dcc.Location(id='url', refresh=False),
-    navbar,
-    dash.page_container
-])
+def serve_layout():
+    # A session id per browser tab; saved series live server-side under it (data/series_store.py).
+    # Both stores persist in sessionStorage, so a reload gets its saved series back from the series db
+    return html.Div([
+        dcc.Store(id="session-id", data=str(uuid.uuid4()), storage_type="session"),
+        dcc.Store(id="saved-timeseries-data", data={}, storage_type="session"), # {label: version token}
+        dcc.Location(id='url', refresh=False),
+        navbar,
+        dash.page_container
+    ])
+
+app.layout = serve_layout
 
 if __name__ == '__main__':
     # app.run(host='localhost',port='5000',debug=True) # for local testing
-    app.run_server(host='0.0.0.0', port=8050, debug=False) # for deployment
\ No newline at end of file
+    app.run_server(host='0.0.0.0', port=8050, debug=False) # for deployment
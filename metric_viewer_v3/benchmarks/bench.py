@@ -0,0 +1,436 @@
+"""
+Benchmarks for the utils.py analytics and the Dash callbacks.
+
+Runs every benchmark over a grid of series lengths and series counts, records wall time
+(best of --repeat runs) and peak traced memory (a separate tracemalloc run), writes the
+results as JSON and optionally compares them with a stored baseline.
+
+Callbacks are benchmarked end to end: synthetic store payloads are posted to Dash's
+callback endpoint through the Flask test client, background callbacks are polled until
+their job finishes. Memory for background callbacks only covers the server process.
+
+Usage (from metric_viewer_v3/):
+    python benchmarks/bench.py --quick                          # small grid
+    python benchmarks/bench.py --output results.json            # full grid, 90 -> 10M points, 1 -> 500 series
+    python benchmarks/bench.py --quick --compare benchmarks/baseline.json
+    python benchmarks/bench.py --quick --save-baseline           # overwrite benchmarks/baseline.json
+    python benchmarks/bench.py --only stats_by_ser,Series_corr
+
+Timings only compare on the same machine: regenerate the baseline locally (--save-baseline
+on a clean checkout) before using --compare, the committed baseline.json is just an example
+from the machine recorded in it. To absorb smaller differences in machine speed and load,
+every run also times a fixed reference workload (numpy/pandas/pure Python, independent of
+the app) and --compare scales the baseline timings by the ratio of the two reference times.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+# keep benchmark caches and background jobs away from the app's own cache directory
+os.environ.setdefault('METRIC_VIEWER_CACHE_DIR', os.path.join(APP_DIR, '.cache', 'bench'))
+
+import numpy as np
+import pandas as pd
+
+import utils
+from utils import MockTimeSeriesParams
+from data.mock_data import generate_timeseries_batch
+
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+
+FULL_GRID = {
+    'lengths': [90, 1_000, 10_000, 100_000, 1_000_000, 10_000_000],
+    'counts': [1, 10, 100, 500],
+}
+QUICK_GRID = {
+    'lengths': [90, 1_000, 10_000],
+    'counts': [1, 10, 50],
+}
+# Largest total number of points (length x count) any case may generate
+MAX_TOTAL_POINTS = 20_000_000
+
+
+# === Synthetic data ===
+_data_cache = {}
+
+
+def make_series(length, n_series, seed=0):
+    """{name: DataFrame with 'Date' and 'Value'} of n_series mock series starting 2000-01-01."""
+    key = (length, n_series, seed)
+    if key not in _data_cache:
+        params = MockTimeSeriesParams(length=length, random_seed=seed)
+        # daily dates run past pandas' datetime64[ns] range after ~260 years, use minutes beyond that
+        freq = 'D' if length <= 90_000 else 'min'
+        trends = ['increasing', 'decreasing', 'cyclical', 'random', 'stable']
+        dates, values = generate_timeseries_batch(
+            n_series, [trends[i % len(trends)] for i in range(n_series)], 'low', params,
+            start_date=pd.Timestamp('2000-01-01'), seed=seed, vary_base_value=True, freq=freq,
+        )
+        _data_cache.clear()  # keep only one grid point in memory
+        _data_cache[key] = {
+            f'metric_{i}': pd.DataFrame({'Date': dates, 'Value': values[i]}) for i in range(n_series)
+        }
+    return _data_cache[key]
+
+
+def combined(series):
+    return pd.concat([df.assign(Timeseries=name) for name, df in series.items()], ignore_index=True)
+
+
+# === Benchmarks ===
+# Each entry: setup(length, n_series) -> callable, plus the grid limits it supports.
+def bench_stats_by_ser(length, n_series):
+    df = combined(make_series(length, n_series))
+    return lambda: utils.stats_by_ser(df.copy())
+
+
+def bench_tf_label_to_tuple(length, n_series):
+    df = make_series(length, 1)['metric_0']
+    return lambda: (utils.tf_label_to_tuple(df, 'Last 28 days'), utils.tf_label_to_tuple(df, 'Last 56 days'))
+
+
+def bench_timeframe_corr(length, n_series):
+    df = make_series(length, 1)['metric_0']
+    timeframes, _ = utils.tf_label_to_tuple(df.copy(), 'Last 56 days')
+    return lambda: utils.Timeframe_corr(df, timeframes)
+
+
+def bench_series_corr(length, n_series):
+    series = make_series(length, n_series)
+    _, overall = utils.tf_label_to_tuple(series['metric_0'].copy(), 'Last 56 days')
+    return lambda: utils.Series_corr(series, overall, 'Last 56 days')
+
+
+def bench_forc(length, n_series):
+    series = make_series(length, n_series)
+
+    def run():
+        utils.FORECAST_CACHE.clear()
+        return utils.forecast_many(series)
+    return run
+
+
+def bench_forc_ets(length, n_series):
+    series = make_series(length, n_series)
+
+    def run():
+        utils.FORECAST_CACHE.clear()
+        return utils.forecast_ets_many(series)
+    return run
+
+
+class CallbackClient:
+    """Posts callback requests to the Dash app through the Flask test client."""
+    def __init__(self):
+        import app as app_module
+        self.app = app_module.app
+        self.client = app_module.server.test_client()
+        self.client.get('/')  # runs Dash's server setup
+
+    def call(self, output, outputs, inputs, state=(), changed=None):
+        body = {
+            'output': output, 'outputs': outputs, 'inputs': inputs, 'state': list(state),
+            'changedPropIds': changed or [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+        }
+        response = self.client.post('/_dash-update-component', json=body)
+        if response.status_code != 200:
+            return response.status_code
+        payload = response.get_json()
+        while 'cacheKey' in payload:  # background callback: poll its job
+            time.sleep(0.02)
+            response = self.client.post(
+                f"/_dash-update-component?cacheKey={payload['cacheKey']}&job={payload['job']}", json=body)
+            if response.status_code != 200:
+                return response.status_code
+            polled = response.get_json()
+            if 'response' in polled or 'done' in polled:
+                return polled
+        return payload
+
+
+_client = None
+
+
+def callback_client():
+    global _client
+    if _client is None:
+        _client = CallbackClient()
+    return _client
+
+
+def _saved_tokens(series):
+    from data.series_store import SERIES_STORE
+    return SERIES_STORE.put_many('bench', series)
+
+
+def bench_cb_update_figure(length, n_series):
+    client = callback_client()
+    from callbacks.overview_callbacks import store_session_series
+    token = store_session_series('bench', make_series(length, 1)['metric_0'])
+    inputs = [
+        {'id': 'session-data', 'property': 'data', 'value': token},
+        {'id': 'apply-changes-btn', 'property': 'n_clicks', 'value': 0},
+        {'id': 'overview-figure', 'property': 'relayoutData', 'value': None},
+        {'id': 'live-switch', 'property': 'value', 'value': False},
+    ]
+    state = [{'id': 'col-store', 'property': 'data', 'value': []},
+             {'id': 'session-id', 'property': 'data', 'value': 'bench'}]
+    return lambda: client.call('overview-figure.figure', {'id': 'overview-figure', 'property': 'figure'},
+                               inputs, state)
+
+
+def bench_cb_timeseries_corr(length, n_series):
+    client = callback_client()
+    from callbacks.insights_callbacks import FIGURE_CACHE
+    tokens = _saved_tokens(make_series(length, n_series))
+    inputs = [
+        {'id': 'saved-timeseries-data', 'property': 'data', 'value': tokens},
+        {'id': 'timeframe-dropdown', 'property': 'value', 'value': '56d'},
+    ]
+    state = [{'id': 'session-id', 'property': 'data', 'value': 'bench'}]
+
+    def run():
+        FIGURE_CACHE.clear()  # measure building the figure, cache hits are cb_corr_cached
+        return client.call('timeseries-corr-plot.figure', {'id': 'timeseries-corr-plot', 'property': 'figure'},
+                           inputs, state)
+    return run
+
+
+def bench_cb_timeframe_corr(length, n_series):
+    client = callback_client()
+    from callbacks.insights_callbacks import FIGURE_CACHE
+    tokens = _saved_tokens(make_series(length, n_series))
+    inputs = [
+        {'id': 'saved-timeseries-data', 'property': 'data', 'value': tokens},
+        {'id': 'timeseries-dropdown', 'property': 'value', 'value': 'metric_0'},
+        {'id': 'timeframe-dropdown', 'property': 'value', 'value': '56d'},
+    ]
+    state = [{'id': 'session-id', 'property': 'data', 'value': 'bench'}]
+
+    def run():
+        FIGURE_CACHE.clear()
+        return client.call('timeframe-corr-plot.figure', {'id': 'timeframe-corr-plot', 'property': 'figure'},
+                           inputs, state)
+    return run
+
+
+def bench_cb_corr_cached(length, n_series):
+    # switching the timeframe dropdown back and forth once both figures are cached
+    client = callback_client()
+    tokens = _saved_tokens(make_series(length, n_series))
+    state = [{'id': 'session-id', 'property': 'data', 'value': 'bench'}]
+
+    def call(timeframe):
+        inputs = [
+            {'id': 'saved-timeseries-data', 'property': 'data', 'value': tokens},
+            {'id': 'timeframe-dropdown', 'property': 'value', 'value': timeframe},
+        ]
+        return client.call('timeseries-corr-plot.figure', {'id': 'timeseries-corr-plot', 'property': 'figure'},
+                           inputs, state)
+    call('28d'), call('56d')
+    return lambda: (call('28d'), call('56d'))
+
+
+def bench_cb_forecast(length, n_series):
+    client = callback_client()
+    tokens = _saved_tokens(make_series(length, n_series))
+    inputs = [
+        {'id': 'saved-timeseries-data', 'property': 'data', 'value': tokens},
+        {'id': 'show-historical-switch', 'property': 'value', 'value': True},
+        {'id': 'forecast-engine-dropdown', 'property': 'value', 'value': 'sarimax'},
+    ]
+    state = [{'id': 'session-id', 'property': 'data', 'value': 'bench'}]
+
+    def run():
+        utils.FORECAST_CACHE.clear()
+        return client.call('forecast-plot.figure', {'id': 'forecast-plot', 'property': 'figure'}, inputs, state)
+    return run
+
+
+BENCHMARKS = {
+    # name: (setup, max length, max series count)
+    'stats_by_ser': (bench_stats_by_ser, None, None),
+    'tf_label_to_tuple': (bench_tf_label_to_tuple, None, 1),
+    'Timeframe_corr': (bench_timeframe_corr, None, 1),
+    'Series_corr': (bench_series_corr, None, None),
+    'forc': (bench_forc, 5_000, 20),
+    'forc_ets': (bench_forc_ets, None, None),
+    'cb_update_figure': (bench_cb_update_figure, 1_000_000, 1),
+    'cb_timeseries_corr': (bench_cb_timeseries_corr, 100_000, None),
+    'cb_timeframe_corr': (bench_cb_timeframe_corr, 100_000, 1),
+    'cb_corr_cached': (bench_cb_corr_cached, 100_000, None),
+    'cb_forecast': (bench_cb_forecast, 5_000, 20),
+}
+
+
+# === Runner ===
+def reference_workload():
+    # Fixed mix of the work the benchmarks spend their time in: vectorized numpy, pandas
+    # rolling/groupby and an interpreted loop. Never changes with the app code.
+    rng = np.random.default_rng(0)
+    values = rng.standard_normal(200_000)
+    np.sort(values)
+    np.corrcoef(values.reshape(50, -1))
+    series = pd.Series(values, index=pd.date_range('2000-01-01', periods=len(values), freq='min'))
+    series.rolling(60).mean()
+    series.groupby(series.index.date).agg(['mean', 'std'])
+    sum(i * i for i in range(100_000))
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def run(grid, names, repeat):
+    results = []
+    for name in names:
+        setup, max_length, max_count = BENCHMARKS[name]
+        for length in grid['lengths']:
+            if max_length is not None and length > max_length:
+                continue
+            for n_series in grid['counts']:
+                if max_count is not None and n_series > max_count:
+                    continue
+                if length * n_series > MAX_TOTAL_POINTS:
+                    continue
+                try:
+                    fn = setup(length, n_series)
+                    seconds, peak = measure(fn, repeat)
+                    error = None
+                except Exception as e:
+                    seconds, peak, error = None, None, repr(e)
+                result = {'benchmark': name, 'length': length, 'n_series': n_series,
+                          'seconds': seconds, 'peak_bytes': peak, 'error': error}
+                results.append(result)
+                print(format_result(result), flush=True)
+    return results
+
+
+def format_result(r):
+    if r['error']:
+        return f"{r['benchmark']:<20} len={r['length']:>10,} n={r['n_series']:>4}  ERROR {r['error']}"
+    return (f"{r['benchmark']:<20} len={r['length']:>10,} n={r['n_series']:>4}  "
+            f"{r['seconds'] * 1000:>10.2f} ms  {r['peak_bytes'] / 2**20:>9.2f} MB")
+
+
+def speed_ratio(report, baseline):
+    """Reference workload time of 'report' over the baseline's (1.0 if either lacks it)."""
+    if not report.get('reference_seconds') or not baseline.get('reference_seconds'):
+        return 1.0
+    return report['reference_seconds'] / baseline['reference_seconds']
+
+
+def compare(results, baseline, tolerance, ratio=1.0):
+    """
+    Returns the results slower (or using more memory) than tolerance x the baseline, baseline
+    timings scaled by 'ratio' (see speed_ratio) first.
+    """
+    base = {(b['benchmark'], b['length'], b['n_series']): b for b in baseline['results']}
+    regressions = []
+    for r in results:
+        b = base.get((r['benchmark'], r['length'], r['n_series']))
+        if b is None or r['error'] or b['error']:
+            continue
+        expected = b['seconds'] * ratio
+        # ignore sub-millisecond timings, they are mostly noise
+        if r['seconds'] > tolerance * expected and r['seconds'] - expected > 1e-3:
+            regressions.append((r, 'time', expected, r['seconds']))
+        if r['peak_bytes'] > tolerance * b['peak_bytes'] and r['peak_bytes'] - b['peak_bytes'] > 2**20:
+            regressions.append((r, 'memory', b['peak_bytes'], r['peak_bytes']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='small grid for quick checks')
+    parser.add_argument('--lengths', help='comma-separated series lengths (overrides the grid)')
+    parser.add_argument('--counts', help='comma-separated series counts (overrides the grid)')
+    parser.add_argument('--only', help='comma-separated benchmark names')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='allowed slowdown factor')
+    parser.add_argument('--save-baseline', action='store_true', help=f'also write {BASELINE_PATH}')
+    args = parser.parse_args(argv)
+
+    grid = dict(QUICK_GRID if args.quick else FULL_GRID)
+    if args.lengths:
+        grid['lengths'] = [int(x) for x in args.lengths.split(',')]
+    if args.counts:
+        grid['counts'] = [int(x) for x in args.counts.split(',')]
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    warnings.simplefilter('ignore')
+    # reference timed before and after the benchmarks, so that load changing mid-run shows up in it
+    reference = [measure(reference_workload, args.repeat)[0]]
+    results = run(grid, names, args.repeat)
+    reference.append(measure(reference_workload, args.repeat)[0])
+    print(f'reference workload   {min(reference) * 1000:.2f} ms')
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        **machine_info(),
+        'reference_seconds': min(reference),
+        'grid': grid,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f'Results written to {args.output}')
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f'Baseline written to {BASELINE_PATH}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        differs = [k for k, v in machine_info().items() if k in baseline and baseline[k] != v]
+        if differs:
+            print(f"WARNING baseline was recorded on a different setup ({', '.join(differs)}); "
+                  f"regenerate it locally with --save-baseline")
+        ratio = speed_ratio(report, baseline)
+        print(f'Reference workload {ratio:.2f}x the baseline\'s, baseline timings scaled by it')
+        regressions = compare(results, baseline, args.tolerance, ratio)
+        for r, kind, before, after in regressions:
+            print(f"REGRESSION {kind}: {r['benchmark']} len={r['length']} n={r['n_series']}: {before:.4g} -> {after:.4g}")
+        if regressions:
+            return 1
+        print(f'No regressions against {args.compare} (tolerance {args.tolerance}x)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Import-time budgets for worker cold start.
+
+Imports each module in a fresh interpreter with `python -X importtime`, reports the
+cumulative import time (best of --repeat runs) and the slowest modules it pulled in, and
+fails (exit status 1) when a module is over its budget or imports one of the heavy
+analytics packages that must only be loaded on first use.
+
+Usage (from metric_viewer_v3/):
+    python benchmarks/import_time.py                    # check the budgets below
+    python benchmarks/import_time.py --top 25           # show more of the slowest imports
+    python benchmarks/import_time.py --scale 2          # slow machine: double every budget
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+
+# Cumulative import time budgets in ms, with headroom over a clean checkout (measured best of
+# 3 on a 1-CPU box: utils ~0.4-0.7 s, app ~1.3-1.8 s; scale them for slower machines).
+# 'app' is what a gunicorn worker imports before it can serve the Overview page;
+# statsmodels alone would add ~1.5 s to it.
+BUDGETS_MS = {
+    'utils': 1_000,
+    'app': 2_500,
+}
+# Loaded on first use (utils._sarimax, gunicorn.conf.py warm-up), never at import time
+LAZY_PACKAGES = ('statsmodels', 'sklearn', 'scipy')
+
+
+def import_times(module):
+    """{module name: (self us, cumulative us)} for 'import module' in a fresh interpreter."""
+    env = dict(os.environ)
+    # keep the import away from the app's own caches and don't start live-tail sources
+    env.setdefault('METRIC_VIEWER_CACHE_DIR', os.path.join(APP_DIR, '.cache', 'bench'))
+    env.pop('LIVE_TAIL_FILE', None), env.pop('LIVE_TAIL_PORT', None)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=APP_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{proc.stderr[-2000:]}')
+    times = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list per module')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget by this factor')
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module, budget in BUDGETS_MS.items():
+        runs = [import_times(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda t: t[module][1])
+        total_ms = best[module][1] / 1000
+        budget *= args.scale
+        status = 'ok' if total_ms <= budget else 'OVER BUDGET'
+        print(f'{module:<10} {total_ms:9.1f} ms  (budget {budget:,.0f} ms)  {status}')
+        for name, (self_us, _) in sorted(best.items(), key=lambda kv: -kv[1][0])[:args.top]:
+            print(f'    {self_us / 1000:8.1f} ms  {name}')
+        if total_ms > budget:
+            failures.append(f'{module}: {total_ms:.0f} ms > {budget:.0f} ms')
+        eager = sorted({name.split('.')[0] for name in best} & set(LAZY_PACKAGES))
+        if eager:
+            failures.append(f"{module}: imports {', '.join(eager)} at import time")
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,7 +12,67 @@ import pandas as pd
 import uuid
 import base64
 import io
-from utils import tf_label_to_tuple, Timeframe_corr, Series_corr, forc, stats_by_ser, TIMEFRAME_COLORS
+import hashlib
+from data.series_store import SERIES_STORE
+from utils import tf_label_to_tuple, Timeframe_corr, corr_frame, select_forecast_engine, period_stats_frame, TIMEFRAME_COLORS
+from utils import downsample_frame, MAX_PLOT_POINTS, summarize_backtest, make_cache
+
+# Finished correlation figures (as plotly JSON dicts) by (kind, series version tokens, timeframe).
+# Version tokens are content hashes, so flipping dropdowns back and forth or re-saving a series
+# unchanged is a cache hit; disk-backed so the background jobs share it
+FIGURE_CACHE = make_cache('figures', ttl=6 * 3600)
+
+
+def figure_key(kind, *parts):
+    return f'{kind}:' + hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def corr_heatmap(corr_df=None, title=None):
+    """
+    The figure px.imshow(corr_df, text_auto=".1f") draws, built directly from graph_objects
+    (Plotly Express figure construction costs more than the correlations themselves).
+    No corr_df gives the empty [[0]] placeholder.
+    """
+    if corr_df is None:
+        heatmap = go.Heatmap(z=[[0]], coloraxis='coloraxis',
+                             hovertemplate='x: %{x}<br>y: %{y}<br>color: %{z}<extra></extra>')
+    else:
+        heatmap = go.Heatmap(z=corr_df.to_numpy(), x=corr_df.columns.to_numpy(), y=corr_df.index.to_numpy(),
+                             texttemplate='%{z:.1f}', coloraxis='coloraxis',
+                             hovertemplate='x: %{x}<br>y: %{y}<br>color: %{z}<extra></extra>')
+    fig = go.Figure(heatmap)
+    fig.update_layout(
+        title=title,
+        xaxis=dict(scaleanchor='y', constrain='domain'),
+        yaxis=dict(autorange='reversed', constrain='domain'),
+        coloraxis=dict(colorscale=px.colors.sequential.Plasma),
+        margin=dict(t=60),
+    )
+    return fig
+
+def forecast_placeholder():
+    placeholder_fig = go.Figure()
+    placeholder_fig.update_layout(
+        title = "Timeseries Forecast",
+        xaxis_title="X-axis",
+        yaxis_title="Y-axis",
+        annotations=[
+            dict(
+                text="Graph will appear here",
+                x=0.5, y=0.5,
+                xref="paper", yref="paper",
+                showarrow=False,
+                font=dict(size=16, color="gray")
+            )
+        ]
+    )
+    return placeholder_fig
+
+
+def progress_value(done, total, action):
+    """(percent, label) for a progress bar, 100% when there was nothing to do."""
+    return (100 * done / total if total else 100, f"{action} {done}/{total}")
+
 
 @dash.callback(
     Output("initial-message",'children'),
@@ -25,81 +85,116 @@ def initial_msg(data):
         msg = []
     return msg
 
+# The heavy Insights callbacks run as background jobs (see background_callback_manager in app.py),
+# so they don't hold a Flask worker. A job is cancelled when its inputs change or the user leaves the page.
 @dash.callback(
     Output("timeframe-corr-plot", "figure"),
     Input("saved-timeseries-data", "data"),
     Input("timeseries-dropdown", "value"),
     Input("timeframe-dropdown", "value"),
+    State("session-id", "data"),
+    background=True,
+    cancel=[Input("url", "pathname")],
 )
-def update_timeframe_corr_plot(data, timeseries, timeframe):
+def update_timeframe_corr_plot(data, timeseries, timeframe, session_id):
     if data is None or not isinstance(data, dict) or len(data) == 0 or timeseries not in data:
-        return px.imshow([[0]]) # Return an empty figure, or you can return a loading figure
+        return corr_heatmap() # Return an empty figure, or you can return a loading figure
+
+    key = figure_key('timeframe-corr', timeseries, data[timeseries], timeframe)
+    fig = FIGURE_CACHE.get(key)
+    if fig is not None:
+        return fig
 
-    df = pd.DataFrame(data[timeseries]) # series_df
-    df['Date'] = pd.to_datetime(df['Date'])
     tf_label = 'Last 28 days' if timeframe == '28d' else 'Last 56 days'
+    # only the timeframe's days are read from the store, however long the history is
+    df = SERIES_STORE.tail(session_id, timeseries, data[timeseries], days=int(tf_label.split(' ')[1])) # series_df
+    if df is None or len(df) == 0:
+        return corr_heatmap()
     tf_tuple, _ = tf_label_to_tuple(df,tf_label)
     corr_df = Timeframe_corr(df, tf_tuple)
-    fig = px.imshow(corr_df, text_auto=".1f")
-    fig.update_layout(title=f"Timeframe correlation for {timeseries}, {tf_label}")
+    fig = corr_heatmap(corr_df, title=f"Timeframe correlation for {timeseries}, {tf_label}").to_plotly_json()
+    FIGURE_CACHE.set(key, fig)
     return fig
 
 @dash.callback(
     Output("timeseries-corr-plot", "figure"),
     Input("saved-timeseries-data", "data"),
     Input("timeframe-dropdown", "value"),
+    State("session-id", "data"),
+    background=True,
+    cancel=[Input("url", "pathname")],
 )
-def update_timeseries_corr_plot(data, timeframe):
+def update_timeseries_corr_plot(data, timeframe, session_id):
     if data is None or not isinstance(data, dict) or len(data) == 0:
-        return px.imshow([[0]]) # Return an empty figure, or you can return a loading figure
+        return corr_heatmap() # Return an empty figure, or you can return a loading figure
+
+    # the saved series' order matters: the first one decides where the timeframe ends
+    key = figure_key('timeseries-corr', tuple(data.items()), timeframe)
+    fig = FIGURE_CACHE.get(key)
+    if fig is not None:
+        return fig
 
-    ts_dict = {}
-    for timeseries in data.keys():
-        ts_dict.update({timeseries:pd.DataFrame(data[timeseries])})
     tf_label = 'Last 28 days' if timeframe == '28d' else 'Last 56 days'
-    _, overall_tf_tuple = tf_label_to_tuple(ts_dict[list(ts_dict.keys())[0]],tf_label)
+    num_days = int(tf_label.split(' ')[1])
+    # the timeframe ends at the last date of the first saved series that is still available
+    head = None
+    for label, version in data.items():
+        head = SERIES_STORE.tail(session_id, label, version, days=num_days)
+        if head is not None and len(head):
+            break
+    if head is None or len(head) == 0:
+        return corr_heatmap()
+    _, overall_tf_tuple = tf_label_to_tuple(head,tf_label)
     # get overall tf tuple for ex. start and end dates for either 
-    corr_df = Series_corr(ts_dict, overall_tf_tuple, tf_label)
-    fig = px.imshow(corr_df, text_auto=".1f")
-    fig.update_layout(title=f"Timeseries correlation for {tf_label}")
+    _, tf_start, tf_end = overall_tf_tuple[0]
+    # correlation sums carried over from the previous window, only new/leaving days are read
+    names, sums = SERIES_STORE.window_corr(session_id, data, tf_start, tf_end)
+    corr_df = corr_frame(sums, names)
+    fig = corr_heatmap(corr_df, title=f"Timeseries correlation for {tf_label}").to_plotly_json()
+    FIGURE_CACHE.set(key, fig)
     return fig
 
 @dash.callback(
     Output("forecast-plot", "figure"),
     Input("saved-timeseries-data", "data"),
     Input('show-historical-switch','value'),
+    Input("forecast-engine-dropdown", "value"),
+    State("session-id", "data"),
+    background=True,
+    progress=[Output("forecast-progress", "value"), Output("forecast-progress", "label")],
+    running=[
+        (Output("forecast-progress", "style"), {"display": "flex", "margin-bottom": "10px"}, {"display": "none"}),
+    ],
+    cancel=[Input("url", "pathname")],
 )
-def update_forecast_plot(data,history_switch):
+def update_forecast_plot(set_progress, data, history_switch, engine_name, session_id):
     if data is None or not isinstance(data, dict) or len(data) == 0:
-        placeholder_fig = go.Figure()
-        placeholder_fig.update_layout(
-            title = "Timeseries Forecast",
-            xaxis_title="X-axis",
-            yaxis_title="Y-axis",
-            annotations=[
-                dict(
-                    text="Graph will appear here",
-                    x=0.5, y=0.5,
-                    xref="paper", yref="paper",
-                    showarrow=False,
-                    font=dict(size=16, color="gray")
-                )
-            ]
-        )
-        return placeholder_fig
-
-    ts_dict = {}
-    forc_dict = {}
-    for timeseries in data.keys():
-        df = pd.DataFrame(data[timeseries])
-        ts_dict.update({timeseries:df})
-        forc_dict.update({timeseries:forc(df)})
+        return forecast_placeholder()
+
+    ts_dict = SERIES_STORE.get_many(session_id, data)
+    if not ts_dict:
+        # saved tokens the store no longer has (restart, pruned session, another worker without a db)
+        return forecast_placeholder()
+    # 'auto' falls back to exponential smoothing when SARIMAX would blow the latency budget
+    engine = select_forecast_engine(engine_name or 'auto', ts_dict)
+    # cached by series content, only changed series are refitted and
+    # series that grew by appends are extended from their previous fit
+    forc_dict = engine.forecast_many(
+        ts_dict,
+        on_done=lambda done, total: set_progress(progress_value(done, total, "Forecasting")),
+        appended=SERIES_STORE.appended_since(session_id, data),
+    )
+    if not forc_dict:
+        raise PreventUpdate
     
     combined_df = pd.concat(
         [df.assign(Timeseries=name) for name, df in ts_dict.items()],
         ignore_index=True
         )    
-    stats, st_df = stats_by_ser(combined_df) # make the stats before adding forecasting
+    # period means, updated from the appended rows only when a series grew
+    stats, spans = period_stats_frame({
+        name: SERIES_STORE.period_stats(session_id, name, data[name]) for name in ts_dict
+    })
     stats_text = stats.round(1).to_string()
     stats_text = stats_text.replace("\n", "<br>")
     
@@ -115,19 +210,28 @@ def update_forecast_plot(data,history_switch):
     if history_switch == False:
         recent_history_date = forc_start - pd.Timedelta('21d')
         combined_df = combined_df[combined_df['Date']>=recent_history_date]
+    # long histories are min-max downsampled per series and drawn with WebGL
+    long_history = combined_df.groupby('Timeseries').size().max() > MAX_PLOT_POINTS
+    if long_history:
+        combined_df = pd.concat(
+            [downsample_frame(group) for _, group in combined_df.groupby('Timeseries', sort=False)],
+            ignore_index=True
+        )
 
     fig = px.line(
             combined_df,
             x="Date",
             y="Value",
             color="Timeseries",   # Different colors for each timeseries
-            title="Timeseries Forecast"
+            title=f"Timeseries Forecast ({engine.label})",
+            render_mode='webgl' if long_history else 'auto'
         )
     
     for period in stats.columns[:2]:
+        if period not in spans:
+            continue
         x_color = TIMEFRAME_COLORS[period]
-        x_start = st_df.loc[st_df[period]==1,'Date'].iloc[0]
-        x_end = st_df.loc[st_df[period]==1,'Date'].iloc[-1]
+        x_start, x_end = spans[period]
         fig.add_vrect(
                         x0=x_start,
                         x1=x_end,
@@ -168,6 +272,43 @@ def update_forecast_plot(data,history_switch):
     return fig
 
 
+@dash.callback(
+    Output("backtest-table", "children"),
+    Input("run-backtest-btn", "n_clicks"),
+    State("saved-timeseries-data", "data"),
+    State("forecast-engine-dropdown", "value"),
+    State("session-id", "data"),
+    background=True,
+    progress=[Output("backtest-progress", "value"), Output("backtest-progress", "label")],
+    running=[
+        (Output("run-backtest-btn", "disabled"), True, False),
+        (Output("backtest-progress", "style"), {"display": "flex", "margin-bottom": "10px"}, {"display": "none"}),
+    ],
+    cancel=[Input("url", "pathname")],
+    prevent_initial_call=True,
+)
+def run_backtest(set_progress, n_clicks, data, engine_name, session_id):
+    if not data:
+        return html.Div("Save at least one timeseries on the Overview page to run a backtest.")
+
+    ts_dict = SERIES_STORE.get_many(session_id, data)
+    if not ts_dict:
+        return html.Div("The saved timeseries are no longer available, save them again on the Overview page.")
+    # score the model the forecast plot shows: same engine choice, same seasonal order
+    engine = select_forecast_engine(engine_name or 'auto', ts_dict)
+    tables, errors = engine.backtest_many(
+        ts_dict,
+        on_done=lambda done, total: set_progress(progress_value(done, total, "Backtesting")),
+    )
+    summary = summarize_backtest(tables).round(2)
+    children = [html.Div(f"Backtest of the {engine.label} forecast", style={"margin-bottom": "5px"})] if tables else []
+    if len(summary):
+        children.append(dbc.Table.from_dataframe(summary, striped=True, bordered=True, hover=True, size="sm"))
+    for name, msg in errors.items():
+        children.append(html.Div(f"{name}: {msg}", style={"color": "gray"}))
+    return children or html.Div("Backtest failed for all timeseries.")
+
+
 @dash.callback(
     Output("timeseries-dropdown", "options"),
     Output("timeseries-dropdown", "value"),
@@ -11,7 +11,10 @@ import uuid
 import base64
 import io
 from data.mock_data import generate_timeseries
-from utils import process_upload_data
+from utils import process_upload_data, split_upload_frame, read_csv_upload, encode_frame, decode_frame
+from utils import downsample_frame, MAX_PLOT_POINTS
+from data.series_store import SERIES_STORE
+from data.live_tail import LIVE_FEED, LIVE_BUFFER_SIZE
 import plotly.graph_objects as go
 import plotly.express as px
 
@@ -69,6 +72,7 @@ def make_timeframe_cell(col_id, timeframe_name=""):
                 type="text",
                 placeholder="Timeframe Name",
                 value=timeframe_name,
+                debounce=True,  # update on Enter/blur, not on every keystroke
                 style={"width": "250px", "margin": "0px 10px"},
             ),
             # Delete button is placed in the header row (to keep it consistent)
@@ -93,7 +97,9 @@ def make_color_cell(col_id, color="#E3F2FD"):
     )
 
 
-def make_date_cell(col_id, start_date=DefaultParams().global_timeframe[0], end_date=DefaultParams().global_timeframe[-1]):
+def make_date_cell(col_id, start_date=None, end_date=None):
+    if start_date is None or end_date is None:
+        start_date, end_date = DefaultParams().global_timeframe
     return html.Td(
         dcc.DatePickerRange(
             id={"type": "date-picker-range", "index": col_id},
@@ -104,7 +110,36 @@ def make_date_cell(col_id, start_date=DefaultParams().global_timeframe[0], end_d
     )
 
 
+def make_table_rows(col_data):
+    # Build table rows: one <tr> per field, one cell per timeframe column
+    return [
+        html.Tr(
+            [html.Th("Timeframe Name")]
+            + [make_timeframe_cell(c["id"], c["timeframe_name"]) for c in col_data]
+        ),
+        html.Tr(
+            [html.Th("Color")]
+            + [make_color_cell(c["id"], c["color"]) for c in col_data]
+        ),
+        html.Tr(
+            [html.Th("Date Range")]
+            + [make_date_cell(c["id"], c["start_date"], c["end_date"]) for c in col_data]
+        ),
+    ]
+
+
+# Which col-store field each editable component/property maps to
+COLUMN_FIELDS = {
+    ("timeframe-name", "value"): "timeframe_name",
+    ("color-dropdown", "value"): "color",
+    ("date-picker-range", "start_date"): "start_date",
+    ("date-picker-range", "end_date"): "end_date",
+}
+
+
 # === Callback ===
+# Edits are applied with dash.Patch: adding/deleting a timeframe only touches that column's
+# cells and an edit only touches its col-store entry, so the cost doesn't grow with the number of columns.
 @dash.callback(
     Output("table-body", "children"),
     Output("col-store", "data"),
@@ -122,54 +157,65 @@ def update_table(add_clicks, delete_clicks, timeframe_names, colors, start_dates
 
     if col_data is None:
         col_data = []
+    patched_rows = dash.Patch()
+    patched_store = dash.Patch()
 
     # Add column
     if triggered == "add-col-btn":
-        new_id = str(uuid.uuid4())
-        col_data.append({
-            "id": new_id,
+        start_date, end_date = DefaultParams().global_timeframe
+        new_col = {
+            "id": str(uuid.uuid4()),
             "timeframe_name": "",
             "color": "#E3F2FD",
-            "start_date": DefaultParams().global_timeframe[0],
-            "end_date": DefaultParams().global_timeframe[-1]
-        })
-
-    # Delete column
-    elif isinstance(triggered, dict) and triggered.get("type") == "delete-col-btn":
-        col_id = triggered["index"]
-        col_data = [c for c in col_data if c["id"] != col_id]
-
-    # Update column data
-    elif triggered and any(t in triggered["type"] for t in ["timeframe-name", "color-dropdown", "date-picker-range"]):
-        for i in range(len(col_data)):
-            col_data[i]["timeframe_name"] = timeframe_names[i]
-            col_data[i]["color"] = colors[i]
-            col_data[i]["start_date"] = start_dates[i]
-            col_data[i]["end_date"] = end_dates[i]
-
-    # Build table rows: one <tr> per field
-    rows = [
-        html.Tr(
-            [html.Th("Timeframe Name")]
-            + [make_timeframe_cell(c["id"], c["timeframe_name"]) for c in col_data]
-        ),
-        html.Tr(
-            [html.Th("Color")]
-            + [make_color_cell(c["id"], c["color"]) for c in col_data]
-        ),
-        html.Tr(
-            [html.Th("Date Range")]
-            + [make_date_cell(c["id"], c["start_date"], c["end_date"]) for c in col_data]
-        ),
-    ]
+            "start_date": start_date,
+            "end_date": end_date
+        }
+        for row, cell in enumerate([
+            make_timeframe_cell(new_col["id"], new_col["timeframe_name"]),
+            make_color_cell(new_col["id"], new_col["color"]),
+            make_date_cell(new_col["id"], new_col["start_date"], new_col["end_date"]),
+        ]):
+            patched_rows[row]["props"]["children"].append(cell)
+        patched_store.append(new_col)
+        return patched_rows, patched_store
 
-    return rows, col_data
+    if not isinstance(triggered, dict):
+        raise PreventUpdate
+    col_ids = [c["id"] for c in col_data]
+
+    # Delete column (cell i + 1 in every row, after the header cell)
+    if triggered["type"] == "delete-col-btn":
+        if triggered["index"] not in col_ids or not ctx.triggered[0]["value"]:
+            raise PreventUpdate  # unknown column, or button just rendered, not clicked
+        i = col_ids.index(triggered["index"])
+        for row in range(3):
+            del patched_rows[row]["props"]["children"][i + 1]
+        del patched_store[i]
+        return patched_rows, patched_store
+
+    # Update column data: the inputs already show the new values, only the store changes.
+    # Several inputs can fire in one round trip (a debounced name along with a color or
+    # date edit), so every one of them is patched in
+    updated = False
+    for trigger in ctx.triggered:
+        component = ctx.triggered_prop_ids.get(trigger["prop_id"])
+        if not isinstance(component, dict) or component.get("index") not in col_ids:
+            continue
+        field = COLUMN_FIELDS.get((component["type"], trigger["prop_id"].rsplit(".", 1)[-1]))
+        if field is None:
+            continue
+        patched_store[col_ids.index(component["index"])][field] = trigger["value"]
+        updated = True
+    if not updated:
+        raise PreventUpdate
+    return dash.no_update, patched_store
 
 
 
 # store the uploaded csv data
 @dash.callback(
     Output('uploaded-data-store', 'data'),
+    Output('upload-message', 'children'),
     Input('file-upload', 'contents'),
     State('file-upload', 'filename'),
     prevent_initial_call=True,
@@ -182,43 +228,99 @@ def store_uploaded_data(uploaded_contents, filename):
         content_type, content_string = uploaded_contents.split(',')
         decoded = base64.b64decode(content_string)
         if 'csv' in filename:
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+            df, error_message = read_csv_upload(decoded)
+            if error_message:
+                print("Upload error:", error_message)
+                return None, f"Upload error: {error_message}"
         elif 'xls' in filename:
             df = pd.read_excel(io.BytesIO(decoded))
         else:
-            return None
+            return None, "Upload error: only CSV and Excel files are supported."
         
         print('File uploaded:', filename)
-        return df.to_dict('records')
+        dropped = df.attrs.get('dropped_rows', 0)
+        message = f"Skipped {dropped} row{'s' if dropped != 1 else ''} without a valid date." if dropped else ""
+        return encode_frame(df), message
     except Exception as e:
         print("Upload error:", e)
+        return None, f"Upload error: {e}"
+
+@dash.callback(
+    Output('saved-timeseries-data', 'data', allow_duplicate=True),
+    Input('uploaded-data-store', 'data'),
+    State('saved-timeseries-data', 'data'),
+    State('session-id', 'data'),
+    prevent_initial_call=True,
+)
+def register_uploaded_metrics(uploaded_data, saved_data, session_id):
+    # Wide (date + N metrics) or long (date, metric, value) uploads are saved in one go,
+    # one saved timeseries per metric
+    if uploaded_data is None:
+        raise PreventUpdate
+    try:
+        series, error_message = split_upload_frame(decode_frame(uploaded_data))
+    except Exception as e:
+        series, error_message = None, str(e)
+    if error_message or len(series) < 2:
+        raise PreventUpdate
+    saved_data = dict(saved_data or {})
+    # metrics already saved are appended to when the upload only adds new days
+    known = {name: df for name, df in series.items() if name in saved_data}
+    saved_data.update(SERIES_STORE.put_many(session_id, {n: df for n, df in series.items() if n not in known}))
+    for name, df in known.items():
+        saved_data[name] = SERIES_STORE.save(session_id, name, df, saved_data[name])
+    print(f'Saved {len(series)} timeseries from upload')
+    return saved_data
+
+
+# The series shown on the Overview chart is kept server-side like saved series, under this
+# reserved label; 'session-data' only holds {'version': token, 'length': rows}, so zooming
+# and saving don't send the series back and forth
+OVERVIEW_LABEL = '__overview__'
+
+
+def store_session_series(session_id, df):
+    version = SERIES_STORE.put(session_id, OVERVIEW_LABEL, df)
+    return {'version': version, 'length': len(df)}
+
+
+def load_session_series(session_id, session_data):
+    """The Overview series behind a 'session-data' token, sorted by date, or None."""
+    if not session_data or not isinstance(session_data, dict) or 'version' not in session_data:
         return None
+    return SERIES_STORE.get(session_id, OVERVIEW_LABEL, session_data['version'])
+
 
 @dash.callback(
     Output('session-data', 'data'),
+    Output('upload-message', 'children', allow_duplicate=True),
     Input('data-switch', 'value'),
     Input('trend-type-dropdown', 'value'),
     Input('fluctuations-dropdown', 'value'),
     Input('uploaded-data-store', 'data'),
+    State('session-id', 'data'),
     prevent_initial_call=True,
 )
-def update_session_data(data_switch_value, trend_type, fluctuation_type,uploaded_data):
+def update_session_data(data_switch_value, trend_type, fluctuation_type,uploaded_data, session_id):
     if not data_switch_value:  # Use uploaded data
         if uploaded_data is None:
             print('Please upload a file first')
-            return []#, placeholder_plot() # Return an empty list for session data and placeholder plot
+            return [], dash.no_update #, placeholder_plot() # Return an empty list for session data and placeholder plot
         else:
             processed_data, error_message = process_upload_data(uploaded_data)
         
             if error_message:
                 print(f'Error processing uploaded data: {error_message}')
-                return []#, placeholder_plot() # Return an empty list and a placeholder if there's an error
+                return [], f"Upload error: {error_message}" # Return an empty list and show why
             else:
-                return processed_data.to_dict('records')#, px.line(processed_data, x='Date', y='Value') # Return processed data and plot
+                # keep what store_uploaded_data reported about the file (skipped rows)
+                return store_session_series(session_id, processed_data), dash.no_update
     
     else:  # Generate mock data
         data = generate_timeseries(trend_type, fluctuation_type, params=MockTimeSeriesParams())
-        return data.to_dict('records')
+        data['Date'] = pd.to_datetime(data['Date'])
+        return store_session_series(session_id, data), dash.no_update
+
 
 
 @dash.callback(
@@ -228,54 +330,173 @@ def update_session_data(data_switch_value, trend_type, fluctuation_type,uploaded
     State('timeseries-label-input', 'value'),
     State('session-data', 'data'),
     State('saved-timeseries-data', 'data'),
+    State('session-id', 'data'),
     prevent_initial_call=True
 )
-def save_timeseries(n_clicks, label, timeseries_data, saved_data):
-    if label and label != "Timeseries Label":
-        saved_data[label] = timeseries_data
+def save_timeseries(n_clicks, label, timeseries_data, saved_data, session_id):
+    df = load_session_series(session_id, timeseries_data) if label and label != "Timeseries Label" else None
+    if df is not None:
+        # keep the series server-side, the browser only holds its version token;
+        # re-saving a label with a few new days appends them instead of replacing the series
+        saved_data[label] = SERIES_STORE.save(session_id, label, df, saved_data.get(label))
         return saved_data, ""  # Clear the input after saving
     else:
         return dash.no_update, dash.no_update
 
 
+def relayout_x_range(relayout_data):
+    """Visible x range from a relayoutData event: (start, end), None for autorange, False if x didn't change."""
+    if not relayout_data:
+        return False
+    if relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data:
+        return relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'])
+    return False
+
+
+def timeframe_shapes(col_data):
+    """Layout shapes and annotations shading each custom timeframe (same as fig.add_vrect)."""
+    shapes, annotations = [], []
+    for col in col_data or []:
+        shapes.append(dict(
+            type="rect",
+            xref="x", yref="y domain",
+            x0=col["start_date"], x1=col["end_date"],
+            y0=0, y1=1,
+            fillcolor=col["color"],
+            opacity=1,
+            layer="below",
+            line=dict(width=0),
+        ))
+        annotations.append(dict(
+            text=col["timeframe_name"],
+            xref="x", yref="y domain",
+            x=col["start_date"], y=1,
+            xanchor="left", yanchor="top",
+            showarrow=False,
+            font=dict(size=10, color="black"),
+        ))
+    return shapes, annotations
+
+
 @dash.callback(
     Output('overview-figure', 'figure'),
     Input('session-data', 'data'),
     Input("apply-changes-btn", "n_clicks"),
+    Input('overview-figure', 'relayoutData'),
+    Input('live-switch', 'value'),
     State("col-store", "data"),
+    State('session-id', 'data'),
     # prevent_initial_call=True
 )
-def update_figure(data, n_clicks, col_data):
+def update_figure(data, n_clicks, relayout_data, live, col_data, session_id):
+    # the live tail owns the trace while it's on (turning it off redraws the session data below)
+    if live and ctx.triggered_id != "apply-changes-btn":
+        raise PreventUpdate
+
     if data is None or not data:
         fig = placeholder_plot()
         return fig
-    else:
-        df = pd.DataFrame(data)
-        # print(data)
-        fig = px.line(df, x='Date', y='Value')
-        
+
     # Extract custom timeframes and colors from table
-        if col_data:
-            # Add shaded regions for each custom timeframe
-            for col in col_data:
-                fig.add_vrect(
-                    x0=col["start_date"],
-                    x1=col["end_date"],
-                    fillcolor=col["color"],
-                    opacity=1,
-                    layer="below",
-                    line_width=0,
-                    annotation_text=col["timeframe_name"],
-                    annotation_position="top left",
-                    annotation=dict(
-                        font_size=10,
-                        font_color="black"
-                    )
-                )
+    shapes, annotations = timeframe_shapes(col_data)
+
+    # Timeframe edits only touch the layout: patch the shapes, leave the trace data in the browser
+    if ctx.triggered_id == "apply-changes-btn":
+        patched_fig = dash.Patch()
+        patched_fig["layout"]["shapes"] = shapes
+        patched_fig["layout"]["annotations"] = annotations
+        return patched_fig
 
+    # zoom/pan: re-fetch the visible range at full resolution (up to the point budget), data only.
+    # The request only carries the version token, the series is read from the server-side store
+    if ctx.triggered_id == 'overview-figure':
+        x_range = relayout_x_range(relayout_data)
+        if x_range is False or data.get('length', 0) <= MAX_PLOT_POINTS:
+            raise PreventUpdate
+        df = load_session_series(session_id, data)
+        if df is None:
+            raise PreventUpdate
+        plot_df = downsample_frame(df, x_range)
+        patched_fig = dash.Patch()
+        patched_fig["data"][0]["x"] = plot_df['Date'].to_numpy()
+        patched_fig["data"][0]["y"] = plot_df['Value'].to_numpy()
+        return patched_fig
+
+    df = load_session_series(session_id, data)
+    if df is None:
+        return placeholder_plot()
+
+    # new session data: full figure. Long series are min-max downsampled to the pixel budget and drawn with WebGL
+    plot_df = downsample_frame(df)
+    fig = px.line(plot_df, x='Date', y='Value', render_mode='webgl' if len(df) > MAX_PLOT_POINTS else 'auto')
+    # the zoom is kept while the same series is shown, a new series or upload starts unzoomed
+    fig.update_layout(uirevision=data['version'], shapes=shapes, annotations=annotations)
     return fig
 
 
+@dash.callback(
+    Output('live-interval', 'disabled'),
+    Output('live-series-dropdown', 'options'),
+    Output('live-series-dropdown', 'value'),
+    Output('live-series-dropdown', 'style'),
+    Input('live-switch', 'value'),
+    State('live-series-dropdown', 'value'),
+    prevent_initial_call=True
+)
+def toggle_live_tail(live, series):
+    if not live:
+        return True, dash.no_update, dash.no_update, {'display': 'none'}
+    names = LIVE_FEED.names()
+    if series not in names:
+        series = names[0] if names else None
+    return False, names, series, {'width': '250px', 'margin': '5px'}
+
+
+@dash.callback(
+    Output('overview-figure', 'figure', allow_duplicate=True),
+    Output('live-cursor', 'data'),
+    Input('live-series-dropdown', 'value'),
+    Input('live-switch', 'value'),
+    State("col-store", "data"),
+    prevent_initial_call=True
+)
+def start_live_tail(series, live, col_data):
+    """Draws what the ring buffer holds of a live series; stream_live_tail then only sends new points."""
+    if not live or not series:
+        raise PreventUpdate
+    dates, values, cursor = LIVE_FEED.since(series)
+    shapes, annotations = timeframe_shapes(col_data)
+    fig = go.Figure(go.Scattergl(x=dates, y=values, mode='lines', name=series))
+    fig.update_layout(title=f"{series} (live)", xaxis_title='Date', yaxis_title='Value',
+                      uirevision='live', shapes=shapes, annotations=annotations)
+    # ns timestamps don't fit a JavaScript number exactly, so the cursor travels as a string
+    return fig, {'series': series, 'after': None if cursor is None else str(cursor)}
+
+
+@dash.callback(
+    Output('overview-figure', 'extendData'),
+    Output('live-cursor', 'data', allow_duplicate=True),
+    Input('live-interval', 'n_intervals'),
+    State('live-cursor', 'data'),
+    State('live-switch', 'value'),
+    prevent_initial_call=True
+)
+def stream_live_tail(n_intervals, cursor, live):
+    # Appends only the points newer than the last one sent; the browser drops the oldest past the buffer size.
+    # The cursor is a timestamp, so it holds whichever gunicorn worker answers the poll
+    if not live or not cursor:
+        raise PreventUpdate
+    after = cursor.get('after')
+    dates, values, after = LIVE_FEED.since(cursor['series'], None if after is None else int(after))
+    if len(dates) == 0:
+        raise PreventUpdate
+    return [dict(x=[dates], y=[values]), [0], LIVE_BUFFER_SIZE], {'series': cursor['series'], 'after': str(after)}
+
+
 @dash.callback(
     Output("saved-timeseries-message", "children"),
     Input("saved-timeseries-data", "data")
@@ -0,0 +1,230 @@
+import logging
+import os
+import socketserver
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Live-tail sources, both off by default: a CSV file that is followed as it grows (like tail -F)
+# and/or a TCP port on localhost that accepts the same lines. A line is "date,value" (series named
+# after the source) or "date,series,value".
+LIVE_TAIL_FILE = os.environ.get('LIVE_TAIL_FILE', '')
+LIVE_TAIL_PORT = int(os.environ['LIVE_TAIL_PORT']) if os.environ.get('LIVE_TAIL_PORT') else None
+LIVE_BUFFER_SIZE = int(os.environ.get('LIVE_BUFFER_SIZE', 10_000))  # points kept per series
+LIVE_POLL_SECONDS = float(os.environ.get('LIVE_POLL_SECONDS', 0.5))  # file polling and chart refresh interval
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of the last 'capacity' (timestamp, value) points of a series.
+
+    Timestamps are kept strictly increasing: points at or before the newest buffered one
+    (late or repeated lines) are dropped on push. That makes the timestamp itself the read
+    cursor - after(ts) returns the points newer than ts - and it means the same thing in
+    every process tailing the same source, unlike a per-buffer position.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty(capacity, dtype=np.float64)
+        self.total = 0  # points ever pushed
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def last_ts(self):
+        return int(self._ts[(self.total - 1) % self.capacity]) if self.total else None
+
+    def push(self, ts, values):
+        """Appends int64 nanosecond timestamps and float values, skipping any that aren't newer."""
+        last = self.last_ts()
+        floor = np.maximum.accumulate(np.concatenate(([np.iinfo(np.int64).min if last is None else last], ts)))[:-1]
+        keep = ts > floor
+        if not keep.all():
+            ts, values = ts[keep], values[keep]
+        n = len(ts)
+        # points that would be overwritten within this batch are never written
+        kept = min(n, self.capacity)
+        start = (self.total + n - kept) % self.capacity
+        ts, values = ts[n - kept:], values[n - kept:]
+        # at most two slices: up to the end of the arrays, then wrapping around to the front
+        first = min(kept, self.capacity - start)
+        self._ts[start:start + first], self._values[start:start + first] = ts[:first], values[:first]
+        self._ts[:kept - first], self._values[:kept - first] = ts[first:], values[first:]
+        self.total += n
+
+    def after(self, ts=None):
+        """
+        Returns (timestamps, values) of the buffered points newer than ts (all of them for
+        None), oldest first. Costs a binary search plus the points returned.
+        """
+        # the buffer is sorted, rotated at the oldest point: search the older part, then the newer
+        oldest = self.total % self.capacity if self.total > self.capacity else 0
+        segments = [(oldest, len(self))] if oldest == 0 else [(oldest, self.capacity), (0, oldest)]
+        idx = []
+        for lo, hi in segments:
+            i = lo if ts is None else lo + int(np.searchsorted(self._ts[lo:hi], ts, side='right'))
+            if i < hi:
+                idx.append(np.arange(i, hi))
+        idx = np.concatenate(idx) if idx else np.empty(0, dtype=np.int64)
+        return self._ts[idx].view('datetime64[ns]'), self._values[idx]
+
+
+def parse_lines(lines, default_series):
+    """
+    Parses live-tail lines ("date,value" or "date,series,value") into {series: (ts, values)},
+    int64 nanosecond timestamps and float values in line order. Blank and malformed lines
+    (a header, say) are skipped.
+    """
+    dates, names, values = [], [], []
+    for line in lines:
+        parts = [p.strip() for p in line.split(',')]
+        if len(parts) == 2:
+            dates.append(parts[0]), names.append(default_series), values.append(parts[1])
+        elif len(parts) == 3:
+            dates.append(parts[0]), names.append(parts[1]), values.append(parts[2])
+    if not dates:
+        return {}
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(pd.Series(dates), errors='coerce', format='mixed'),
+        'Series': names,
+        'Value': pd.to_numeric(pd.Series(values), errors='coerce'),
+    }).dropna()
+    out = {}
+    for name, group in df.groupby('Series', sort=False):
+        out[name] = (group['Date'].values.astype('datetime64[ns]').view('int64'), group['Value'].to_numpy(dtype=float))
+    return out
+
+
+class LiveFeed:
+    """Ring buffers of the live series of this server process, by series name."""
+    def __init__(self, capacity=LIVE_BUFFER_SIZE):
+        self.capacity = capacity
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def push_lines(self, lines, default_series):
+        """Parses a batch of source lines and appends them to their series' buffers."""
+        parsed = parse_lines(lines, default_series)
+        with self._lock:
+            for name, (ts, values) in parsed.items():
+                buffer = self._buffers.get(name)
+                if buffer is None:
+                    buffer = self._buffers[name] = RingBuffer(self.capacity)
+                buffer.push(ts, values)
+
+    def names(self):
+        with self._lock:
+            return sorted(self._buffers)
+
+    def since(self, name, after=None):
+        """
+        (dates, values, cursor) of the points of series 'name' newer than the cursor 'after'
+        (nanosecond timestamp, None for everything buffered); empty if unknown. The returned
+        cursor is the newest timestamp sent, or 'after' when there is nothing new.
+        """
+        with self._lock:
+            buffer = self._buffers.get(name)
+            if buffer is None:
+                return np.empty(0, dtype='datetime64[ns]'), np.empty(0), after
+            dates, values = buffer.after(after)
+        return dates, values, (int(dates[-1].view('int64')) if len(dates) else after)
+
+
+class _LineSplitter:
+    # Accumulates raw bytes and hands out complete lines, keeping a trailing partial line
+    def __init__(self):
+        self._rest = b''
+
+    def feed(self, data):
+        data = self._rest + data
+        data, _, self._rest = data.rpartition(b'\n')
+        return data.decode('utf-8', errors='replace').splitlines() if data else []
+
+
+def tail_file(feed, path, poll_seconds=LIVE_POLL_SECONDS, stop=None):
+    """
+    Follows the CSV file at 'path' (like tail -F) and pushes new lines to 'feed'. Starts with
+    roughly the last buffer's worth of the file, reopens it when it is rotated or truncated,
+    and waits for it if it doesn't exist yet. Runs until 'stop' (a threading.Event) is set.
+    """
+    default_series = os.path.splitext(os.path.basename(path))[0]
+    stop = stop or threading.Event()
+    handle, inode, splitter = None, None, _LineSplitter()
+    while not stop.is_set():
+        try:
+            stat = os.stat(path)
+            if handle is None or stat.st_ino != inode or stat.st_size < handle.tell():
+                if handle is not None:
+                    handle.close()
+                first_open = inode is None
+                handle, inode, splitter = open(path, 'rb'), stat.st_ino, _LineSplitter()
+                # ~64 bytes a line: skip history the ring buffer would drop anyway, and the partial line we land in
+                skip = stat.st_size - feed.capacity * 64 if first_open else 0
+                if skip > 0:
+                    handle.seek(skip)
+                    handle.readline()
+            data = handle.read()
+            if data:
+                feed.push_lines(splitter.feed(data), default_series)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.exception("Live tail of %s failed", path)
+        stop.wait(poll_seconds)
+    if handle is not None:
+        handle.close()
+
+
+class _LineHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        splitter = _LineSplitter()
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                self.server.feed.push_lines(splitter.feed(b'\n'), self.server.default_series)  # unterminated last line
+                return
+            self.server.feed.push_lines(splitter.feed(data), self.server.default_series)
+
+
+class LineServer(socketserver.ThreadingTCPServer):
+    """TCP server on localhost pushing every line it receives to a LiveFeed."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, feed, port, default_series='live'):
+        self.feed, self.default_series = feed, default_series
+        super().__init__(('127.0.0.1', port), _LineHandler)
+
+
+LIVE_FEED = LiveFeed()
+_started_pid = None
+
+
+def start_live_sources(feed=LIVE_FEED):
+    """
+    Starts the configured live-tail sources in daemon threads of this process (once per
+    process: threads don't survive a fork, so a preloading gunicorn master leaves this to
+    its workers, see gunicorn.conf.py).
+
+    Buffers are per process. With several gunicorn workers each one tails LIVE_TAIL_FILE on
+    its own; clients poll with a timestamp cursor, so a poll that lands on another worker
+    neither repeats nor skips points (a worker that hasn't read the newest lines yet just
+    returns nothing until it has). Only one worker can bind LIVE_TAIL_PORT, so the socket
+    source needs a single worker - use the file source when running more than one.
+    """
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    _started_pid = os.getpid()
+    if LIVE_TAIL_FILE:
+        threading.Thread(target=tail_file, args=(feed, LIVE_TAIL_FILE), name='live-tail-file', daemon=True).start()
+    if LIVE_TAIL_PORT is not None:
+        try:
+            server = LineServer(feed, LIVE_TAIL_PORT)
+        except OSError as e:
+            logger.warning("Live tail port %s not available in pid %s: %s", LIVE_TAIL_PORT, os.getpid(), e)
+        else:
+            threading.Thread(target=server.serve_forever, name='live-tail-socket', daemon=True).start()
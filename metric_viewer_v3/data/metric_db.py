@@ -0,0 +1,237 @@
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 4096  # points per stored chunk
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    version TEXT NOT NULL,
+    n_obs INTEGER NOT NULL,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    updated_at REAL NOT NULL,
+    UNIQUE (session_id, label)
+);
+-- observations in date-sorted chunks of CHUNK_SIZE points, timestamps and values as raw
+-- int64/float64 column blobs; (series_id, first_ts) is the per-series date index
+CREATE TABLE IF NOT EXISTS chunks (
+    series_id INTEGER NOT NULL,
+    first_ts INTEGER NOT NULL,
+    last_ts INTEGER NOT NULL,
+    ts BLOB NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS chunks_by_date ON chunks (series_id, first_ts);
+-- versions created by append(): their parent version and the first appended timestamp
+CREATE TABLE IF NOT EXISTS appends (
+    series_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    parent_version TEXT NOT NULL,
+    first_ts INTEGER NOT NULL,
+    PRIMARY KEY (series_id, version)
+);
+CREATE INDEX IF NOT EXISTS series_updated ON series (updated_at);
+"""
+
+
+def _to_ns(value):
+    # Timestamp-like -> int64 nanoseconds since the epoch (the 'ts' column)
+    return int(pd.Timestamp(value).value)
+
+
+class MetricDB:
+    """
+    Embedded SQLite store for saved timeseries, keyed by (session id, label).
+
+    Observations are stored sorted by date in chunks of CHUNK_SIZE points (raw NumPy column
+    blobs), indexed by (series, first timestamp of the chunk), so get() with a start/end date
+    only reads the chunks overlapping that range. Every process and thread gets its own
+    connection; the database runs in WAL mode so Dash background jobs and other gunicorn
+    workers can read while a series is being written.
+    """
+    def __init__(self, path):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def put_many(self, session_id, series):
+        """
+        Replaces the stored series of a session in one transaction.
+
+        Args:
+            session_id (str): Session the series belong to.
+            series (dict): {label: (version token, DataFrame with 'Date' and 'Value' columns)}
+        """
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            for label, (version, df) in series.items():
+                ts = df['Date'].values.astype('datetime64[ns]').view('int64')
+                values = df['Value'].to_numpy(dtype=float)
+                if len(ts) > 1 and (ts[1:] < ts[:-1]).any():
+                    order = np.argsort(ts, kind='stable')
+                    ts, values = ts[order], values[order]
+                row = conn.execute('SELECT id FROM series WHERE session_id=? AND label=?', (session_id, label)).fetchone()
+                first_ts, last_ts = (int(ts[0]), int(ts[-1])) if len(ts) else (None, None)
+                if row is None:
+                    series_id = conn.execute(
+                        'INSERT INTO series (session_id, label, version, n_obs, first_ts, last_ts, updated_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (session_id, label, version, len(ts), first_ts, last_ts, now)).lastrowid
+                else:
+                    series_id = row[0]
+                    conn.execute('DELETE FROM chunks WHERE series_id=?', (series_id,))
+                    conn.execute('DELETE FROM appends WHERE series_id=?', (series_id,))
+                    conn.execute('UPDATE series SET version=?, n_obs=?, first_ts=?, last_ts=?, updated_at=? WHERE id=?',
+                                 (version, len(ts), first_ts, last_ts, now, series_id))
+                conn.executemany(
+                    'INSERT INTO chunks (series_id, first_ts, last_ts, ts, value) VALUES (?, ?, ?, ?, ?)',
+                    self._chunks(series_id, ts, values))
+
+    def append(self, session_id, label, parent_version, version, df):
+        """
+        Appends rows dated after the series' last observation, turning version 'parent_version'
+        into 'version'. A partly filled last chunk is merged with the new rows so daily appends
+        don't leave a trail of tiny chunks. Returns False if the series is unknown or no longer
+        at parent_version.
+        """
+        ts = df['Date'].values.astype('datetime64[ns]').view('int64')
+        values = df['Value'].to_numpy(dtype=float)
+        if len(ts) == 0:
+            return True
+        conn = self._connect()
+        with conn:
+            row = conn.execute('SELECT id, version, n_obs, last_ts FROM series WHERE session_id=? AND label=?',
+                               (session_id, label)).fetchone()
+            if row is None or row[1] != parent_version:
+                return False
+            series_id, _, n_obs, last_ts = row
+            if last_ts is not None and ts[0] <= last_ts:
+                raise ValueError("Appended rows must come after the last stored date")
+            tail = conn.execute('SELECT first_ts, ts, value FROM chunks WHERE series_id=? ORDER BY first_ts DESC LIMIT 1',
+                                (series_id,)).fetchone()
+            if tail is not None and len(tail[1]) // 8 < CHUNK_SIZE:
+                conn.execute('DELETE FROM chunks WHERE series_id=? AND first_ts=?', (series_id, tail[0]))
+                ts = np.concatenate([np.frombuffer(tail[1], dtype=np.int64), ts])
+                values = np.concatenate([np.frombuffer(tail[2], dtype=np.float64), values])
+            conn.executemany(
+                'INSERT INTO chunks (series_id, first_ts, last_ts, ts, value) VALUES (?, ?, ?, ?, ?)',
+                self._chunks(series_id, ts, values))
+            n_new = len(df)
+            first_new = int(df['Date'].values.astype('datetime64[ns]').view('int64')[0])
+            conn.execute('UPDATE series SET version=?, n_obs=?, first_ts=COALESCE(first_ts, ?), last_ts=?, updated_at=? '
+                         'WHERE id=?', (version, n_obs + n_new, first_new, int(ts[-1]), time.time(), series_id))
+            conn.execute('INSERT OR REPLACE INTO appends (series_id, version, parent_version, first_ts) VALUES (?, ?, ?, ?)',
+                         (series_id, version, parent_version, first_new))
+        return True
+
+    def lineage(self, session_id, label, version, limit=16):
+        """
+        The appends that led to 'version', newest first, as (version, parent version,
+        first appended date) tuples - up to 'limit' of them, empty if it wasn't appended to.
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT id FROM series WHERE session_id=? AND label=?', (session_id, label)).fetchone()
+        if row is None:
+            return []
+        parents = {v: (p, t) for v, p, t in conn.execute(
+            'SELECT version, parent_version, first_ts FROM appends WHERE series_id=?', (row[0],))}
+        chain = []
+        while version in parents and len(chain) < limit:
+            parent, first_ts = parents[version]
+            chain.append((version, parent, pd.Timestamp(first_ts)))
+            version = parent
+        return chain
+
+    @staticmethod
+    def _chunks(series_id, ts, values):
+        # Chunks never split a run of equal timestamps, so first_ts is unique per series
+        i = 0
+        while i < len(ts):
+            j = min(i + CHUNK_SIZE, len(ts))
+            if j < len(ts):
+                j = int(np.searchsorted(ts, ts[j - 1], side='right'))
+            yield series_id, int(ts[i]), int(ts[j - 1]), ts[i:j].tobytes(), values[i:j].tobytes()
+            i = j
+
+    def info(self, session_id, label):
+        """Returns (version, n_obs, first date, last date) of a stored series, or None."""
+        row = self._connect().execute(
+            'SELECT version, n_obs, first_ts, last_ts FROM series WHERE session_id=? AND label=?',
+            (session_id, label)).fetchone()
+        if row is None:
+            return None
+        version, n_obs, first_ts, last_ts = row
+        if n_obs == 0:
+            return version, 0, None, None
+        return version, n_obs, pd.Timestamp(first_ts), pd.Timestamp(last_ts)
+
+    def get(self, session_id, label, version=None, start=None, end=None):
+        """
+        Returns the stored series (or its start..end date range, both inclusive) as a
+        DataFrame with 'Date' and 'Value' columns, sorted by date. None if the series is
+        unknown or not at 'version'.
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT id, version FROM series WHERE session_id=? AND label=?',
+                           (session_id, label)).fetchone()
+        if row is None or (version is not None and row[1] != version):
+            return None
+        # chunks are sorted and don't overlap: the first one to read is the last starting at or before 'start'
+        query, params = 'SELECT ts, value FROM chunks WHERE series_id=?', [row[0]]
+        lo = hi = None
+        if start is not None:
+            lo = _to_ns(start)
+            query += (' AND first_ts >= COALESCE((SELECT MAX(first_ts) FROM chunks'
+                      ' WHERE series_id=? AND first_ts <= ?), -9223372036854775808) AND last_ts >= ?')
+            params += [row[0], lo, lo]
+        if end is not None:
+            hi = _to_ns(end)
+            query += ' AND first_ts <= ?'
+            params.append(hi)
+        chunks = conn.execute(query + ' ORDER BY first_ts', params).fetchall()
+        ts = np.concatenate([np.frombuffer(c[0], dtype=np.int64) for c in chunks] or [np.empty(0, np.int64)])
+        values = np.concatenate([np.frombuffer(c[1], dtype=np.float64) for c in chunks] or [np.empty(0)])
+        i = 0 if lo is None else np.searchsorted(ts, lo, side='left')
+        j = len(ts) if hi is None else np.searchsorted(ts, hi, side='right')
+        return pd.DataFrame({'Date': ts[i:j].view('datetime64[ns]'), 'Value': values[i:j]})
+
+    def remove(self, session_id, label):
+        conn = self._connect()
+        with conn:
+            row = conn.execute('SELECT id FROM series WHERE session_id=? AND label=?', (session_id, label)).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM chunks WHERE series_id=?', (row[0],))
+                conn.execute('DELETE FROM appends WHERE series_id=?', (row[0],))
+                conn.execute('DELETE FROM series WHERE id=?', (row[0],))
+
+    def prune(self, max_age_seconds):
+        """Deletes series not written for max_age_seconds. Returns how many were removed."""
+        conn = self._connect()
+        cutoff = time.time() - max_age_seconds
+        with conn:
+            ids = [r[0] for r in conn.execute('SELECT id FROM series WHERE updated_at < ?', (cutoff,))]
+            for series_id in ids:
+                conn.execute('DELETE FROM chunks WHERE series_id=?', (series_id,))
+                conn.execute('DELETE FROM appends WHERE series_id=?', (series_id,))
+                conn.execute('DELETE FROM series WHERE id=?', (series_id,))
+        return len(ids)
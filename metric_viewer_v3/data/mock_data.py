@@ -2,47 +2,83 @@ from utils import DefaultParams, MockTimeSeriesParams
 import numpy as np
 import pandas as pd
 
-def generate_timeseries(inp_trend_type, inp_fluctuation, params: MockTimeSeriesParams, start_date=None):
+def _per_series(option, n_series):
+    # one option for every series, or a sequence with one option per series
+    if isinstance(option, str):
+        return np.full(n_series, option.lower(), dtype=object)
+    option = np.array([o.lower() for o in option], dtype=object)
+    if len(option) != n_series:
+        raise ValueError(f"Expected {n_series} options, got {len(option)}")
+    return option
+
+def generate_timeseries_batch(n_series, inp_trend_type, inp_fluctuation, params: MockTimeSeriesParams,
+                              start_date=None, seed=None, vary_base_value=False, freq='D'):
     """
-    Generate a time series as per the desired trend and fluctuation pattern.
-    Returns a list of (date, value) tuples.
-    inp_trend_type: 'stable', 'increasing', 'decreasing', 'cyclical', 'random'
-    inp_fluctuation: 'low', 'high', 'none'
+    Generate n_series time series of params.length days at once.
+    Returns (dates, values): a DatetimeIndex of length L and an (n_series, L) float array.
+
+    Every series draws from its own np.random.Generator stream spawned from 'seed'
+    (params.random_seed if not given), so results are reproducible per series and
+    concurrent calls never share random state. These are not the streams of the old
+    np.random.seed(seed) generator: a given seed yields different values than it used to.
+    inp_trend_type: 'stable', 'increasing', 'decreasing', 'cyclical', 'random' (or one per series)
+    inp_fluctuation: 'low', 'high', 'none' (or one per series)
+    vary_base_value: draw a base value in [100, 300) per series instead of params.base_value
+    freq: spacing of the dates, e.g. 'h' or 'min' for very long series
     """
-    if params.random_seed is not None:
-        np.random.seed(params.random_seed)
+    seed = params.random_seed if seed is None else seed
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n_series)]
+    length = params.length
+    trend_types = _per_series(inp_trend_type, n_series)
+    fluctuations = _per_series(inp_fluctuation, n_series)
+
     if start_date is None:
-        start_date = pd.to_datetime('today') - pd.Timedelta(days=params.length - 1)
-    dates = [start_date + pd.Timedelta(days=i) for i in range(params.length)]
-    dates = [x.date() for x in dates]
-    values = np.full(params.length, params.base_value, dtype=float)
+        start_date = pd.Timestamp('today').normalize() - pd.Timedelta(days=length - 1)
+    dates = pd.date_range(start=pd.Timestamp(start_date).normalize(), periods=length, freq=freq)
 
-    params.trend_type = inp_trend_type
-    params.fluctuation = inp_fluctuation
+    if vary_base_value:
+        base = np.array([rng.integers(100, 300) for rng in rngs], dtype=float)
+    else:
+        base = np.full(n_series, params.base_value, dtype=float)
+    values = np.repeat(base[:, None], length, axis=1)
+    steps = np.arange(length)
 
     # Apply trend
-    if params.trend_type == 'Increasing':
-        values += np.arange(params.length) * params.trend_strength
-    elif params.trend_type == 'Decreasing':
-        values -= np.arange(params.length) * params.trend_strength
-    elif params.trend_type == 'Cyclical' and params.seasonality_period:
-        values += params.seasonality_amplitude * np.sin(
-            2 * np.pi * np.arange(params.length) / params.seasonality_period
-        )
-    elif params.trend_type == 'Random':
-        values += np.random.randn(params.length) * params.fluctuation_strength
+    slope = np.select([trend_types == 'increasing', trend_types == 'decreasing'], [1.0, -1.0], 0.0)
+    values += slope[:, None] * steps * params.trend_strength
+    # 'random' trend and fluctuation noise come from each series' own stream, in that order
+    noise_scale = np.select([fluctuations == 'high', fluctuations == 'low'], [2.0, 1.0], 0.0)
+    for i, rng in enumerate(rngs):
+        if trend_types[i] == 'random':
+            values[i] += rng.standard_normal(length) * params.fluctuation_strength
+        if noise_scale[i]:
+            values[i] += rng.standard_normal(length) * params.fluctuation_strength * noise_scale[i]
     # 'stable' does nothing extra
 
-    # Add seasonality if specified and not already applied
-    if params.trend_type != 'Cyclical' and params.seasonality_period:
-        values += params.seasonality_amplitude * np.sin(
-            2 * np.pi * np.arange(params.length) / params.seasonality_period
-        )
-
-    # Add fluctuation/noise
-    if params.fluctuation == 'High':
-        values += np.random.randn(params.length) * params.fluctuation_strength * 2
-    elif params.fluctuation == 'Low':
-        values += np.random.randn(params.length) * params.fluctuation_strength
-    # 'none' means no extra noise
-    return pd.DataFrame({'Date':dates, 'Value':values})
\ No newline at end of file
+    # Seasonality: the whole pattern for 'cyclical', added on top of the trend otherwise
+    if params.seasonality_period:
+        values += params.seasonality_amplitude * np.sin(2 * np.pi * steps / params.seasonality_period)
+
+    return dates, values
+
+def generate_timeseries_frame(n_series, inp_trend_type, inp_fluctuation, params: MockTimeSeriesParams,
+                              start_date=None, seed=None, vary_base_value=True):
+    """
+    Wide DataFrame (Date + one 'metric_<i>' column per series) from generate_timeseries_batch,
+    in the same layout as a wide multi-metric upload. Used to synthesize load-test datasets.
+    """
+    dates, values = generate_timeseries_batch(n_series, inp_trend_type, inp_fluctuation, params,
+                                              start_date=start_date, seed=seed, vary_base_value=vary_base_value)
+    columns = [f'metric_{i}' for i in range(n_series)]
+    return pd.concat([pd.DataFrame({'Date': dates}), pd.DataFrame(values.T, columns=columns)], axis=1)
+
+def generate_timeseries(inp_trend_type, inp_fluctuation, params: MockTimeSeriesParams, start_date=None):
+    """
+    Generate a time series as per the desired trend and fluctuation pattern.
+    Returns a DataFrame with 'Date' and 'Value' columns.
+    inp_trend_type: 'stable', 'increasing', 'decreasing', 'cyclical', 'random'
+    inp_fluctuation: 'low', 'high', 'none'
+    Seeded output differs from the pre-batch generator (see generate_timeseries_batch).
+    """
+    dates, values = generate_timeseries_batch(1, inp_trend_type, inp_fluctuation, params, start_date=start_date)
+    return pd.DataFrame({'Date': dates.date, 'Value': values[0]})
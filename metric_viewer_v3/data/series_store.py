@@ -0,0 +1,388 @@
+import copy
+import hashlib
+import os
+import threading
+import warnings
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from data.metric_db import MetricDB
+from utils import CACHE_DIR, CorrSums, PeriodStats, align_series, make_cache
+
+# Period stats and correlation sums per saved series version, shared with background jobs
+SERIES_STATS_CACHE = make_cache('series-stats', ttl=6 * 3600)
+
+
+class SeriesStore:
+    """
+    Server-side store for saved timeseries, keyed by (session id, label).
+
+    The browser only keeps {label: version token} in 'saved-timeseries-data', so callback
+    payloads stay the same size no matter how many or how long the saved series are.
+
+    With a MetricDB every series is written through to disk, so saved series survive
+    restarts and page reloads and are shared by all gunicorn workers and Dash background
+    jobs. The in-memory part is then an LRU cache of whole series in front of the database,
+    evicted least recently used first once it holds more than max_entries series or
+    max_bytes of data. Date-range reads of series that aren't cached go to the database
+    and only read that range.
+    """
+    def __init__(self, max_entries=1000, max_bytes=512 * 2**20, db=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db = db
+        self._entries = OrderedDict()  # (session_id, label) -> (version, df, nbytes)
+        self._nbytes = 0
+        self._lineage = {}  # (session_id, label) -> {version: (parent version, first appended date)}, without a db
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def version_token(df):
+        h = hashlib.sha1()
+        h.update(np.ascontiguousarray(df['Date'].values.astype('datetime64[ns]').view('int64')).tobytes())
+        h.update(np.ascontiguousarray(df['Value'].to_numpy(dtype=float)).tobytes())
+        return h.hexdigest()[:16]
+
+    @staticmethod
+    def _prepare(df):
+        df = df[['Date', 'Value']].copy()
+        if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+            df['Date'] = pd.to_datetime(df['Date'])
+        df['Date'] = df['Date'].astype('datetime64[ns]')
+        df['Value'] = df['Value'].astype(float)
+        if not df['Date'].is_monotonic_increasing:
+            df = df.sort_values('Date', kind='stable')
+        return df.reset_index(drop=True)
+
+    def put(self, session_id, label, df):
+        """Stores a copy of df (columns 'Date', 'Value') and returns its version token."""
+        return self.put_many(session_id, {label: df})[label]
+
+    def put_many(self, session_id, series):
+        """Stores several {label: DataFrame} series at once and returns {label: version token}."""
+        prepared = {label: self._prepare(df) for label, df in series.items()}
+        versioned = {label: (self.version_token(df), df) for label, df in prepared.items()}
+        if self.db is not None:
+            self.db.put_many(session_id, versioned)
+        with self._lock:
+            for label, (version, df) in versioned.items():
+                self._cache(session_id, label, version, df)
+                self._lineage.pop((session_id, label), None)
+            self._evict()
+        return {label: version for label, (version, _) in versioned.items()}
+
+    def save(self, session_id, label, df, version=None):
+        """
+        Saves df under label and returns its version token. When 'version' is the saved
+        series' current version and df only adds rows after it (its older rows, if any,
+        matching the saved ones) the new rows are appended; otherwise the series is replaced.
+        """
+        if version is not None and self.version(session_id, label) == version:
+            new = self._prepare(df)
+            last = self.last_date(session_id, label, version)
+            if last is not None:
+                overlap = new[new['Date'] <= last]
+                if len(overlap):
+                    saved = self.get(session_id, label, version, start=overlap['Date'].iloc[0])
+                    same = saved is not None and len(saved) == len(overlap) \
+                        and (saved['Date'].values == overlap['Date'].values).all() \
+                        and np.allclose(saved['Value'].values, overlap['Value'].values, equal_nan=True)
+                    if not same:
+                        return self.put(session_id, label, df)
+                token = self.append(session_id, label, new[new['Date'] > last], version)
+                if token is not None:
+                    return token
+        return self.put(session_id, label, df)
+
+    def append(self, session_id, label, df, version=None):
+        """
+        Appends new observations (DataFrame with 'Date' and 'Value', all dated after the
+        series' last observation) to a saved series and returns its new version token.
+        Returns None if the series is unknown or not at 'version'.
+
+        The new version remembers its parent (see lineage), which lets period stats,
+        correlation sums and forecasts be carried forward instead of recomputed.
+        """
+        new = self._prepare(df)
+        current = self.version(session_id, label)
+        if current is None or (version is not None and current != version):
+            return None
+        if len(new) == 0:
+            return current
+        last = self.last_date(session_id, label, current)
+        if last is not None and new['Date'].iloc[0] <= last:
+            raise ValueError(f"Appended rows for '{label}' must come after {last}")
+        h = hashlib.sha1(current.encode())
+        h.update(self.version_token(new).encode())
+        token = h.hexdigest()[:16]
+        first_new = new['Date'].iloc[0]
+
+        if self.db is not None and not self.db.append(session_id, label, current, token, new):
+            return None
+        with self._lock:
+            entry = self._entries.get((session_id, label))
+            if entry is not None and entry[0] == current:
+                self._cache(session_id, label, token, pd.concat([entry[1], new], ignore_index=True))
+                self._evict()
+            else:
+                self._entries.pop((session_id, label), None)
+                if entry is not None:
+                    self._nbytes -= entry[2]
+            if self.db is None:
+                self._lineage.setdefault((session_id, label), {})[token] = (current, first_new)
+        return token
+
+    def version(self, session_id, label):
+        """Current version token of a saved series, or None."""
+        with self._lock:
+            entry = self._entries.get((session_id, label))
+            if entry is not None:
+                return entry[0]
+        info = self.db.info(session_id, label) if self.db is not None else None
+        return info[0] if info is not None else None
+
+    def lineage(self, session_id, label, version, limit=16):
+        """(version, parent version, first appended date) for the appends behind 'version', newest first."""
+        if self.db is not None:
+            return self.db.lineage(session_id, label, version, limit)
+        with self._lock:
+            parents = dict(self._lineage.get((session_id, label), {}))
+        chain = []
+        while version in parents and len(chain) < limit:
+            parent, first_new = parents[version]
+            chain.append((version, parent, first_new))
+            version = parent
+        return chain
+
+    def appended_since(self, session_id, tokens):
+        """{label: dates where appended rows began, newest first} for series that grew by appends."""
+        appended = {}
+        for label, version in (tokens or {}).items():
+            chain = self.lineage(session_id, label, version)
+            if chain:
+                appended[label] = [first_new for _, _, first_new in chain]
+        return appended
+
+    def period_stats(self, session_id, label, version):
+        """
+        PeriodStats of a saved series. A version created by appends extends its parent's
+        stats with the appended rows only (a range read), if the parent's are cached.
+        """
+        key = f'period-stats|{session_id}|{label}|{version}'
+        stats = SERIES_STATS_CACHE.get(key)
+        if stats is not None:
+            return stats
+        since = None
+        for _, parent, first_new in self.lineage(session_id, label, version):
+            since = first_new
+            parent_stats = SERIES_STATS_CACHE.get(f'period-stats|{session_id}|{label}|{parent}')
+            if parent_stats is not None:
+                rows = self.get(session_id, label, version, start=since)
+                if rows is None:
+                    return None
+                stats = copy.copy(parent_stats).extend(rows)
+                break
+        if stats is None:
+            df = self.get(session_id, label, version)
+            if df is None:
+                return None
+            stats = PeriodStats.from_frame(df)
+        SERIES_STATS_CACHE.set(key, stats)
+        return stats
+
+    def _window_delta(self, session_id, tokens, old_tokens):
+        # {label: first appended date} turning old_tokens into tokens, None if anything else changed
+        if list(tokens) != list(old_tokens):
+            return None
+        delta = {}
+        for label, version in tokens.items():
+            if version == old_tokens[label]:
+                continue
+            first = None
+            for _, parent, first_new in self.lineage(session_id, label, version):
+                first = first_new
+                if parent == old_tokens[label]:
+                    break
+            else:
+                return None
+            delta[label] = first
+        return delta
+
+    def window_corr(self, session_id, tokens, start, end, max_updates=64):
+        """
+        CorrSums of the saved series in 'tokens' over [start, end], aligned on their dates.
+
+        The sums of the previous window of the same length are kept in SERIES_STATS_CACHE.
+        When the window only moved forward and the series only grew by appends, just the
+        rows that left the window and the rows that are new (or gained appended values)
+        are read and subtracted/added. Every max_updates updates the sums are rebuilt so
+        rounding errors don't pile up.
+
+        Returns:
+            tuple: (list of names, CorrSums)
+        """
+        names = list(tokens)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        key = f'window-corr|{session_id}|{names!r}|{end - start}'
+        cached = SERIES_STATS_CACHE.get(key)
+        if cached is not None:
+            old_tokens, old_start, old_end, sums, n_updates = cached
+            delta = self._window_delta(session_id, tokens, old_tokens)
+            if delta is not None and start >= old_start and end >= old_end and n_updates < max_updates:
+                sums = self._shift_window(session_id, tokens, names, sums, delta, old_start, old_end, start, end)
+                if sums is not None:
+                    SERIES_STATS_CACHE.set(key, (dict(tokens), start, end, sums, n_updates + 1))
+                    return names, sums
+
+        frames = self.get_many(session_id, tokens, start=start, end=end)
+        matrix = self._aligned(frames, names)[1]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # series without data in the window
+            shift = np.nan_to_num(np.nanmean(matrix, axis=0)) if len(matrix) else np.zeros(len(names))
+        sums = CorrSums(shift).update(matrix)
+        SERIES_STATS_CACHE.set(key, (dict(tokens), start, end, sums, 0))
+        return names, sums
+
+    def _shift_window(self, session_id, tokens, names, sums, delta, old_start, old_end, start, end):
+        sums = copy.deepcopy(sums)
+        one = pd.Timedelta(1, 'ns')
+        # rows leaving the window, with the values they had when they were added
+        if start > old_start:
+            frames = self.get_many(session_id, tokens, start=old_start, end=start - one)
+            if len(frames) != len(names):
+                return None
+            dates, matrix = self._aligned(frames, names)
+            sums.update(self._before_appends(dates, matrix, names, delta), sign=-1)
+        # rows entering the window, and old rows that gained appended values
+        first_changed = min(delta.values()) if delta else end + one
+        lo = max(start, min(first_changed, old_end + one))
+        if lo <= end:
+            frames = self.get_many(session_id, tokens, start=lo, end=end)
+            if len(frames) != len(names):
+                return None
+            dates, matrix = self._aligned(frames, names)
+            was_in = dates <= np.datetime64(old_end, 'ns')
+            sums.update(self._before_appends(dates[was_in], matrix[was_in], names, delta), sign=-1)
+            sums.update(matrix)
+        return sums
+
+    @staticmethod
+    def _aligned(frames, names):
+        # aligned (dates, matrix) with one column per name, NaN for series without data
+        dates, present, values = align_series(frames)
+        matrix = np.full((len(dates), len(names)), np.nan)
+        for j, name in enumerate(present):
+            matrix[:, names.index(name)] = values[:, j]
+        return dates, matrix
+
+    @staticmethod
+    def _before_appends(dates, matrix, names, delta):
+        # the matrix as it was before the appends in delta: appended cells blanked out
+        matrix = matrix.copy()
+        for label, first_new in delta.items():
+            matrix[dates >= np.datetime64(first_new, 'ns'), names.index(label)] = np.nan
+        return matrix
+
+    def _cache(self, session_id, label, version, df):
+        nbytes = int(df.memory_usage(index=False).sum())
+        old = self._entries.pop((session_id, label), None)
+        if old is not None:
+            self._nbytes -= old[2]
+        self._entries[(session_id, label)] = (version, df, nbytes)
+        self._nbytes += nbytes
+
+    def get(self, session_id, label, version=None, start=None, end=None):
+        """
+        Returns the saved DataFrame, or only its rows with start <= Date <= end (None leaves
+        that side open). None if the series is unknown or not at 'version'.
+        """
+        with self._lock:
+            entry = self._entries.get((session_id, label))
+            if entry is not None and (version is None or entry[0] == version):
+                self._entries.move_to_end((session_id, label))
+                df = entry[1]
+                if start is None and end is None:
+                    return df.copy()
+                dates = df['Date'].values
+                i = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+                j = len(df) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+                return df.iloc[i:j].reset_index(drop=True)
+        if self.db is None:
+            return None
+        df = self.db.get(session_id, label, version, start, end)
+        if df is not None and start is None and end is None and version is not None:
+            # a whole series at a known version: keep it for the next callback
+            with self._lock:
+                self._cache(session_id, label, version, df)
+                self._evict()
+            return df.copy()
+        return df
+
+    def last_date(self, session_id, label, version=None):
+        """Date of the last observation of a saved series, or None."""
+        with self._lock:
+            entry = self._entries.get((session_id, label))
+            if entry is not None and (version is None or entry[0] == version):
+                return entry[1]['Date'].iloc[-1] if len(entry[1]) else None
+        info = self.db.info(session_id, label) if self.db is not None else None
+        if info is None or (version is not None and info[0] != version):
+            return None
+        return info[3]
+
+    def tail(self, session_id, label, version=None, days=56):
+        """The last 'days' calendar days of a saved series, ending on the day of its last observation."""
+        last = self.last_date(session_id, label, version)
+        if last is None:
+            return None
+        return self.get(session_id, label, version, start=last.normalize() - pd.Timedelta(days=days - 1))
+
+    def get_many(self, session_id, tokens, start=None, end=None):
+        """Returns {label: DataFrame} for a {label: version token} dict, skipping missing series."""
+        series = {}
+        for label, version in (tokens or {}).items():
+            df = self.get(session_id, label, version, start, end)
+            if df is not None:
+                series[label] = df
+        return series
+
+    def remove(self, session_id, label):
+        with self._lock:
+            old = self._entries.pop((session_id, label), None)
+            if old is not None:
+                self._nbytes -= old[2]
+            self._lineage.pop((session_id, label), None)
+        if self.db is not None:
+            self.db.remove(session_id, label)
+
+    def _evict(self):
+        # Keep the most recently saved entry even if it alone is over the byte cap
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._nbytes > self.max_bytes):
+            _, (_, _, nbytes) = self._entries.popitem(last=False)
+            self._nbytes -= nbytes
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# SERIES_DB_PATH='' keeps saved series in memory only
+SERIES_DB_PATH = os.environ.get('SERIES_DB_PATH', os.path.join(CACHE_DIR, 'series.sqlite'))
+SERIES_DB_RETENTION_DAYS = float(os.environ.get('SERIES_DB_RETENTION_DAYS', 30))
+
+
+def _open_db():
+    if not SERIES_DB_PATH:
+        return None
+    db = MetricDB(SERIES_DB_PATH)
+    db.prune(SERIES_DB_RETENTION_DAYS * 86400)  # sessions nobody saved to in a while
+    return db
+
+
+SERIES_STORE = SeriesStore(
+    max_entries=int(os.environ.get('SERIES_STORE_MAX_ENTRIES', 1000)),
+    max_bytes=int(os.environ.get('SERIES_STORE_MAX_MB', 512)) * 2**20,
+    db=_open_db(),
+)
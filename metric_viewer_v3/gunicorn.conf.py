@@ -0,0 +1,30 @@
+# Picked up automatically by `gunicorn app:server` (Procfile) when run from this directory.
+import os
+
+# Opt-in pre-fork warm-up: GUNICORN_WARMUP=1 loads the app and the lazily imported analytics
+# dependencies (statsmodels) once in the master, and workers are forked from it already warm,
+# so booting or replacing a worker doesn't pay for the imports again.
+WARMUP = os.environ.get('GUNICORN_WARMUP', '0').lower() in ('1', 'true', 'yes')
+
+preload_app = WARMUP
+if WARMUP:
+    # app.py then leaves the live-tail threads (and the socket) to the workers, see post_fork
+    os.environ['METRIC_VIEWER_PRELOADED'] = '1'
+
+
+def when_ready(server):
+    # runs in the master after the app is loaded, before the first worker is forked
+    if WARMUP:
+        import utils
+        utils.warm_up()
+        server.log.info("Analytics dependencies preloaded")
+
+
+def post_fork(server, worker):
+    if WARMUP:
+        import instrumentation
+        from data.live_tail import start_live_sources
+        start_live_sources()
+        if instrumentation.REGISTRY is not None:
+            # the master's registry was inherited: each worker collects and serves its own metrics
+            instrumentation.REGISTRY = instrumentation.Registry(instrumentation.REGISTRY.spool_dir)
@@ -0,0 +1,215 @@
+import cProfile
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import diskcache
+import flask
+
+# Opt-in: set METRICS_ENABLED=1 to record callback metrics and serve them on /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+# Dump a cProfile of every callback request slower than this many seconds (unset: never)
+PROFILE_THRESHOLD = float(os.environ['METRICS_PROFILE_THRESHOLD']) if os.environ.get('METRICS_PROFILE_THRESHOLD') else None
+
+# Background jobs whose result is never polled (cancelled, tab closed) are forgotten after this long
+JOB_MAX_AGE_SECONDS = 3600
+JOB_MAX_TRACKED = 10_000
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+METRICS = {
+    # name: (help text, buckets)
+    'dash_callback_seconds': ('Wall time of Dash callback requests.', SECONDS_BUCKETS),
+    'dash_callback_request_bytes': ('Size of Dash callback request bodies (inputs and state).', BYTES_BUCKETS),
+    'dash_callback_response_bytes': ('Size of Dash callback responses (outputs).', BYTES_BUCKETS),
+    'dash_background_job_seconds': ('Time from starting a background callback job to its result.', SECONDS_BUCKETS),
+    'forecast_fit_seconds': ('Time spent fitting forecast models.', SECONDS_BUCKETS),
+}
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label set."""
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels tuple -> [bucket counts..., sum, count]
+
+    def observe(self, value, labels=()):
+        row = self.series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += value
+        row[-1] += 1
+
+
+class Registry:
+    """
+    Histograms for the metrics in METRICS, rendered in the Prometheus text format.
+
+    Observations made in other processes (Dash background jobs, forecast pool workers)
+    are spooled to a diskcache queue and merged when the owning process renders. Every
+    owning process (gunicorn worker) has its own queue under spool_dir, named after its pid,
+    so workers never drain or clear each other's.
+    """
+    def __init__(self, spool_dir=None):
+        self._lock = threading.Lock()
+        self._histograms = {name: Histogram(buckets) for name, (_, buckets) in METRICS.items()}
+        self._owner_pid = os.getpid()
+        self.spool_dir = spool_dir
+        self._spool = None
+        if spool_dir:
+            _remove_stale_spools(spool_dir)
+            self._spool = diskcache.Deque(directory=os.path.join(spool_dir, str(self._owner_pid)))
+            self._spool.clear()  # a previous process with the same pid
+
+    def observe(self, name, value, **labels):
+        labels = tuple(sorted(labels.items()))
+        if os.getpid() != self._owner_pid:
+            if self._spool is not None:
+                self._spool.append((name, value, labels))
+            return
+        with self._lock:
+            self._histograms[name].observe(value, labels)
+
+    def _drain_spool(self):
+        if self._spool is None:
+            return
+        while True:
+            try:
+                name, value, labels = self._spool.popleft()
+            except IndexError:
+                return
+            self._histograms[name].observe(value, labels)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._drain_spool()
+            for name, hist in self._histograms.items():
+                lines.append(f'# HELP {name} {METRICS[name][0]}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, row in sorted(hist.series.items()):
+                    label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    sep = ',' if label_text else ''
+                    for bound, count in zip(hist.buckets, row):
+                        lines.append(f'{name}_bucket{{{label_text}{sep}le="{bound:g}"}} {count}')
+                    lines.append(f'{name}_bucket{{{label_text}{sep}le="+Inf"}} {row[-1]}')
+                    lines.append(f'{name}_sum{{{label_text}}} {row[-2]:.6f}')
+                    lines.append(f'{name}_count{{{label_text}}} {row[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _remove_stale_spools(spool_dir):
+    # queues of owners that are no longer running (a previous run, a replaced worker)
+    if not os.path.isdir(spool_dir):
+        return
+    for name in os.listdir(spool_dir):
+        if not name.isdigit():
+            continue
+        try:
+            os.kill(int(name), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(spool_dir, name), ignore_errors=True)
+        except PermissionError:  # alive, someone else's
+            pass
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = None
+
+
+def observe(name, value, **labels):
+    """Records one observation; a no-op unless instrumentation is enabled."""
+    if REGISTRY is not None:
+        REGISTRY.observe(name, value, **labels)
+
+
+def _callback_label(body):
+    # Output id of the callback, without Dash's hash suffix for duplicate outputs
+    output = (body or {}).get('output', 'unknown')
+    return re.sub(r'@[0-9a-f]{32,}', '', output)
+
+
+def instrument_app(app, spool_dir=None, profile_dir=None):
+    """
+    Records wall time and request/response bytes of every Dash callback request,
+    background job latency and (through observe) forecast fit time, and serves them
+    as Prometheus histograms on /metrics of app.server.
+
+    With METRICS_PROFILE_THRESHOLD set, callback requests are profiled with cProfile
+    and the profile is dumped to profile_dir when the request is slower than the threshold.
+    """
+    global REGISTRY
+    REGISTRY = Registry(spool_dir)
+    server = app.server
+    jobs_started = OrderedDict()  # background job id -> start time, oldest first
+    jobs_lock = threading.Lock()
+    if profile_dir and PROFILE_THRESHOLD is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    @server.before_request
+    def _start_timer():
+        if not flask.request.path.endswith('/_dash-update-component'):
+            return
+        flask.g.metrics_start = time.perf_counter()
+        if PROFILE_THRESHOLD is not None and profile_dir:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                flask.g.metrics_profiler = profiler
+            except ValueError:  # another profiler is already active on this thread
+                pass
+
+    @server.after_request
+    def _record(response):
+        start = flask.g.pop('metrics_start', None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        profiler = flask.g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+        body = flask.request.get_json(silent=True)
+        label = _callback_label(body)
+        observe('dash_callback_seconds', seconds, callback=label)
+        observe('dash_callback_request_bytes', flask.request.content_length or 0, callback=label)
+        observe('dash_callback_response_bytes', response.calculate_content_length() or 0, callback=label)
+
+        # background callbacks: the first request starts a job, later polls return its result
+        job = flask.request.args.get('job')
+        if response.is_json and response.status_code == 200:
+            payload = response.get_json(silent=True) or {}
+            with jobs_lock:
+                if 'cacheKey' in payload and 'job' in payload:
+                    jobs_started[str(payload['job'])] = start
+                    # jobs nobody polls to the end would otherwise stay here forever
+                    while jobs_started and (len(jobs_started) > JOB_MAX_TRACKED or
+                                            start - next(iter(jobs_started.values())) > JOB_MAX_AGE_SECONDS):
+                        jobs_started.popitem(last=False)
+                    started = None
+                elif job is not None and ('response' in payload or 'done' in payload):
+                    started = jobs_started.pop(job, None)
+                else:
+                    started = None
+            if started is not None:
+                observe('dash_background_job_seconds', time.perf_counter() - started, callback=label)
+
+        if profiler is not None and seconds > PROFILE_THRESHOLD:
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            name = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_.')[:80] or 'callback'
+            profiler.dump_stats(os.path.join(profile_dir, f'{name}-{stamp}.prof'))
+        return response
+
+    @server.route('/metrics')
+    def _metrics():
+        return flask.Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    return REGISTRY
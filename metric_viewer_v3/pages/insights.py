@@ -14,6 +14,11 @@ timeseries_options = [
     {"label": "Series A", "value": "A"},
     {"label": "Series B", "value": "B"},
 ]
+forecast_engine_options = [
+    {"label": "Auto (by latency budget)", "value": "auto"},
+    {"label": "SARIMAX", "value": "sarimax"},
+    {"label": "Exponential smoothing (fast)", "value": "ets"},
+]
 timeframe_options = [
     {"label": "Last 28 days", "value": "28d"},
     {"label": "Last 56 days", "value": "56d"},
@@ -90,9 +95,25 @@ layout = dbc.Container(
                                             value=True,
                                             label="",
                                         ),
+                                        html.Label("Forecast model", style={"margin-left": "30px", "margin-right": "10px"}),
+                                        dcc.Dropdown(
+                                            id="forecast-engine-dropdown",
+                                            options=forecast_engine_options,
+                                            value="auto",
+                                            clearable=False,
+                                            style={"width": "260px"},
+                                        ),
                                     ],
                                     style={"display": "flex", "align-items": "center", "margin-bottom": "10px"},
                                 ),
+                                dbc.Progress(
+                                    id="forecast-progress",
+                                    value=0,
+                                    label="",
+                                    striped=True,
+                                    animated=True,
+                                    style={"display": "none", "margin-bottom": "10px"},
+                                ),
                                 dcc.Graph(id="forecast-plot", figure=fig_forecast),
                             ]
                         )
@@ -101,6 +122,33 @@ layout = dbc.Container(
                 ),
             ]
         ),
+        dbc.Row(
+            [
+                # Forecast accuracy: rolling-origin backtest of the saved timeseries
+                dbc.Col(
+                    [
+                        html.Div(
+                            [
+                                html.H5("Forecast Backtest", style={"margin-right": "20px", "margin-bottom": "0"}),
+                                dbc.Button("Run backtest", id="run-backtest-btn", color="primary", size="sm"),
+                            ],
+                            style={"display": "flex", "align-items": "center", "margin-bottom": "10px"},
+                        ),
+                        dbc.Progress(
+                            id="backtest-progress",
+                            value=0,
+                            label="",
+                            striped=True,
+                            animated=True,
+                            style={"display": "none", "margin-bottom": "10px"},
+                        ),
+                        html.Div(id="backtest-table"),
+                    ],
+                    width=12,
+                ),
+            ],
+            style={"margin-top": "20px", "margin-bottom": "20px"},
+        ),
     ],
     fluid=True,
 )
\ No newline at end of file
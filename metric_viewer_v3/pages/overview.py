@@ -9,6 +9,7 @@ from utils import DefaultParams, MockTimeSeriesParams
 import numpy as np
 import pandas as pd
 from callbacks import overview_callbacks
+from data.live_tail import LIVE_POLL_SECONDS
 import plotly.graph_objects as go
 
 dash.register_page(__name__, path="/", title="Overview")
@@ -51,7 +52,8 @@ layout = html.Div(
                                 "margin": "10px 0px",
                             },
                             multiple=False,
-                        )
+                        ),
+                        html.Div(id="upload-message", style={"color": "#b00020", "textAlign": "center"}),
                     ],),
 
                 # Edit parameters
@@ -67,6 +69,7 @@ layout = html.Div(
                                             [
                                                 html.Tbody(
                                                     id="table-body",
+                                                    children=overview_callbacks.make_table_rows([]),
                                                 ),
                                             ],
                                             style={
@@ -161,6 +164,27 @@ layout = html.Div(
                                              style={"textAlign": "center", "width": "100%"}),
                                     style={"justify-content": "center"}
                                 ),
+                # Live tail: follow a series fed to the server (data/live_tail.py) instead of the saved data
+                dcc.Store(id="live-cursor", data=None),  # {"series": name, "after": newest timestamp sent (ns)}
+                dcc.Interval(id="live-interval", interval=int(LIVE_POLL_SECONDS * 1000), disabled=True),
+                dbc.Row(
+                    [
+                        daq.ToggleSwitch(
+                            id="live-switch",
+                            label="Live tail",
+                            value=False,
+                            style={"width": "auto", "margin": "5px"},
+                        ),
+                        dcc.Dropdown(
+                            id="live-series-dropdown",
+                            options=[],
+                            placeholder="Live series",
+                            clearable=False,
+                            style={"display": "none"},
+                        ),
+                    ],
+                    style={"display": "flex", "justify-content": "center", "align-items": "center"},
+                ),
                 # Plot
                 dcc.Graph(
                     id="overview-figure",
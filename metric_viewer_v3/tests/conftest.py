@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Run against a throwaway cache directory and an in-memory series store, never the app's own
+os.environ.setdefault('METRIC_VIEWER_CACHE_DIR', tempfile.mkdtemp(prefix='metric-viewer-tests-'))
+os.environ.setdefault('SERIES_DB_PATH', '')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _daily_frame(start, n, first_value=0.0, seed=None, gaps=0.0, period=None):
+    """
+    n daily rows from start. Without a seed the values count up from first_value. With one they are a
+    random walk, or noise around a sine wave when a period is given, and a share of them (gaps) is NaN.
+    """
+    values = np.arange(n) + first_value
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        noise = rng.standard_normal(n)
+        shape = noise.cumsum() if period is None else np.sin(2 * np.pi * np.arange(n) / period) + noise
+        values = first_value + shape
+        values[rng.random(n) < gaps] = np.nan
+    return pd.DataFrame({'Date': pd.date_range(start, periods=n, unit='ns'), 'Value': values})
+
+
+@pytest.fixture
+def daily_frame():
+    return _daily_frame
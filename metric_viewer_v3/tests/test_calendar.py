@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import CalendarIndex, calendar_for, calendar_index, tf_label_to_tuple
+
+
+def _tf_label_to_tuple_reference(df, timeframe_label):
+    # The day-by-day loop tf_label_to_tuple replaced
+    end_date = pd.to_datetime(df['Date']).max()
+    num_days = int(timeframe_label.split(' ')[1])
+    start_date = end_date - timedelta(days=num_days - 1)
+    overall_tf = [(timeframe_label, start_date.date(), end_date.date())]
+    time_periods = []
+    current_start = start_date
+    delta = 13 if num_days == 56 else 6
+    while current_start <= end_date:
+        current_end = min(current_start + timedelta(days=delta), end_date)
+        label = f'{current_start.strftime("%m-%d")} to {current_end.strftime("%m-%d")}'
+        time_periods.append((label, current_start.date(), current_end.date()))
+        current_start = current_end + timedelta(days=1)
+    return time_periods, overall_tf
+
+
+@pytest.mark.parametrize('label', ['Last 7 days', 'Last 10 days', 'Last 28 days', 'Last 56 days', 'Last 90 days'])
+@pytest.mark.parametrize('end', ['2024-03-31', '2024-12-29 17:30', '2023-02-28'])
+def test_tf_label_to_tuple_matches_the_loop(label, end):
+    df = pd.DataFrame({'Date': pd.date_range(end=end, periods=120, freq='D').astype(str), 'Value': 1.0})
+    got = tf_label_to_tuple(df.copy(), label)
+    assert got == _tf_label_to_tuple_reference(df, label)
+    assert all(type(d) is date for _, start, end in got[0] + got[1] for d in (start, end))
+
+
+def test_calendar_index_matches_pandas():
+    cal = CalendarIndex(date(2025, 1, 5), 800)
+    days = pd.DatetimeIndex(cal.dates)
+    assert cal.end == np.datetime64('2025-01-05') and len(cal) == 800
+    assert (np.diff(cal.dates).astype(int) == 1).all()
+    np.testing.assert_array_equal(cal.weekday, days.weekday)
+    np.testing.assert_array_equal(cal.is_weekend, days.weekday >= 5)
+    iso = days.isocalendar()
+    np.testing.assert_array_equal(cal.iso_year, iso['year'])
+    np.testing.assert_array_equal(cal.iso_week, iso['week'])
+    np.testing.assert_array_equal(cal.month, days.to_period('M').to_timestamp().to_numpy().astype('datetime64[M]'))
+    # the weekends the old DefaultParams collected day by day
+    weekends = [d.date() for d in days if d.weekday() >= 5]
+    assert cal.special_days['Weekends'].astype(object).tolist() == weekends
+    with pytest.raises(ValueError):
+        cal.weekday[0] = 0
+
+
+def test_calendar_positions_and_memoization():
+    dates = pd.to_datetime(['2024-02-29 23:59', '2024-02-01 00:00', '2024-03-01 00:01'])
+    cal = calendar_for(dates)
+    assert (cal.start, cal.end) == (np.datetime64('2024-02-01'), np.datetime64('2024-03-01'))
+    np.testing.assert_array_equal(cal.positions(dates), [28, 0, 29])
+    assert calendar_for(dates) is cal
+    assert calendar_index('2024-03-01 12:00', 30) is cal
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import downsample_frame, minmax_downsample
+
+
+def _minmax_reference(y, n_out):
+    # Bucket by bucket: the first minimum and the last maximum, NaN counting as the lowest value
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(n_out // 2, 1)
+    bucket = np.arange(n) * n_buckets // n
+    filled = np.nan_to_num(y, nan=-np.inf)
+    keep = {0, n - 1}
+    for b in range(n_buckets):
+        rows = np.flatnonzero(bucket == b)
+        keep.add(rows[np.argmin(filled[rows])])
+        keep.add(rows[::-1][np.argmax(filled[rows][::-1])])
+    return np.array(sorted(keep))
+
+
+@pytest.mark.parametrize('n, n_out', [(10, 20), (10, 10), (11, 10), (1000, 7), (1000, 2), (1000, 1), (12345, 400)])
+@pytest.mark.parametrize('kind', ['walk', 'ties', 'gaps'])
+def test_minmax_downsample_matches_bucket_loop(n, n_out, kind):
+    rng = np.random.default_rng(n)
+    y = rng.standard_normal(n).cumsum()
+    if kind == 'ties':
+        y = rng.integers(0, 3, n).astype(float)
+    elif kind == 'gaps':
+        y[rng.random(n) < 0.2] = np.nan
+    keep = minmax_downsample(y, n_out)
+    np.testing.assert_array_equal(keep, _minmax_reference(y, n_out))
+    assert len(keep) <= max(n_out, 2 * max(n_out // 2, 1) + 2)
+    if kind != 'gaps':
+        assert (y[keep].min(), y[keep].max()) == (y.min(), y.max())
+
+
+def test_downsample_frame_keeps_a_point_beyond_the_view(daily_frame):
+    df = daily_frame('2024-01-01', 5000, seed=0)
+    view = downsample_frame(df, x_range=('2024-03-01 12:00', '2024-06-30'), n_out=100)
+    assert view['Date'].iloc[0] == pd.Timestamp('2024-03-01') and view['Date'].iloc[-1] == pd.Timestamp('2024-07-01')
+    assert view['Date'].is_monotonic_increasing and len(view) <= 102
+    window = df[(df['Date'] >= '2024-03-01') & (df['Date'] <= '2024-07-01')]
+    assert view['Value'].max() == window['Value'].max() and view['Value'].min() == window['Value'].min()
+    pd.testing.assert_frame_equal(downsample_frame(df.iloc[:50]), df.iloc[:50])
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import decode_frame, encode_frame
+
+
+@pytest.mark.parametrize('dates', [
+    ['2024-01-01', None, '2024-01-03', '2024-01-04'],                      # midnight dates: day offsets
+    ['2024-01-01 10:30:00', '2024-01-02 11:00:00', None, None],            # times: second offsets
+    [None, None, None, None],
+])
+def test_round_trip_with_nat_and_nan(dates):
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(pd.Series(dates, dtype=object)).astype('datetime64[ns]'),
+        'Value': [1.5, np.nan, 3.0, np.nan],
+        'Metric': pd.Categorical(['a', 'b', 'a', 'b']),
+    })
+    out = decode_frame(encode_frame(df))
+    pd.testing.assert_frame_equal(out, df)
+
+
+def test_round_trip_without_nat_has_no_mask():
+    df = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=3), 'Value': [1.0, 2.0, 3.0]})
+    payload = encode_frame(df)
+    assert 'missing' not in payload['columns']['Date']
+    pd.testing.assert_frame_equal(decode_frame(payload), df.astype({'Date': 'datetime64[ns]'}))
+
+
+def test_float32_payload():
+    df = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=2), 'Value': [0.5, np.nan]})
+    out = decode_frame(encode_frame(df, float_dtype='float32'))
+    assert out['Value'].dtype == np.float32
+    assert out['Value'].isna().tolist() == [False, True]
@@ -0,0 +1,171 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+
+def test_forecast_engine_is_abstract():
+    with pytest.raises(TypeError):
+        utils.ForecastEngine()
+
+    class Partial(utils.ForecastEngine):
+        def forecast_many(self, series_dict, forecast_days=56, on_done=None, appended=None):
+            return {}
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_fit_rates_survive_clearing_the_forecast_cache():
+    utils._record_fit_rate('test-engine', 2.0, 1000)
+    utils.FORECAST_CACHE.clear()
+    assert utils.fit_rate('test-engine') == pytest.approx(2e-3)
+
+
+@pytest.mark.parametrize('first', [False, True])
+def test_forecast_cache_is_keyed_by_evaluate(daily_frame, first):
+    df = daily_frame('2024-01-01', 120, 10.0, seed=int(first), period=7)
+    order = (1, 1, 1), (0, 0, 0, 0)
+    results = {evaluate: utils.forc_with_rmse(df, 14, *order, evaluate=evaluate) for evaluate in (first, not first)}
+    assert results[False][1] is None and results[True][1] is not None
+    for evaluate, (forecast, rmse) in results.items():
+        uncached = utils.forc_with_rmse(df, 14, *order, evaluate=evaluate, use_cache=False)
+        pd.testing.assert_frame_equal(forecast, uncached[0], check_exact=True)
+        assert rmse == uncached[1]
+
+
+def _seasonal_period_reference(y, max_period=60, min_acf=0.3):
+    # One series at a time: detrend the observed values, autocorrelate with np.correlate, walk the lags
+    t = np.flatnonzero(~np.isnan(y))
+    slope, intercept = np.polyfit(t, y[t], 1)
+    residual = np.zeros(len(y))
+    residual[t] = y[t] - (intercept + slope * t)
+    acf = np.correlate(residual, residual, 'full')[len(y) - 1:]
+    acf = acf / acf[0]
+    candidates, crossed = {}, False
+    for lag in range(2, min(max_period, len(y) - 2) + 1):
+        crossed = crossed or acf[:lag + 1].min() < 0
+        if (crossed and acf[lag] > acf[lag - 1] and acf[lag] >= acf[lag + 1] and acf[lag] >= min_acf
+                and lag <= len(t) // 3):
+            candidates[lag] = acf[lag]
+    if not candidates:
+        return 1
+    strongest = max(candidates.values())
+    return min(lag for lag, value in candidates.items() if value >= 0.9 * strongest)
+
+
+def _seasonal_rows(lengths, periods, gaps=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n, period in zip(lengths, periods):
+        t = np.arange(n)
+        season = 5 * np.sin(2 * np.pi * t / period) if period > 1 else 0.0
+        y = 100 + 0.3 * t + season + rng.standard_normal(n)
+        y[rng.random(n) < gaps] = np.nan
+        rows.append(y)
+    return rows
+
+
+def test_detect_seasonal_period_matches_per_series_reference():
+    periods = [7, 12, 30, 1, 7, 14]
+    rows = _seasonal_rows([200, 150, 365, 120, 40, 90], periods, gaps=0.05)
+    stacked, _ = utils._stack_series(rows)
+    detected = utils.detect_seasonal_period(stacked)
+    np.testing.assert_array_equal(detected, [_seasonal_period_reference(y) for y in rows])
+    assert [utils.detect_seasonal_period(y) for y in rows] == detected.tolist()
+    assert detected.tolist() == periods
+    assert utils.detect_seasonal_period(np.arange(3.0)) == 1
+
+
+def _holt_winters_reference(y, period, forecast_days):
+    # One series and one smoothing combination at a time, plain Python recursion
+    n, m = len(y), period
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if m > 1 and n >= 2 * m:
+            first, second = np.nanmean(y[:m]), np.nanmean(y[m:2 * m])
+            trend0, level0 = (second - first) / m, first
+            season0 = np.nan_to_num(y[:m] - (first + trend0 * (np.arange(m) - (m - 1) / 2)))
+            season0 = season0 - season0.mean()
+        else:
+            level0 = np.nanmean(y[:m])
+            trend0 = np.nanmean(np.diff(y[:10])) if n > 1 else 0.0
+            season0 = np.zeros(m)
+    level0, trend0 = np.nan_to_num(level0), np.nan_to_num(trend0)
+    warmup = 2 * m if m > 1 else 2
+
+    best = None
+    for alpha in utils.ETS_ALPHAS:
+        for beta in utils.ETS_BETAS:
+            for gamma in utils.ETS_GAMMAS:
+                gamma = gamma if m > 1 else 0.0
+                level, trend, season = level0 - trend0 * ((m - 1) / 2 + 1), trend0, list(season0)
+                sse = 0.0
+                for t in range(n):
+                    s = season[t % m]
+                    pred = level + trend + s
+                    if np.isnan(y[t]):
+                        y_eff = pred
+                    else:
+                        y_eff = y[t]
+                        if t >= warmup:
+                            sse += (y[t] - pred) ** 2
+                    new_level = alpha * (y_eff - s) + (1 - alpha) * (level + trend)
+                    trend = beta * (new_level - level) + (1 - beta) * trend
+                    season[t % m] = gamma * (y_eff - new_level) + (1 - gamma) * s
+                    level = new_level
+                if best is None or sse < best[0]:
+                    best = (sse, level, trend, season)
+    _, level, trend, season = best
+    return np.array([level + h * trend + season[(n + h - 1) % m] for h in range(1, forecast_days + 1)])
+
+
+def test_holt_winters_batch_matches_scalar_recursion():
+    rows = _seasonal_rows([60, 25, 33, 5, 1], [7, 7, 12, 1, 1], gaps=0.1, seed=3)
+    periods = np.array([7, 7, 12, 1, 1])
+    stacked, lengths = utils._stack_series(rows)
+    forecasts = utils.holt_winters_batch(stacked, lengths, periods, 10)
+    expected = np.array([_holt_winters_reference(y, m, 10) for y, m in zip(rows, periods)])
+    np.testing.assert_allclose(forecasts, expected, rtol=1e-9)
+
+
+def test_backtest_equals_forecasts_from_each_origin(daily_frame):
+    df = daily_frame('2024-01-01', 110, 10.0, seed=4, period=7)
+    horizon, n_folds, step, order = 14, 3, 7, (1, 1, 1)
+    table, msg = utils.backtest(df, horizon, n_folds, step, order, use_cache=False)
+    assert msg is None
+
+    # one fit before the first origin, then for each origin the forecast of the model filtered up to it
+    endog = utils._prepare_series(df)['Value']
+    seasonal_order = utils.auto_seasonal_order(endog.to_frame())
+    origins = [110 - horizon - k * step for k in reversed(range(n_folds))]
+    fit = utils._sarimax(endog.iloc[:origins[0]], order, seasonal_order).fit(disp=False)
+    errors = np.array([
+        endog.iloc[origin:origin + horizon].to_numpy()
+        - fit.apply(endog.iloc[:origin], refit=False).forecast(horizon).to_numpy()
+        for origin in origins
+    ])
+    np.testing.assert_allclose(table['RMSE'], np.sqrt((errors ** 2).mean(axis=0)), rtol=1e-6)
+    np.testing.assert_allclose(table['MAE'], np.abs(errors).mean(axis=0), rtol=1e-6)
+    assert table['Folds'].tolist() == [n_folds] * horizon
+
+
+def test_backtest_ets_many_equals_per_fold_fits(daily_frame):
+    series = {'a': daily_frame('2024-01-01', 100, 50.0, seed=5, period=7, gaps=0.05),
+              'b': daily_frame('2024-01-01', 75, 20.0, seed=6),
+              'short': daily_frame('2024-01-01', 40, seed=7)}
+    tables, errors = utils.backtest_ets_many(series, horizon=14, n_folds=3, step=7)
+    assert set(tables) == {'a', 'b'} and set(errors) == {'short'}
+    for name, table in tables.items():
+        values = series[name]['Value'].to_numpy()
+        period = utils.detect_seasonal_period(values)
+        origins = [len(values) - 14 - k * 7 for k in reversed(range(3))]
+        errors = np.array([values[o:o + 14] - _holt_winters_reference(values[:o], period, 14) for o in origins])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            np.testing.assert_allclose(table['RMSE'], np.sqrt(np.nanmean(errors ** 2, axis=0)), rtol=1e-9)
+            np.testing.assert_allclose(table['MAE'], np.nanmean(np.abs(errors), axis=0), rtol=1e-9)
+        assert table['Folds'].tolist() == (~np.isnan(errors)).sum(axis=0).tolist()
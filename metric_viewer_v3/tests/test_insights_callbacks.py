@@ -0,0 +1,21 @@
+import pytest
+
+import app  # noqa: F401  registers the pages and their callbacks
+from callbacks import insights_callbacks
+
+
+def test_forecast_with_series_the_store_lost():
+    progress = []
+    fig = insights_callbacks.update_forecast_plot(progress.append, {'a': 'unknown-version'}, True, 'auto', 'no-session')
+    assert fig.layout.annotations[0].text == 'Graph will appear here'
+    assert progress == []
+
+
+@pytest.mark.parametrize('done, total, expected', [(0, 0, 100), (1, 4, 25.0), (4, 4, 100.0)])
+def test_progress_value(done, total, expected):
+    assert insights_callbacks.progress_value(done, total, 'Forecasting') == (expected, f'Forecasting {done}/{total}')
+
+
+def test_backtest_with_series_the_store_lost():
+    out = insights_callbacks.run_backtest(lambda value: None, 1, {'a': 'unknown-version'}, 'auto', 'no-session')
+    assert 'no longer available' in out.children
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from data.live_tail import LiveFeed, RingBuffer, _LineSplitter, parse_lines
+
+
+def _ns(values):
+    return np.asarray(values, dtype=np.int64)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_ring_buffer_matches_a_list(seed):
+    rng = np.random.default_rng(seed)
+    buffer, pushed, next_ts = RingBuffer(7), [], 0
+    for _ in range(200):
+        n = int(rng.integers(0, 12))
+        ts = _ns(np.arange(next_ts, next_ts + n))
+        next_ts += n
+        buffer.push(ts, ts.astype(float))
+        pushed += ts.tolist()
+        cursor = None if rng.random() < 0.2 else int(rng.integers(-1, next_ts + 2))
+        dates, values = buffer.after(cursor)
+        expected = [t for t in pushed[-7:] if cursor is None or t > cursor]
+        assert dates.view('int64').tolist() == expected
+        assert values.tolist() == [float(t) for t in expected]
+
+
+def test_batch_larger_than_the_buffer_keeps_the_newest():
+    buffer = RingBuffer(4)
+    buffer.push(_ns(range(10)), np.arange(10.0))
+    assert buffer.after()[0].view('int64').tolist() == [6, 7, 8, 9]
+    assert len(buffer) == 4
+
+
+def test_late_and_repeated_points_are_dropped():
+    buffer = RingBuffer(10)
+    buffer.push(_ns([1, 2, 3]), np.array([1.0, 2.0, 3.0]))
+    buffer.push(_ns([3, 2, 5, 4, 6]), np.array([9.0, 9.0, 5.0, 9.0, 6.0]))
+    dates, values = buffer.after()
+    assert dates.view('int64').tolist() == [1, 2, 3, 5, 6]
+    assert values.tolist() == [1.0, 2.0, 3.0, 5.0, 6.0]
+
+
+def test_cursor_is_shared_between_feeds():
+    # two gunicorn workers tailing the same file, one of which started later
+    lines = [f'2024-01-01 00:00:{i:02d},{i}' for i in range(30)]
+    early, late = LiveFeed(capacity=100), LiveFeed(capacity=100)
+    early.push_lines(lines[:20], 'cpu')
+    late.push_lines(lines[10:20], 'cpu')
+    dates, _, cursor = early.since('cpu')
+    assert len(dates) == 20
+    assert len(late.since('cpu', cursor)[0]) == 0  # nothing repeated
+    early.push_lines(lines[20:], 'cpu')
+    late.push_lines(lines[20:25], 'cpu')
+    _, values, cursor = late.since('cpu', cursor)
+    assert values.tolist() == [20.0, 21.0, 22.0, 23.0, 24.0]
+    _, values, cursor = early.since('cpu', cursor)
+    assert values.tolist() == [25.0, 26.0, 27.0, 28.0, 29.0]  # nothing skipped
+    assert early.since('cpu', cursor)[2] == cursor
+    assert len(early.since('unknown')[0]) == 0
+
+
+def test_parse_lines():
+    parsed = parse_lines(['Date,Value', '2024-01-01,3', '2024-01-02 10:00, mem , 4', 'bad,x', '', '2024-01-03,5'], 'cpu')
+    assert sorted(parsed) == ['cpu', 'mem']
+    assert parsed['cpu'][1].tolist() == [3.0, 5.0]
+    assert parsed['mem'][0].view('datetime64[ns]')[0] == np.datetime64('2024-01-02T10:00')
+    assert parse_lines(['just text'], 'cpu') == {}
+
+
+def test_line_splitter_keeps_partial_lines():
+    splitter = _LineSplitter()
+    assert splitter.feed(b'a,1\nb,') == ['a,1']
+    assert splitter.feed(b'2\nc') == ['b,2']
+    assert splitter.feed(b'\n') == ['c']
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import metric_db
+from data.metric_db import MetricDB
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(metric_db, 'CHUNK_SIZE', 4)
+    return MetricDB(str(tmp_path / 'series.db'))
+
+
+def _chunk_sizes(db, label='a'):
+    rows = db._connect().execute(
+        'SELECT c.ts FROM chunks c JOIN series s ON s.id = c.series_id WHERE s.label=? ORDER BY c.first_ts', (label,))
+    return [len(ts) // 8 for ts, in rows]
+
+
+@pytest.mark.parametrize('n', [0, 1, 3, 4, 5, 8, 9])
+def test_put_and_get_round_trip(db, daily_frame, n):
+    df = daily_frame('2024-01-01', n)
+    db.put_many('s', {'a': ('v1', df)})
+    assert _chunk_sizes(db) == [4] * (n // 4) + ([n % 4] if n % 4 else [])
+    pd.testing.assert_frame_equal(db.get('s', 'a'), df, check_freq=False)
+    version, n_obs, first, last = db.info('s', 'a')
+    assert (version, n_obs) == ('v1', n)
+    assert (first, last) == ((df['Date'].iloc[0], df['Date'].iloc[-1]) if n else (None, None))
+
+
+def test_put_sorts_and_keeps_equal_dates_in_one_chunk(db):
+    dates = pd.to_datetime(['2024-01-05', '2024-01-01'] + ['2024-01-03'] * 5)
+    db.put_many('s', {'a': ('v1', pd.DataFrame({'Date': dates, 'Value': np.arange(7.0)}))})
+    assert _chunk_sizes(db) == [6, 1]
+    got = db.get('s', 'a')
+    assert got['Date'].is_monotonic_increasing
+    assert got['Value'].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 0.0]
+
+
+@pytest.mark.parametrize('start, end', [
+    (None, None), ('2024-01-01', '2024-01-12'), ('2024-01-04', '2024-01-05'), ('2024-01-05', '2024-01-05'),
+    ('2024-01-03 12:00', '2024-01-09 12:00'), ('2023-01-01', '2024-01-02'), ('2024-01-11', '2025-01-01'),
+    ('2025-01-01', None), (None, '2023-12-31'), ('2024-01-07', '2024-01-06'),
+])
+def test_range_reads(db, daily_frame, start, end):
+    df = daily_frame('2024-01-01', 11)
+    db.put_many('s', {'a': ('v1', df)})
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['Date'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['Date'] <= pd.Timestamp(end)
+    expected = df[mask].reset_index(drop=True)
+    pd.testing.assert_frame_equal(db.get('s', 'a', start=start, end=end), expected, check_freq=False)
+
+
+def test_append_merges_into_the_partial_tail_chunk(db, daily_frame):
+    db.put_many('s', {'a': ('v1', daily_frame('2024-01-01', 6))})
+    assert _chunk_sizes(db) == [4, 2]
+    assert db.append('s', 'a', 'v1', 'v2', daily_frame('2024-01-07', 1, 6.0))
+    assert _chunk_sizes(db) == [4, 3]
+    assert db.append('s', 'a', 'v2', 'v3', daily_frame('2024-01-08', 4, 7.0))
+    assert _chunk_sizes(db) == [4, 4, 3]
+    # a full tail chunk is left alone
+    db.put_many('s', {'b': ('v1', daily_frame('2024-01-01', 4))})
+    assert db.append('s', 'b', 'v1', 'v2', daily_frame('2024-01-05', 2, 4.0))
+    assert _chunk_sizes(db, 'b') == [4, 2]
+
+    pd.testing.assert_frame_equal(db.get('s', 'a'), daily_frame('2024-01-01', 11), check_freq=False)
+    assert db.info('s', 'a')[:2] == ('v3', 11)
+    assert [v for v, _, _ in db.lineage('s', 'a', 'v3')] == ['v3', 'v2']
+    assert db.get('s', 'a', version='v1') is None
+    pd.testing.assert_frame_equal(db.get('s', 'a', start='2024-01-06', end='2024-01-08'),
+                                  daily_frame('2024-01-06', 3, 5.0), check_freq=False)
+
+
+def test_append_checks_version_and_order(db, daily_frame):
+    db.put_many('s', {'a': ('v1', daily_frame('2024-01-01', 3))})
+    assert not db.append('s', 'a', 'stale', 'v2', daily_frame('2024-01-04', 1))
+    assert not db.append('s', 'unknown', 'v1', 'v2', daily_frame('2024-01-04', 1))
+    with pytest.raises(ValueError):
+        db.append('s', 'a', 'v1', 'v2', daily_frame('2024-01-03', 1))
+    assert db.info('s', 'a')[:2] == ('v1', 3)
+
+
+def test_put_replaces_and_remove_deletes(db, daily_frame):
+    db.put_many('s', {'a': ('v1', daily_frame('2024-01-01', 9))})
+    db.put_many('s', {'a': ('v2', daily_frame('2024-02-01', 2))})
+    assert _chunk_sizes(db) == [2]
+    assert db.get('s', 'a')['Date'].iloc[0] == pd.Timestamp('2024-02-01')
+    db.remove('s', 'a')
+    assert db.get('s', 'a') is None and db.info('s', 'a') is None
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from utils import PeriodStats, period_stats_frame, stats_by_ser
+
+PERIODS = ['Last 3 Weeks', 'Last 3 Days', 'Weekends']
+
+
+def _stats_by_ser_reference(df):
+    # The date-matching stats_by_ser that the vectorized one replaced, with its means under
+    # the right labels (it used to list them in reverse)
+    is_weekday = df['Date'].dt.weekday < 5
+    weekday_df = df.loc[is_weekday]
+    df['Weekends'] = ~is_weekday
+    df['Last 3 Days'] = df['Date'].apply(lambda x: 1 if x in weekday_df.iloc[-3:]['Date'].tolist() else 0)
+    df['Last 3 Weeks'] = df['Date'].apply(lambda x: 1 if x in weekday_df.iloc[-21:]['Date'].tolist() else 0)
+    means = {period: df.loc[df[period] == 1].groupby('Timeseries')['Value'].mean() for period in PERIODS}
+    return pd.DataFrame(means, columns=PERIODS), df.copy()
+
+
+@pytest.fixture
+def series(daily_frame):
+    # different starts and gaps, one end date: how the Insights page combines saved series. The old
+    # date matching only agrees with per-series ranking while every series has three weeks of weekdays
+    return {
+        'a': daily_frame('2024-01-03', 90, 100.0, seed=1, gaps=0.1),
+        'b': daily_frame('2024-02-10', 52, 50.0, seed=2, gaps=0.3),
+        'c': daily_frame('2024-03-01', 32, seed=3),
+    }
+
+
+def _combined(series):
+    return pd.concat([df.assign(Timeseries=name) for name, df in series.items()], ignore_index=True)
+
+
+def test_stats_by_ser_matches_date_matching(series):
+    stats, st_df = stats_by_ser(_combined(series))
+    expected_stats, expected_st_df = _stats_by_ser_reference(_combined(series))
+    pd.testing.assert_frame_equal(stats, expected_stats.reindex(stats.index), check_names=False)
+    pd.testing.assert_frame_equal(st_df, expected_st_df)
+
+
+def test_stats_by_ser_ranks_weekdays_per_series(series):
+    # a series ending earlier, or a short one, still gets its own last weekdays
+    series['b'] = series['b'].iloc[:-10]
+    series['c'] = series['c'].iloc[-5:]
+    stats, st_df = stats_by_ser(_combined(series))
+    for name, n_weekdays in [('b', 21), ('c', 3)]:
+        rows = st_df[st_df['Timeseries'] == name]
+        weekdays = rows[rows['Date'].dt.weekday < 5]
+        assert rows['Last 3 Days'].sum() == 3 and rows['Last 3 Weeks'].sum() == n_weekdays
+        assert stats.loc[name, 'Last 3 Days'] == pytest.approx(weekdays['Value'].iloc[-3:].mean())
+        assert stats.loc[name, 'Last 3 Weeks'] == pytest.approx(weekdays['Value'].iloc[-21:].mean())
+
+
+def test_period_stats_match_stats_by_ser(series):
+    stats, _ = stats_by_ser(_combined(series))
+    extended = {}
+    for name, df in series.items():
+        extended[name] = PeriodStats()
+        for i, j in zip([0, 1, 2, 17, 40], [1, 2, 17, 40, None]):
+            extended[name].extend(df.iloc[i:j])
+    for stats_by_name in ({name: PeriodStats.from_frame(df) for name, df in series.items()}, extended):
+        result, spans = period_stats_frame(stats_by_name)
+        pd.testing.assert_frame_equal(result, stats[PERIODS], check_names=False)
+
+    _, st_df = stats_by_ser(_combined(series))
+    for period in ['Last 3 Weeks', 'Last 3 Days']:
+        flagged = st_df.loc[st_df[period] == 1, 'Date']
+        assert spans[period] == (flagged.min(), flagged.max())
+
+
+def test_period_stats_reject_earlier_rows(daily_frame):
+    stats = PeriodStats.from_frame(daily_frame('2024-01-01', 10))
+    with pytest.raises(ValueError):
+        stats.extend(daily_frame('2024-01-10', 2))
+    assert stats.extend(daily_frame('2024-01-11', 0)) is stats
@@ -0,0 +1,109 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.metric_db import MetricDB
+from data.series_store import SERIES_STATS_CACHE, SeriesStore
+from utils import CorrSums, corr_frame
+
+
+@pytest.fixture(params=['memory', 'db'])
+def store(request, tmp_path):
+    return SeriesStore(db=MetricDB(str(tmp_path / 'series.db')) if request.param == 'db' else None)
+
+
+@pytest.fixture
+def session():
+    # SERIES_STATS_CACHE outlives the stores, keep every test's keys apart
+    return uuid.uuid4().hex
+
+
+def test_append_and_save(store, session, daily_frame):
+    df = daily_frame('2024-01-01', 30, seed=0)
+    v1 = store.put(session, 'a', df.iloc[:20])
+    v2 = store.append(session, 'a', df.iloc[20:25], v1)
+    assert v2 not in (None, v1)
+    assert store.lineage(session, 'a', v2) == [(v2, v1, df['Date'].iloc[20])]
+    assert store.append(session, 'a', df.iloc[25:], v1) is None  # stale version
+    with pytest.raises(ValueError):
+        store.append(session, 'a', df.iloc[24:], v2)
+
+    # save() appends when the saved rows are unchanged, replaces otherwise
+    v3 = store.save(session, 'a', df, v2)
+    assert [v for v, _, _ in store.lineage(session, 'a', v3)] == [v3, v2]
+    pd.testing.assert_frame_equal(store.get(session, 'a', v3), df, check_freq=False)
+    changed = df.assign(Value=df['Value'] + 1)
+    v4 = store.save(session, 'a', changed, v3)
+    assert store.lineage(session, 'a', v4) == []
+    assert v4 == SeriesStore.version_token(changed)
+    pd.testing.assert_frame_equal(store.get(session, 'a', start='2024-01-10', end='2024-01-12'),
+                                  changed.iloc[9:12].reset_index(drop=True), check_freq=False)
+
+
+def test_append_reaches_a_fresh_store_through_the_db(tmp_path, session, daily_frame):
+    db = MetricDB(str(tmp_path / 'series.db'))
+    df = daily_frame('2024-01-01', 10, seed=0)
+    v1 = SeriesStore(db=db).put(session, 'a', df.iloc[:6])
+    v2 = SeriesStore(db=db).append(session, 'a', df.iloc[6:], v1)
+    reader = SeriesStore(db=db)
+    assert reader.version(session, 'a') == v2
+    pd.testing.assert_frame_equal(reader.get(session, 'a', v2), df, check_freq=False)
+
+
+def _expected_corr(frames, start, end):
+    wide = pd.concat({k: f.set_index('Date')['Value'] for k, f in frames.items()}, axis=1)
+    return wide.loc[start:end].corr()
+
+
+def test_window_corr_slides_with_appends(store, session, daily_frame):
+    full = {name: daily_frame('2024-01-01', 120, seed=seed, gaps=0.1) for seed, name in enumerate('abc')}
+    # 'c' starts later, so early windows only partly cover it
+    full['c'] = full['c'].iloc[15:].reset_index(drop=True)
+    tokens = {name: store.put(session, name, df.iloc[:len(df) - 30]) for name, df in full.items()}
+    start, end = pd.Timestamp('2024-01-01'), pd.Timestamp('2024-02-29')
+    names, sums = store.window_corr(session, tokens, start, end)
+    pd.testing.assert_frame_equal(corr_frame(sums, names), _expected_corr(full, start, end), check_names=False)
+
+    for step in range(3):
+        for name, df in full.items():
+            rows = df.iloc[len(df) - 30 + 10 * step:len(df) - 20 + 10 * step]
+            tokens[name] = store.append(session, name, rows, tokens[name])
+        start, end = start + pd.Timedelta(days=10), end + pd.Timedelta(days=10)
+        names, sums = store.window_corr(session, tokens, start, end)
+        pd.testing.assert_frame_equal(corr_frame(sums, names), _expected_corr(full, start, end),
+                                      check_names=False, atol=1e-10)
+    # the last three windows were updated in place, not rebuilt
+    assert SERIES_STATS_CACHE.get(f'window-corr|{session}|{names!r}|{end - start}')[4] == 3
+
+
+def test_window_corr_rebuilds_after_a_replace(store, session, daily_frame):
+    frames = {name: daily_frame('2024-01-01', 60, seed=seed) for seed, name in enumerate('ab')}
+    tokens = {name: store.put(session, name, df) for name, df in frames.items()}
+    store.window_corr(session, tokens, '2024-01-01', '2024-01-31')
+    frames['b'] = frames['b'].assign(Value=frames['b']['Value'][::-1].to_numpy())
+    tokens['b'] = store.put(session, 'b', frames['b'])
+    names, sums = store.window_corr(session, tokens, '2024-01-05', '2024-02-04')
+    pd.testing.assert_frame_equal(corr_frame(sums, names), _expected_corr(frames, '2024-01-05', '2024-02-04'),
+                                  check_names=False)
+
+
+def test_corr_sums_add_and_remove_rows():
+    rng = np.random.default_rng(1)
+    matrix = rng.standard_normal((200, 4)) * [1, 10, 1e3, 1e-3] + [0, 5, 1e6, 0]
+    matrix[rng.random(matrix.shape) < 0.2] = np.nan
+    sums = CorrSums(np.nanmean(matrix[:50], axis=0)).update(matrix[:150])
+    sums.update(matrix[:50], sign=-1).update(matrix[150:])
+    expected = pd.DataFrame(matrix[50:]).corr().to_numpy()
+    np.testing.assert_allclose(sums.corr(), expected, atol=1e-10)
+    np.testing.assert_array_equal(sums.counts(), (~np.isnan(matrix[50:])).sum(axis=0))
+    np.testing.assert_allclose(sums.variances(), np.nanvar(matrix[50:], axis=0), rtol=1e-9)
+    np.testing.assert_allclose(sums.subset([0, 2]).corr(), expected[np.ix_([0, 2], [0, 2])], atol=1e-10)
+
+
+def test_corr_sums_min_periods():
+    matrix = np.array([[1.0, np.nan], [2.0, 1.0], [3.0, np.nan]])
+    corr = CorrSums(np.zeros(2)).update(matrix).corr()
+    assert corr[0, 0] == pytest.approx(1.0)
+    assert np.isnan(corr[0, 1]) and np.isnan(corr[1, 1])
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import Timeframe_corr, tf_label_to_tuple
+
+
+def _weeks(df, timeframes):
+    # one column per timeframe, one row per day of it, NaN where the day is missing
+    columns = {}
+    for label, start, end in timeframes:
+        days = pd.date_range(start, end)
+        columns[label] = df.set_index('Date')['Value'].reindex(days).to_numpy()
+    return pd.DataFrame(columns)
+
+
+@pytest.mark.parametrize('missing', [[], [30], [29, 44, 55], [28]])
+def test_timeframes_align_by_day(missing):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=56), 'Value': rng.standard_normal(56)})
+    timeframes, _ = tf_label_to_tuple(df.copy(), 'Last 28 days')
+    df = df.drop(index=missing).reset_index(drop=True)
+    expected = _weeks(df, timeframes).corr()
+    pd.testing.assert_frame_equal(Timeframe_corr(df, timeframes), expected, atol=1e-12)
+
+
+def test_missing_day_does_not_shift_the_rest_of_the_week():
+    # identical weeks correlate perfectly, even with a day missing from one of them
+    week = np.array([1.0, 5.0, 2.0, 8.0, 3.0, 9.0, 4.0])
+    df = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=14), 'Value': np.tile(week, 2)})
+    timeframes, _ = tf_label_to_tuple(df.copy(), 'Last 14 days')
+    corr = Timeframe_corr(df.drop(index=9), timeframes)
+    assert corr.iloc[0, 1] == pytest.approx(1.0)
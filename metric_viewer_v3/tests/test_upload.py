@@ -0,0 +1,98 @@
+import base64
+
+import pandas as pd
+import pytest
+
+from utils import encode_frame, process_upload_data, read_csv_upload, split_upload_frame
+
+
+def _upload(text):
+    df, message = read_csv_upload(text.encode())
+    assert message is None
+    return df
+
+
+def test_single_value_column():
+    df = _upload("Date,Value\n2024-01-02,2\n2024-01-01,1\n2024-01-03,3\n")
+    series, message = split_upload_frame(df)
+    assert message is None
+    assert list(series) == ['Value']
+    assert series['Value']['Value'].tolist() == [1.0, 2.0, 3.0]  # sorted by date
+    assert list(series['Value'].columns) == ['Date', 'Value']
+
+
+def test_single_value_column_through_session_payload():
+    df = _upload("Date,Value\n2024-01-01,1\n2024-01-02,2\n")
+    processed, message = process_upload_data(encode_frame(df))
+    assert message is None
+    assert processed['Value'].tolist() == [1.0, 2.0]
+
+
+def test_wide_layout():
+    df = _upload("Date,visits,Value,Metric\n2024-01-01,1,10,100\n2024-01-02,2,20,200\n")
+    series, message = split_upload_frame(df)
+    assert message is None
+    assert sorted(series) == ['Metric', 'Value', 'visits']
+    assert series['Metric']['Value'].tolist() == [100.0, 200.0]
+    assert series['Value']['Value'].tolist() == [10.0, 20.0]
+
+
+def test_long_layout_text_ids():
+    df = _upload("Date,kind,amount\n2024-01-02,a,2\n2024-01-01,a,1\n2024-01-01,b,5\n")
+    series, message = split_upload_frame(df)
+    assert message is None
+    assert series['a']['Value'].tolist() == [1.0, 2.0]
+    assert series['b']['Value'].tolist() == [5.0]
+
+
+@pytest.mark.parametrize('id_col', ['Metric', 'ID', 'metric_id', 'Series'])
+def test_long_layout_numeric_ids(id_col):
+    df = _upload(f"Date,{id_col},Value\n2024-01-01,7,1\n2024-01-02,7,2\n2024-01-01,12,5\n")
+    series, message = split_upload_frame(df)
+    assert message is None
+    assert sorted(series) == ['12', '7']
+    assert series['7']['Value'].tolist() == [1.0, 2.0]
+
+
+def test_long_layout_numeric_ids_as_floats():
+    # e.g. an Excel upload, where the ids arrive as a float column
+    df = pd.DataFrame({'Date': pd.to_datetime(['2024-01-01', '2024-01-02']), 'Metric': [7.0, 7.0], 'Value': [1.0, 2.0]})
+    series, message = split_upload_frame(df)
+    assert message is None
+    assert list(series) == ['7']
+
+
+def test_bad_layouts_are_reported():
+    assert split_upload_frame(_upload("Date,Value\n2024-01-01,x\n"))[1] is not None
+    assert split_upload_frame(_upload("Date,a,b,c\n2024-01-01,x,y,1\n"))[1] is not None
+    processed, message = process_upload_data({'format': 'columnar', 'order': ['Date'], 'length': 0, 'columns': {
+        'Date': {'kind': 'list', 'data': []}}})
+    assert processed is None and message
+
+
+def test_rows_without_a_valid_date_are_dropped():
+    df = _upload("Date,Value\n2024-01-01,1\n,2\nnot a date,3\n2024-01-04,4\n")
+    assert len(df) == 2 and df['Date'].notna().all()
+    assert df.attrs['dropped_rows'] == 2
+    assert _upload("Date,Value\n2024-01-01,1\n").attrs['dropped_rows'] == 0
+    series, message = split_upload_frame(df)
+    assert message is None
+    assert series['Value']['Value'].tolist() == [1.0, 4.0]
+    decoded = split_upload_frame(df.assign(Date=df['Date'].where(df['Value'] < 4)))[0]
+    assert decoded['Value']['Value'].tolist() == [1.0]
+
+
+def test_file_without_valid_dates_is_rejected():
+    df, message = read_csv_upload(b"Date,Value\nfoo,1\nbar,2\n")
+    assert df is None and 'datetime' in message
+
+
+def test_upload_message_reports_skipped_rows():
+    from callbacks.overview_callbacks import store_uploaded_data
+
+    def contents(text):
+        return 'data:text/csv;base64,' + base64.b64encode(text.encode()).decode()
+
+    payload, message = store_uploaded_data(contents("Date,Value\n2024-01-01,1\nbad,2\n,3\n"), 'metrics.csv')
+    assert payload is not None and message == "Skipped 2 rows without a valid date."
+    assert store_uploaded_data(contents("Date,Value\n2024-01-01,1\n"), 'metrics.csv')[1] == ""
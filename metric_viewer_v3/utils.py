@@ -1,17 +1,92 @@
 from datetime import date, timedelta, datetime
+import abc
+import base64
 import calendar
+import functools
+import hashlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+import time
+import warnings
+import diskcache
 import numpy as np
 import pandas as pd
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-from sklearn.metrics import mean_squared_error
-from math import sqrt
+
+# faster CSV parser engine for uploads; pandas imports it when a parse uses it
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Shared on-disk location for caches and background job state
+CACHE_DIR = os.environ.get('METRIC_VIEWER_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+
+# Shared calendar index
+class CalendarIndex:
+    """
+    Calendar facts for every day of a span, computed with vectorized date arithmetic:
+    weekday (Monday=0), weekend flag, ISO year/week, month bucket and named special days.
+    Build it through calendar_index(), which memoizes it per (anchor date, span);
+    the arrays are shared between callers and must not be modified.
+    """
+    def __init__(self, anchor_date, span_days):
+        end = np.datetime64(anchor_date, 'D')
+        self.dates = np.arange(end - (span_days - 1), end + 1, dtype='datetime64[D]')
+        self.weekday = (self.dates.view('int64') + 3) % 7  # 1970-01-01 was a Thursday
+        self.is_weekend = self.weekday >= 5
+        iso = pd.DatetimeIndex(self.dates).isocalendar()
+        self.iso_year = iso['year'].to_numpy(dtype='int64')
+        self.iso_week = iso['week'].to_numpy(dtype='int64')
+        self.month = self.dates.astype('datetime64[M]')
+        self.special_days = {
+            'Weekends': self.dates[self.is_weekend],
+        }
+        for arr in [self.dates, self.weekday, self.is_weekend, self.iso_year, self.iso_week, self.month]:
+            arr.flags.writeable = False
+
+    @property
+    def start(self):
+        return self.dates[0]
+
+    @property
+    def end(self):
+        return self.dates[-1]
+
+    def positions(self, dates):
+        """Positions of the given dates (any datetime-like array, times are floored to the day) in the index."""
+        days = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+        return (days - self.start).astype('int64')
+
+    def __len__(self):
+        return len(self.dates)
+
+
+@functools.lru_cache(maxsize=64)
+def _calendar_index(anchor_date, span_days):
+    return CalendarIndex(anchor_date, span_days)
+
+
+def calendar_index(anchor_date, span_days=90):
+    """Memoized CalendarIndex of the span_days days ending at anchor_date (inclusive)."""
+    return _calendar_index(pd.Timestamp(anchor_date).date(), int(span_days))
+
+
+def calendar_for(dates):
+    """Memoized CalendarIndex covering every day from min(dates) to max(dates)."""
+    days = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+    first, last = days.min(), days.max()
+    return calendar_index(last.astype(object), int((last - first).astype('int64')) + 1)
 
 
 # params for timeframes
 class DefaultParams:
     def __init__(self, latest_date=None):
         self.today = date.today()
-        self.global_timeframe = (self.today - timedelta(days=89), self.today)  # last 90 days including today
+        # last 90 days including today
+        self.calendar = calendar_index(self.today, 90)
+        self.global_timeframe = (self.calendar.start.astype(object), self.calendar.end.astype(object))
 
         # latest_date: if not provided, use today
         self.latest_date = latest_date if latest_date else self.today
@@ -33,16 +108,7 @@ class DefaultParams:
         }
 
         # special_days: all weekends in the last 90 days
-        self.special_days = self._get_weekends_in_range(self.global_timeframe[0], self.global_timeframe[1])
-
-    def _get_weekends_in_range(self, start_date, end_date):
-        weekends = []
-        current = start_date
-        while current <= end_date:
-            if current.weekday() >= 5:  # Saturday=5, Sunday=6
-                weekends.append(current)
-            current += timedelta(days=1)
-        return weekends
+        self.special_days = self.calendar.special_days['Weekends'].astype(object).tolist()
 
 # params for timeseries    
 class MockTimeSeriesParams:
@@ -54,7 +120,7 @@ class MockTimeSeriesParams:
         length=90,
         trend_type='increasing',  # 'stable', 'increasing', 'decreasing', 'cyclical', 'random'
         fluctuation='low',    # 'low', 'high', 'none'
-        base_value=np.random.randint(100,300),
+        base_value=None,      # None: drawn from [100, 300) per instance
         trend_strength=1.0,   # magnitude of increase/decrease per step
         fluctuation_strength=5,  # stddev for noise
         seasonality_period=15,   # e.g., 7 for weekly, 30 for monthly
@@ -64,7 +130,7 @@ class MockTimeSeriesParams:
         self.length = length
         self.trend_type = trend_type
         self.fluctuation = fluctuation
-        self.base_value = base_value
+        self.base_value = base_value if base_value is not None else int(np.random.default_rng(random_seed).integers(100, 300))
         self.trend_strength = trend_strength
         self.fluctuation_strength = fluctuation_strength
         self.seasonality_period = seasonality_period
@@ -96,57 +162,461 @@ TIMEFRAME_COLORS = {
     'Global': '#7f7f7f',        # gray
 }
 
+# Downsampling for plots
+MAX_PLOT_POINTS = int(os.environ.get('MAX_PLOT_POINTS', 2000))  # per trace, roughly the chart's pixel width x 2
+
+
+def minmax_downsample(y, n_out):
+    """
+    Shape-preserving downsampling: splits y into n_out // 2 equal buckets and keeps the
+    minimum and the maximum of every bucket (plus the first and last point), so peaks and
+    dips survive. Fully vectorized.
+
+    Returns:
+        np.ndarray: sorted positions of the points to keep.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(n_out // 2, 1)
+    bucket = np.arange(n) * n_buckets // n
+    # sort by (bucket, value): each bucket's first row is its min, its last row its max
+    order = np.lexsort((np.nan_to_num(y, nan=-np.inf), bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets), side='left')
+    ends = np.searchsorted(bucket[order], np.arange(n_buckets), side='right') - 1
+    keep = np.concatenate(([0, n - 1], order[starts], order[ends]))
+    return np.unique(keep)
+
+
+def downsample_frame(df, x_range=None, n_out=None, x='Date', y='Value'):
+    """
+    Cuts a date-sorted frame to x_range (start, end) if given and min-max downsamples it
+    to about n_out points (MAX_PLOT_POINTS by default).
+    """
+    n_out = n_out or MAX_PLOT_POINTS
+    if x_range is not None:
+        dates = df[x].to_numpy(dtype='datetime64[ns]')
+        i = np.searchsorted(dates, np.datetime64(pd.Timestamp(x_range[0]), 'ns'), side='left')
+        j = np.searchsorted(dates, np.datetime64(pd.Timestamp(x_range[1]), 'ns'), side='right')
+        # keep one point either side so lines run to the edge of the view
+        df = df.iloc[max(i - 1, 0):j + 1]
+    if len(df) <= n_out:
+        return df
+    return df.iloc[minmax_downsample(df[y].to_numpy(dtype=float), n_out)]
+
+
 def stats_by_ser(df):
+    """
+    Flags the 'Last 3 Weeks' (last 21 weekdays), 'Last 3 Days' (last 3 weekdays) and 'Weekends'
+    rows of every series in a combined DataFrame and averages 'Value' over each period.
+
+    Args:
+        df (pd.DataFrame): Combined DataFrame with 'Date', 'Value' and 'Timeseries' columns.
+            The period flag columns are added to it in place.
+
+    Returns:
+        tuple: (DataFrame of period means indexed by Timeseries, copy of df with the flag columns)
+    """
     periods = ['Last 3 Weeks','Last 3 Days','Weekends']
-    is_weekday = df['Date'].dt.weekday < 5
-    weekday_df = df.loc[is_weekday] # excludes weekends
+    cal = calendar_for(df['Date'])
+    is_weekday = ~cal.is_weekend[cal.positions(df['Date'])]
+    weekday_pos = np.flatnonzero(is_weekday)
+    # rank weekdays from the latest one backwards, separately for every series
+    weekday_rank = (
+        df.iloc[weekday_pos]
+        .groupby('Timeseries', sort=False)['Date']
+        .rank(method='first', ascending=False)
+        .to_numpy()
+    )
+    last_3_days = np.zeros(len(df), dtype=int)
+    last_3_weeks = np.zeros(len(df), dtype=int)
+    last_3_days[weekday_pos] = weekday_rank <= 3
+    last_3_weeks[weekday_pos] = weekday_rank <= 21
+
     df[periods[2]] = ~is_weekday
-    df[periods[1]] = df['Date'].apply(lambda x: 1 if x in weekday_df.iloc[-3:]['Date'].tolist() else 0)
-    df[periods[0]] = df['Date'].apply(lambda x: 1 if x in weekday_df.iloc[-21:]['Date'].tolist() else 0)
+    df[periods[1]] = last_3_days
+    df[periods[0]] = last_3_weeks
     st_df = df.copy()
-    df_p2 = df.loc[df[periods[2]]==True,['Date','Value','Timeseries']]
-    df_p1 = df.loc[df[periods[1]]==1,['Date','Value','Timeseries']]
-    df_p0 = df.loc[df[periods[0]]==1,['Date','Value','Timeseries']]
-    result_df = pd.DataFrame()
-    for df in [df_p2,df_p1,df_p0]:
-        tmp = df.groupby('Timeseries')['Value'].mean()
-        result_df = pd.concat([result_df,tmp],axis=1)
-    result_df.columns = periods
+
+    # one groupby for all periods: mask out values outside each period and average the rest
+    masked = pd.DataFrame(
+        {
+            periods[0]: df['Value'].where(last_3_weeks == 1),
+            periods[1]: df['Value'].where(last_3_days == 1),
+            periods[2]: df['Value'].where(~is_weekday),
+        },
+        index=df.index,
+    )
+    result_df = masked.groupby(df['Timeseries']).mean()
+    result_df.index.name = None
     return result_df, st_df
 
-# Function to process uploaded CSV data
-def process_upload_data(upload_data):
+class PeriodStats:
     """
-    Processes uploaded CSV data to ensure the first column is datetime and the second is float.
-    Returns a tuple: (processed DataFrame or None, message or None)
+    Running totals behind the stats_by_ser period means of one series, so that a series
+    that grows by a few days is updated from the new rows only: the weekend sum and count
+    over the whole history, and the last 21 weekday observations.
+    Rows must be added in date order (see extend).
+    """
+    TAIL = 21
+
+    def __init__(self):
+        self.weekend_sum = 0.0
+        self.weekend_count = 0
+        self.tail_dates = np.empty(0, dtype='datetime64[ns]')  # last TAIL weekday rows
+        self.tail_values = np.empty(0)
+        self.last_date = None
+
+    @classmethod
+    def from_frame(cls, df):
+        stats = cls()
+        stats.extend(df)
+        return stats
+
+    def extend(self, df):
+        """Adds rows (DataFrame with 'Date' and 'Value') dated after every row added so far."""
+        if len(df) == 0:
+            return self
+        dates = np.asarray(df['Date'].values, dtype='datetime64[ns]')
+        values = df['Value'].to_numpy(dtype=float)
+        if self.last_date is not None and dates.min() <= self.last_date:
+            raise ValueError("PeriodStats rows must come after the rows already added")
+        order = np.argsort(dates, kind='stable')
+        dates, values = dates[order], values[order]
+        cal = calendar_for(dates)
+        weekend = cal.is_weekend[cal.positions(dates)]
+        observed = ~np.isnan(values)
+        self.weekend_sum += float(values[weekend & observed].sum())
+        self.weekend_count += int((weekend & observed).sum())
+        self.tail_dates = np.concatenate([self.tail_dates, dates[~weekend]])[-self.TAIL:]
+        self.tail_values = np.concatenate([self.tail_values, values[~weekend]])[-self.TAIL:]
+        self.last_date = dates[-1]
+        return self
+
+    def means(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # no observed rows in a period
+            return {
+                'Last 3 Weeks': np.nanmean(self.tail_values) if len(self.tail_values) else np.nan,
+                'Last 3 Days': np.nanmean(self.tail_values[-3:]) if len(self.tail_values) else np.nan,
+                'Weekends': self.weekend_sum / self.weekend_count if self.weekend_count else np.nan,
+            }
+
+    def spans(self):
+        """First and last date of the 'Last 3 Weeks' and 'Last 3 Days' periods, or None."""
+        if not len(self.tail_dates):
+            return {}
+        return {
+            'Last 3 Weeks': (pd.Timestamp(self.tail_dates[0]), pd.Timestamp(self.tail_dates[-1])),
+            'Last 3 Days': (pd.Timestamp(self.tail_dates[-3:][0]), pd.Timestamp(self.tail_dates[-1])),
+        }
+
+
+def period_stats_frame(stats_by_name):
     """
+    Period means of several series from their PeriodStats, in the layout of stats_by_ser's
+    first result, plus {period: (start, end)} spanning every series' 'Last 3 Weeks'/'Last 3 Days' rows.
+    """
+    periods = ['Last 3 Weeks', 'Last 3 Days', 'Weekends']
+    names = sorted(stats_by_name)
+    result_df = pd.DataFrame([stats_by_name[name].means() for name in names], index=names, columns=periods)
+    spans = {}
+    for stats in stats_by_name.values():
+        for period, (start, end) in stats.spans().items():
+            old = spans.get(period)
+            spans[period] = (start, end) if old is None else (min(old[0], start), max(old[1], end))
+    return result_df, spans
+
+
+# Compact columnar wire format for dcc.Store payloads
+_NS_PER_DAY = 86_400 * 10**9
+_NS_PER_SECOND = 10**9
+
+
+def _pack(arr):
+    return base64.b64encode(np.ascontiguousarray(arr).tobytes()).decode('ascii')
+
+
+def _unpack(text, dtype):
+    # frombuffer views the (read-only) bytes; copy so the frame is writable
+    return np.frombuffer(base64.b64decode(text), dtype=dtype).copy()
+
+
+def encode_frame(df, float_dtype='float64'):
+    """
+    Packs a DataFrame into a compact, JSON-safe columnar dict for dcc.Store.
+
+    Datetime columns become base64 int64 offsets from the epoch (in days when every
+    timestamp is at midnight, seconds otherwise) plus the row numbers of any NaT,
+    numeric and boolean columns become base64 float64 (or float_dtype) arrays,
+    categorical columns become their categories plus base64 int32 codes and anything
+    else is kept as a plain list.
+
+    Args:
+        df (pd.DataFrame): Frame to encode.
+        float_dtype (str, optional): 'float64' (lossless) or 'float32' (half the size).
+
+    Returns:
+        dict: Payload that decode_frame turns back into the DataFrame.
+    """
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            ns = col.values.astype('datetime64[ns]').view('int64')
+            missing = col.isna().to_numpy()
+            if missing.any():
+                ns = np.where(missing, 0, ns)  # NaT's int64 sentinel would overflow the unit conversion
+            if (ns % _NS_PER_DAY == 0).all():
+                columns[name] = {'kind': 'datetime', 'unit': 'D', 'data': _pack(ns // _NS_PER_DAY)}
+            else:
+                columns[name] = {'kind': 'datetime', 'unit': 's', 'data': _pack(ns // _NS_PER_SECOND)}
+            if missing.any():
+                columns[name]['missing'] = _pack(np.flatnonzero(missing).astype('int64'))  # rows restored as NaT
+        elif isinstance(col.dtype, pd.CategoricalDtype):
+            columns[name] = {'kind': 'category', 'categories': col.cat.categories.tolist(),
+                             'data': _pack(col.cat.codes.to_numpy(dtype='int32'))}
+        elif pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+            columns[name] = {'kind': 'float', 'dtype': float_dtype, 'data': _pack(col.to_numpy(dtype=float_dtype))}
+        else:
+            columns[name] = {'kind': 'list', 'data': col.tolist()}
+    return {'format': 'columnar', 'length': len(df), 'order': [str(c) for c in df.columns], 'columns': columns}
+
+
+def decode_frame(payload):
+    """
+    Rebuilds a DataFrame from encode_frame output. Plain record lists (the old
+    to_dict('records') format) are still accepted.
+    """
+    if payload is None:
+        return None
+    if not isinstance(payload, dict) or payload.get('format') != 'columnar':
+        return pd.DataFrame(payload)
+    data = {}
+    for name in payload['order']:
+        col = payload['columns'][name]
+        if col['kind'] == 'datetime':
+            offsets = _unpack(col['data'], 'int64')
+            dates = pd.to_datetime(offsets, unit=col['unit']).to_numpy(dtype='datetime64[ns]')
+            if 'missing' in col:
+                dates[_unpack(col['missing'], 'int64')] = np.datetime64('NaT')
+            data[name] = dates
+        elif col['kind'] == 'float':
+            data[name] = _unpack(col['data'], col['dtype'])
+        elif col['kind'] == 'category':
+            data[name] = pd.Categorical.from_codes(_unpack(col['data'], 'int32'), categories=col['categories'])
+        else:
+            data[name] = col['data']
+    return pd.DataFrame(data, columns=payload['order'])
+
+
+# Upload ingestion limits
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_MB', 512)) * 2**20        # raw CSV size
+UPLOAD_MEMORY_LIMIT = int(os.environ.get('UPLOAD_MEMORY_MB', 1024)) * 2**20  # parsed columns
+UPLOAD_CHUNK_ROWS = int(os.environ.get('UPLOAD_CHUNK_ROWS', 1_000_000))
+UPLOAD_CHUNK_BYTES = 64 * 2**20  # files above this are parsed in chunks
+
+
+# Column names that mark the metric id column of a long-format upload (date, metric, value)
+METRIC_ID_COLUMNS = {'metric', 'metric_id', 'metric_name', 'metricid', 'id', 'series', 'series_id', 'name', 'kpi'}
+
+
+def long_format_metric_column(columns):
+    """The metric id column if 'columns' is a long-format layout (date, metric id, value), else None."""
+    if len(columns) == 3 and str(columns[1]).strip().lower().replace(' ', '_') in METRIC_ID_COLUMNS:
+        return columns[1]
+    return None
+
+
+def _typed_chunk(chunk, date_col, text_cols, offset):
+    # Validates one parsed chunk: first column datetime, text columns categorical, the rest float64.
+    # Rows with a missing or unparseable date are dropped
+    try:
+        dates = chunk[date_col]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # "could not infer format" for the odd bad row
+                dates = pd.to_datetime(dates, errors='coerce')
+    except Exception:
+        return None, f"First column '{date_col}' could not be converted to datetime (rows from {offset})."
+    valid = dates.notna().to_numpy()
+    if not valid.all():
+        chunk, dates = chunk[valid], dates[valid]
+    out = {date_col: dates.to_numpy(dtype='datetime64[ns]')}
+    for col in chunk.columns[1:]:
+        if col in text_cols:
+            out[col] = pd.Categorical(chunk[col].astype(str))
+            continue
+        try:
+            out[col] = pd.to_numeric(chunk[col], errors='raise').to_numpy(dtype='float64')
+        except Exception:
+            return None, f"Column '{col}' could not be converted to float (rows from {offset})."
+    return out, None
+
+
+def read_csv_upload(decoded):
+    """
+    Parses an uploaded CSV straight from its decoded bytes into a typed DataFrame:
+    the first column as datetime, text columns (e.g. the metric name of a long-format
+    file, detected from the first rows) as categorical and every other column as float64.
+
+    Rows with a missing or unparseable date are dropped (their number is returned in
+    df.attrs['dropped_rows'] for the upload message); a file without a single valid date
+    is rejected.
+
+    Small files are parsed in one go with the pyarrow engine when it is installed.
+    Files over UPLOAD_CHUNK_BYTES are parsed UPLOAD_CHUNK_ROWS rows at a time; each chunk
+    is validated and reduced to NumPy arrays before the next one is read, and the parse
+    is aborted once the parsed data passes UPLOAD_MEMORY_LIMIT.
+
+    Args:
+        decoded (bytes): The raw CSV file contents.
+
+    Returns:
+        tuple: (DataFrame or None, error message or None)
+    """
+    if len(decoded) > UPLOAD_MAX_BYTES:
+        return None, f"File is larger than {UPLOAD_MAX_BYTES // 2**20} MB."
     try:
-        df = pd.DataFrame(upload_data)
+        sample = pd.read_csv(io.BytesIO(decoded), nrows=1000)
     except Exception as e:
-        return None, f"Error in upload data transformation attempt: {e}"
+        return None, f"Could not read CSV header: {e}"
+    header = sample.columns
+    if len(header) < 2:
+        return None, "CSV must have a date column and at least one value column."
+    date_col = header[0]
+    text_cols = {col for col in header[1:] if not pd.api.types.is_numeric_dtype(sample[col])}
+    metric_col = long_format_metric_column(header)
+    if metric_col is not None:
+        text_cols.add(metric_col)  # numeric metric ids stay ids ('7', not 7.0)
+    # values are read as float64 by the parser itself, dates are parsed per chunk
+    dtypes = {col: (str if col in text_cols else 'float64') for col in header[1:]}
+
+    try:
+        if len(decoded) <= UPLOAD_CHUNK_BYTES:
+            engine = 'pyarrow' if HAS_PYARROW else 'c'
+            chunks = [pd.read_csv(io.BytesIO(decoded), dtype=dtypes, engine=engine)]
+        else:
+            chunks = pd.read_csv(io.BytesIO(decoded), dtype=dtypes, engine='c', chunksize=UPLOAD_CHUNK_ROWS)
 
-    if df.shape[1] != 2:
-        return None, "CSV must have at exactly two columns."
+        parts, nbytes, offset, n_dated = [], 0, 0, 0
+        for chunk in chunks:
+            part, message = _typed_chunk(chunk, date_col, text_cols, offset)
+            if message:
+                return None, message
+            nbytes += sum(arr.nbytes for arr in part.values())  # categoricals count codes + categories
+            if nbytes > UPLOAD_MEMORY_LIMIT:
+                return None, f"Parsed data is larger than {UPLOAD_MEMORY_LIMIT // 2**20} MB."
+            parts.append(part)
+            offset += len(chunk)
+            n_dated += len(part[date_col])
+    except ValueError as e:
+        return None, f"CSV values could not be parsed as numbers: {e}"
+    except Exception as e:
+        return None, f"Could not parse CSV: {e}"
+
+    if offset and not n_dated:
+        return None, f"First column '{date_col}' could not be converted to datetime."
+    columns = {
+        col: pd.api.types.union_categoricals([part[col] for part in parts]) if col in text_cols
+        else np.concatenate([part[col] for part in parts])
+        for col in header
+    }
+    df = pd.DataFrame(columns, columns=header)
+    df.attrs['dropped_rows'] = offset - n_dated
+    return df, None
+
+
+def split_upload_frame(df):
+    """
+    Splits an uploaded table into one (Date, Value) series per metric. Supported layouts:
+    - date + one value column: a single series named after the value column
+    - wide: date + N numeric metric columns
+    - long: date, metric id, value - recognised by the metric id column's name (Metric, ID,
+      Series, ... see METRIC_ID_COLUMNS), so numeric ids work, or by it holding text
+    Wide tables are melted to long and every layout is split with a single groupby.
+
+    Args:
+        df (pd.DataFrame): Uploaded table, date in the first column.
+
+    Returns:
+        tuple: ({metric name: DataFrame with 'Date' and 'Value' columns sorted by date} or None,
+            error message or None)
+    """
+    if df.shape[1] < 2:
+        return None, "CSV must have a date column and at least one value column."
 
     # Attempt to convert first column to datetime
-    col1 = df.columns[0]
+    date_col = df.columns[0]
     try:
-        df[col1] = pd.to_datetime(df[col1])
+        dates = df[date_col]
+        if not pd.api.types.is_datetime64_any_dtype(dates):  # already typed by read_csv_upload
+            dates = pd.to_datetime(dates)
     except Exception:
-        return None, f"First column '{col1}' could not be converted to datetime."
+        return None, f"First column '{date_col}' could not be converted to datetime."
+
+    metric_col = long_format_metric_column(df.columns)
+    numeric, text = {}, []
+    for col in df.columns[1:]:
+        if col == metric_col:
+            continue
+        if df[col].dtype == np.float64:
+            numeric[col] = df[col]
+            continue
+        try:
+            numeric[col] = pd.to_numeric(df[col], errors='raise').astype(float)
+        except Exception:
+            text.append(col)
+    if metric_col is None and len(text) == 1 and len(numeric) == 1:
+        metric_col = text.pop()  # long layout with an unnamed (or oddly named) text metric column
+
+    if text:
+        if df.shape[1] == 2:
+            return None, f"Second column '{df.columns[1]}' could not be converted to float."
+        return None, "CSV must be date + value columns (wide) or date, metric, value (long)."
 
-    # Attempt to convert second column to float
-    col2 = df.columns[1]
+    if metric_col is not None:
+        metrics = df[metric_col]
+        if pd.api.types.is_float_dtype(metrics) and (metrics.dropna() % 1 == 0).all():
+            metrics = metrics.astype('Int64')  # ids that went through a float column: 7.0 -> '7'
+        long_df = pd.DataFrame({'Date': dates, 'Metric': metrics, 'Value': next(iter(numeric.values()))})
+    else:
+        # wide (or a single value column): one series per numeric column. Melted under internal
+        # names, since a value column may itself be called 'Value' or 'Metric'
+        long_df = (pd.DataFrame({'__date__': dates, **{f'__{i}__': v for i, v in enumerate(numeric.values())}})
+                   .melt(id_vars='__date__', var_name='__metric__', value_name='__value__')
+                   .rename(columns={'__date__': 'Date', '__metric__': 'Metric', '__value__': 'Value'}))
+        long_df['Metric'] = long_df['Metric'].map(dict(zip([f'__{i}__' for i in range(len(numeric))], numeric)))
+
+    long_df = long_df[long_df['Date'].notna()].sort_values(['Metric', 'Date'], kind='stable')
+    series = {
+        str(metric): group[['Date', 'Value']].reset_index(drop=True)
+        for metric, group in long_df.groupby('Metric', sort=False, observed=True)
+    }
+    if not series:
+        return None, "CSV has no rows."
+    return series, None
+
+
+# Function to process uploaded CSV data
+def process_upload_data(upload_data):
+    """
+    Processes uploaded CSV data to ensure the first column is datetime and the value column(s) float.
+    Multi-metric uploads (see split_upload_frame) return their first metric.
+    Returns a tuple: (processed DataFrame or None, message or None)
+    """
     try:
-        df[col2] = pd.to_numeric(df[col2], errors='raise').astype(float)
-    except Exception:
-        return None, f"Second column '{col2}' could not be converted to float."
+        df = decode_frame(upload_data)
+    except Exception as e:
+        return None, f"Error in upload data transformation attempt: {e}"
 
     try:
-        df.columns = ['Date','Value']
-    except:
-        pass
-    return df, None
+        series, message = split_upload_frame(df)
+    except Exception as e:
+        return None, f"Could not split the upload into series: {e}"
+    if message:
+        return None, message
+    return next(iter(series.values())), None
 
 def tf_label_to_tuple(df, timeframe_label):
     """
@@ -160,138 +630,1154 @@ def tf_label_to_tuple(df, timeframe_label):
         list: A list of tuples, where each tuple contains (label, start_date, end_date) for a 7-day period.
     """
     
-    df['Date'] = pd.to_datetime(df['Date'])
+    if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = pd.to_datetime(df['Date'])
     end_date = df['Date'].max()
     
     num_days = int(timeframe_label.split(' ')[1])
-    start_date = end_date - timedelta(days=num_days - 1)  # Inclusive of start & end
-    overall_tf = [(timeframe_label,start_date.date(),end_date.date())]
-    time_periods = []
-    current_start = start_date
-    delta = 13 if num_days == 56 else 6
-    while current_start <= end_date:
-        current_end = min(current_start + timedelta(days=delta), end_date)
-        label = f'{current_start.strftime("%m-%d")} to {current_end.strftime("%m-%d")}'
-        time_periods.append((label, current_start.date(), current_end.date()))  # Store dates, not datetimes
-        current_start = current_end + timedelta(days=1)
+    # only the day range is needed: plain datetime64 arithmetic, a CalendarIndex costs more to build
+    end = np.datetime64(end_date, 'D')
+    start = end - (num_days - 1)  # inclusive of start & end
+    overall_tf = [(timeframe_label, start.astype(object), end.astype(object))]
+    # consecutive 7-day (14-day for 56 days) periods from the start, the last one cut at end_date
+    step = 14 if num_days == 56 else 7
+    starts = np.arange(start, end + 1, step, dtype='datetime64[D]')
+    ends = np.minimum(starts + (step - 1), end)
+    time_periods = [
+        (f'{s.strftime("%m-%d")} to {e.strftime("%m-%d")}', s, e)  # Store dates, not datetimes
+        for s, e in zip(starts.astype(object), ends.astype(object))
+    ]
     
     return time_periods, overall_tf
 
 
+class SortedSeries:
+    """
+    A series kept sorted by date as two NumPy arrays, so that a timeframe resolves to an
+    index range with a binary search (searchsorted) and slices are zero-copy views.
+    """
+    def __init__(self, dates, values):
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        values = np.asarray(values, dtype=float)
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            order = np.argsort(dates, kind='stable')
+            dates, values = dates[order], values[order]
+        self.dates = dates
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, df):
+        if isinstance(df, cls):
+            return df
+        dates = df['Date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        return cls(dates.to_numpy(), df['Value'].to_numpy())
+
+    def bounds(self, start, end):
+        """Index range [i, j) of the rows with start <= Date <= end (None leaves that side open)."""
+        i = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        j = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+        return i, j
+
+    def slice(self, start, end):
+        i, j = self.bounds(start, end)
+        return self.values[i:j]
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _corr_of_slices(slices):
+    # slices: {label: (offsets, values)}, offsets being each value's time since its timeframe's
+    # start (timedelta64). Slices with the same offsets and no NaN are stacked into one 2-D
+    # array and correlated in one go; anything else is aligned on the offsets, so a missing day
+    # leaves a gap instead of shifting the days after it, and correlated pairwise-complete
+    labels = list(slices.keys())
+    offsets = [o for o, _ in slices.values()]
+    if len(offsets[0]) > 1 and all(np.array_equal(offsets[0], o) for o in offsets[1:]):
+        stacked = np.vstack([v for _, v in slices.values()])
+        if not np.isnan(stacked).any():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr = np.corrcoef(stacked)
+            return pd.DataFrame(corr, index=labels, columns=labels)
+    slice_df = pd.DataFrame({label: pd.Series(values, index=o) for label, (o, values) in slices.items()})
+    return slice_df.corr()
+
+
 def Timeframe_corr(series_df, timeframes):
     """
     Compute pairwise correlation for slices of a time series DataFrame based on equal-span timeframes.
 
     Parameters:
-    - series_df: pd.DataFrame with columns ['Date', 'Value']
+    - series_df: pd.DataFrame with columns ['Date', 'Value'] (or a SortedSeries)
     - timeframes: list of tuples -> (label, start_date, end_date)
 
     Returns:
     - pd.DataFrame containing the correlation matrix of valid timeframe slices
     """
 
-    # Ensure 'Date' column is datetime
-    series_df = series_df.copy()
-    series_df['Date'] = pd.to_datetime(series_df['Date'])
+    series = SortedSeries.from_frame(series_df)
 
     slices = {}
-
-    valid_timeframes = None
     duration_list = []
 
     for label, start, end in timeframes:
         start = pd.to_datetime(start)
         end = pd.to_datetime(end)
-        mask = (series_df['Date'] >= start) & (series_df['Date'] <= end)
-        values = series_df.loc[mask, 'Value'].values
-
         duration = (end - start).days + 1  # inclusive
         duration_list.append(duration)
-        # skip non-uniform spans or missing days
-        slices[label] = values
+        i, j = series.bounds(start, end)
+        slices[label] = (series.dates[i:j] - np.datetime64(start, 'ns'), series.values[i:j])
 
+    # skip timeframes whose span no other timeframe shares
     same_durations = [duration_list.count(d) > 1 for d in duration_list]
-    copy_of_slice_keys = list(slices.keys()).copy()
-    for label, duration_boolean in zip(copy_of_slice_keys, same_durations):
-        if not duration_boolean:
-            del slices[label]
     if sum(same_durations) < 2:
         corr_matrix = pd.DataFrame(data=['No timeframes with same duration span (>1 day)'])
         return corr_matrix
-    else:
-        # Create a DataFrame from slices
-        slice_df = pd.DataFrame(slices)
-        corr_matrix = slice_df.corr()
-        corr_matrix.index = slices.keys()
-        corr_matrix.columns = slices.keys()
+    slices = {label: values for (label, values), keep in zip(slices.items(), same_durations) if keep}
+    return _corr_of_slices(slices)
 
-    return corr_matrix
+def align_series(series_dict, start=None, end=None):
+    """
+    Joins several series on their shared date index in one vectorized pass.
 
-def Series_corr(series_dict, timeframes, tf_label):
-    tf_idx = [i for i, (lbl, _, _) in enumerate(timeframes) if lbl == tf_label]
-    if not tf_idx:
-        return pd.DataFrame()
-    tf_idx = tf_idx[0]
-    vals = []
-    names = []
-    min_len = None
+    Args:
+        series_dict (dict): {name: DataFrame with 'Date' and 'Value' columns, or SortedSeries}
+        start, end (date-like, optional): Only keep dates in [start, end].
+
+    Returns:
+        tuple: (sorted array of dates, list of names, 2-D array of shape (n_dates, n_series)
+            with NaN where a series has no observation on a date)
+    """
+    names, date_parts, value_parts, col_parts = [], [], [], []
     for name, df in series_dict.items():
-        tf_start, tf_end = timeframes[tf_idx][1], timeframes[tf_idx][2]
-        tf_start, tf_end = pd.to_datetime(tf_start),pd.to_datetime(tf_end)
-        # Ensure Date column is datetime
-        if not np.issubdtype(df['Date'].dtype, np.datetime64):
-            df = df.copy()
-            df['Date'] = pd.to_datetime(df['Date'])
-        v = df[(df['Date'] >= tf_start) & (df['Date'] <= tf_end)]['Value'].values
-        if len(v) == 0:
+        series = SortedSeries.from_frame(df)
+        i, j = series.bounds(start, end)
+        if j <= i:
             continue
-        if min_len is None or len(v) < min_len:
-            min_len = len(v)
-        vals.append(v)
+        date_parts.append(series.dates[i:j])
+        value_parts.append(series.values[i:j])
+        col_parts.append(np.full(j - i, len(names)))
         names.append(name)
-    if len(vals) < 2 or min_len is None or min_len == 0:
-        return pd.DataFrame(np.nan, index=names, columns=names)
-    trimmed = [arr[:min_len] for arr in vals]
-    data = np.column_stack(trimmed)
-    valid_cols = [i for i in range(data.shape[1]) if np.std(data[:, i]) > 1e-8]
-    if len(valid_cols) < 2:
-        return pd.DataFrame(np.nan, index=[names[i] for i in valid_cols], columns=[names[i] for i in valid_cols])
-    data = data[:, valid_cols]
+    if not names:
+        return np.array([], dtype='datetime64[ns]'), [], np.empty((0, 0))
+    dates, rows = np.unique(np.concatenate(date_parts), return_inverse=True)
+    matrix = np.full((len(dates), len(names)), np.nan)
+    matrix[rows, np.concatenate(col_parts)] = np.concatenate(value_parts)
+    return dates, names, matrix
+
+
+class CorrSums:
+    """
+    Sufficient statistics for the pairwise-complete Pearson correlation between the columns
+    of an aligned (dates x series) matrix with NaN gaps: for every pair the number of rows
+    where both are observed and the sums of x, x^2 and x*y over those rows.
+
+    Rows can be added and removed (update with sign=-1), so a sliding date window only
+    touches the rows that enter or leave it. Values are shifted by a fixed per-column
+    reference (e.g. the first window's means) so the sums don't lose precision.
+    """
+    def __init__(self, shift):
+        self.shift = np.asarray(shift, dtype=float)
+        k = len(self.shift)
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))   # sx[i, j]: sum of column i over rows where j is observed too
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def update(self, matrix, sign=1):
+        if len(matrix) == 0:
+            return self
+        mask = ~np.isnan(matrix)
+        observed = mask.astype(float)
+        centered = np.where(mask, matrix - self.shift, 0.0)
+        self.n += sign * (observed.T @ observed)
+        self.sx += sign * (centered.T @ observed)
+        self.sxx += sign * ((centered ** 2).T @ observed)
+        self.sxy += sign * (centered.T @ centered)
+        return self
+
+    def counts(self):
+        return np.rint(np.diag(self.n)).astype(int)
+
+    def variances(self):
+        """Population variance of every column over all its observed rows."""
+        n = np.diag(self.n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.maximum(np.diag(self.sxx) / n - (np.diag(self.sx) / n) ** 2, 0.0)
+
+    def corr(self, min_periods=2):
+        n = self.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.sxy - self.sx * self.sx.T / n
+            var_x = self.sxx - self.sx ** 2 / n
+            corr = cov / np.sqrt(var_x * var_x.T)
+        corr[n < min_periods] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def subset(self, cols):
+        sub = CorrSums(self.shift[cols])
+        for name in ('n', 'sx', 'sxx', 'sxy'):
+            setattr(sub, name, getattr(self, name)[np.ix_(cols, cols)])
+        return sub
+
+
+def corr_frame(sums, names):
+    """
+    Correlation DataFrame from CorrSums over 'names', leaving out series that are constant
+    (or have fewer than 2 observations) in the rows summed.
+    """
+    valid_cols = np.flatnonzero((sums.counts() >= 2) & (np.sqrt(sums.variances()) > 1e-8))
     valid_names = [names[i] for i in valid_cols]
-    corr = np.corrcoef(data, rowvar=False)
+    if len(valid_cols) < 2:
+        return pd.DataFrame(np.nan, index=valid_names, columns=valid_names)
+    corr = sums.subset(valid_cols).corr()
     return pd.DataFrame(corr, index=valid_names, columns=valid_names)
 
-def forc(df, forecast_days=56):
+
+def Series_corr(series_dict, timeframes, tf_label):
     """
-    Generates a SARIMAX forecast for the next 'forecast_days' days.
+    Correlation matrix between saved series over one timeframe. Series are aligned on their
+    dates and every pair is correlated over the days both of them have.
 
     Args:
-        df (pd.DataFrame): DataFrame with 'Date' and 'Value' columns.
-        forecast_days (int, optional): Number of days to forecast. Defaults to 56 (8 weeks).
+        series_dict (dict): {name: DataFrame with 'Date' and 'Value' columns}
+        timeframes (list): list of (label, start_date, end_date) tuples
+        tf_label (str): label of the timeframe to use
 
     Returns:
-        pd.DataFrame: DataFrame with 'Date' and 'Forecast' columns for the forecast period.
+        pd.DataFrame: correlation matrix indexed by series name. Series that are constant
+            over the timeframe are left out.
+    """
+    tf = [(start, end) for lbl, start, end in timeframes if lbl == tf_label]
+    if not tf:
+        return pd.DataFrame()
+    tf_start, tf_end = tf[0]
+    _, names, matrix = align_series(series_dict, tf_start, tf_end)
+    if len(names) < 2 or matrix.shape[0] == 0:
+        return pd.DataFrame(np.nan, index=names, columns=names)
+    # drop series that are constant (or have <2 points) within the timeframe
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+        shift = np.nan_to_num(np.nanmean(matrix, axis=0))
+    return corr_frame(CorrSums(shift).update(matrix), names)
+
+# Forecast cache
+class DiskTTLCache:
     """
+    Cache with a time-to-live on every entry (None: no expiry), stored with diskcache so
+    that every process sees it: gunicorn workers, forecast pool workers and Dash background
+    jobs. The size limit is in bytes and least recently used entries are culled first.
+    """
+    def __init__(self, directory, size_limit=256 * 2**20, ttl=3600):
+        self.ttl = ttl
+        self._cache = diskcache.Cache(directory, size_limit=size_limit,
+                                      eviction_policy='least-recently-used')
+
+    def get(self, key, default=None):
+        return self._cache.get(key, default=default)
+
+    def set(self, key, value):
+        self._cache.set(key, value, expire=self.ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def __len__(self):
+        return len(self._cache)
+
+
+def make_cache(name, ttl=3600, size_limit=256 * 2**20):
+    # Shared by every process through CACHE_DIR/<name>
+    return DiskTTLCache(os.path.join(CACHE_DIR, name), size_limit=size_limit, ttl=ttl)
+
+
+FORECAST_CACHE = make_cache('forecasts', ttl=6 * 3600)
+
+
+def series_hash(df, *extra):
+    """
+    Content hash of a prepared series (DatetimeIndex + 'Value' column) and any extra
+    parameters (model order, horizon, ...) that change the result.
+    """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(df.index.values.astype('datetime64[ns]').view('int64')).tobytes())
+    h.update(np.ascontiguousarray(df['Value'].to_numpy(dtype=float)).tobytes())
+    h.update(repr(extra).encode())
+    return h.hexdigest()
+
 
-    # Ensure the Date column is datetime
+def _prepare_series(df):
+    # Sort, index by date and put on a daily frequency, as the SARIMAX models expect
+    df = df.copy()
     df['Date'] = pd.to_datetime(df['Date'])
     df = df.sort_values(by='Date')
     df = df.reset_index(drop=True)
-    df.set_index('Date',inplace=True)
-    df = df.asfreq('D')
+    df.set_index('Date', inplace=True)
+    return df[['Value']].asfreq('D')
 
-    train_data = df[:-forecast_days]  # Use the last 56 days as the test set
-    test_data = df[-forecast_days:]
-    model = SARIMAX(train_data['Value'], order=(1, 1, 1), seasonal_order=(1, 1, 1, 15))
-    model_fit = model.fit()
-    # Make predictions
-    predictions = model_fit.forecast(steps=56)
-    rmse = sqrt(mean_squared_error(test_data['Value'], predictions))
-    print(f"RMSE: {rmse} on test data (last 56 days)")
-    # New prediction for future dates
-    model = SARIMAX(df['Value'], order=(1, 1, 1), seasonal_order=(1, 1, 1, 15))
-    model_fit = model.fit()
-    predictions = model_fit.forecast(steps=56)
+
+# Measured fit time per observation, shared so that pool workers and background jobs contribute
+# to the estimate (used by the 'auto' forecast engine). Kept apart from FORECAST_CACHE, without a
+# TTL, so clearing or expiring forecasts doesn't reset the engine selection
+DEFAULT_FIT_RATES = {'sarimax': 5e-3, 'ets': 2e-5}  # seconds per observation
+FIT_RATES = make_cache('fit-rates', ttl=None, size_limit=2**20)
+
+
+def _observe_fit(engine, seconds):
+    # instrumentation imports Flask, which nothing else in utils needs: load it on the first fit
+    import instrumentation
+    instrumentation.observe('forecast_fit_seconds', seconds, engine=engine)
+
+
+def _record_fit_rate(engine, seconds, n_obs):
+    if n_obs <= 0:
+        return
+    key = f'fit-rate:{engine}'
+    rate = seconds / n_obs
+    previous = FIT_RATES.get(key)
+    FIT_RATES.set(key, rate if previous is None else 0.8 * previous + 0.2 * rate)
+
+
+def fit_rate(engine):
+    """Recent average fit time per observation of a forecast engine, in seconds."""
+    rate = FIT_RATES.get(f'fit-rate:{engine}')
+    return DEFAULT_FIT_RATES.get(engine, 0.0) if rate is None else rate
+
+
+def _sarimax(endog, order, seasonal_order):
+    # statsmodels takes seconds to import, so it's loaded on the first fit rather than when a worker starts
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    return SARIMAX(endog, order=order, seasonal_order=seasonal_order)
+
+
+def warm_up():
+    """
+    Imports the analytics dependencies that are otherwise loaded on first use. The optional
+    gunicorn pre-fork hook (gunicorn.conf.py) calls this in the master, so workers forked
+    from it - and their forecast pools - start with them already loaded.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX  # noqa: F401
+
+
+def _fit_sarimax(endog, order, seasonal_order, start_params=None):
+    start = time.perf_counter()
+    model = _sarimax(endog, order, seasonal_order)
+    model_fit = model.fit(start_params=start_params, disp=False)
+    seconds = time.perf_counter() - start
+    _observe_fit('sarimax', seconds)
+    _record_fit_rate('sarimax', seconds, len(endog))
+    return model_fit
+
+
+def _forecast_frame(model_fit, forecast_days):
+    predictions = model_fit.forecast(steps=forecast_days)
     forecast_df = predictions.reset_index()
     forecast_df.columns = ['Date','Value']
     return forecast_df
+
+
+def _params_key(key):
+    # FORECAST_CACHE key of the fitted parameters behind the forecast cached under 'key'
+    return f'{key}:params'
+
+
+def _extend_sarimax(df, params, forecast_days, order, seasonal_order):
+    """
+    Forecast of a prepared series from SARIMAX parameters fitted on an earlier (shorter)
+    version of it: the new observations are run through the Kalman filter with the
+    parameters held fixed (what results.append(..., refit=False) does), no optimizer run.
+    """
+    start = time.perf_counter()
+    model = _sarimax(df['Value'], order, seasonal_order)
+    model_fit = model.filter(params)
+    _observe_fit('sarimax-extend', time.perf_counter() - start)
+    return _forecast_frame(model_fit, forecast_days)
+
+
+def _holdout_fit(df, forecast_days, order, seasonal_order):
+    # Fit on everything but the last 'forecast_days' days and score the forecast on them
+    train_data = df[:-forecast_days]
+    test_data = df[-forecast_days:]
+    model_fit = _fit_sarimax(train_data['Value'], order, seasonal_order)
+    predictions = model_fit.forecast(steps=forecast_days)
+    rmse = float(np.sqrt(np.mean((test_data['Value'].to_numpy() - predictions.to_numpy()) ** 2)))
+    return model_fit, rmse
+
+
+def forc_with_rmse(df, forecast_days=56, order=(1, 1, 1), seasonal_order=(1, 1, 1, 15),
+                   evaluate=True, use_cache=True):
+    """
+    Generates a SARIMAX forecast for the next 'forecast_days' days, optionally with the
+    RMSE of a holdout fit on the last 'forecast_days' days of the data.
+
+    With evaluate=True the holdout model is fitted first and the full-data model is
+    warm-started from its parameters. With evaluate=False only the full-data model is
+    fitted and the RMSE is None. The warm start can land the optimizer on slightly
+    different parameters, so the two are cached under separate keys.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Date' and 'Value' columns.
+        forecast_days (int, optional): Number of days to forecast. Defaults to 56 (8 weeks).
+        order (tuple, optional): SARIMAX (p, d, q) order.
+        seasonal_order (tuple, optional): SARIMAX (P, D, Q, s) seasonal order.
+        evaluate (bool, optional): Compute the holdout RMSE.
+        use_cache (bool, optional): Look up / store the result in FORECAST_CACHE.
+
+    Returns:
+        tuple: (forecast DataFrame with 'Date' and 'Value' columns, RMSE or None)
+    """
+
+    df = _prepare_series(df)
+    # the cold-started key is the one forecast_many uses
+    key = series_hash(df, 'sarimax-evaluated' if evaluate else 'sarimax', order, seasonal_order, forecast_days)
+    cached = FORECAST_CACHE.get(key) if use_cache else None
+    if cached is not None:
+        forecast_df, rmse = cached
+        return forecast_df.copy(), rmse
+
+    start_params, rmse = None, None
+    if evaluate:
+        holdout_fit, rmse = _holdout_fit(df, forecast_days, order, seasonal_order)
+        start_params = holdout_fit.params
+    # Prediction for future dates
+    model_fit = _fit_sarimax(df['Value'], order, seasonal_order, start_params=start_params)
+    forecast_df = _forecast_frame(model_fit, forecast_days)
+    if use_cache:
+        FORECAST_CACHE.set(key, (forecast_df.copy(), rmse))
+        FORECAST_CACHE.set(_params_key(key), np.asarray(model_fit.params))
+    return forecast_df, rmse
+
+
+def forc(df, forecast_days=56, order=(1, 1, 1), seasonal_order=(1, 1, 1, 15), evaluate=False, use_cache=True):
+    """
+    Generates a SARIMAX forecast for the next 'forecast_days' days.
+    Forecasts are cached by a hash of the series values, model order, horizon and
+    evaluate, so an unchanged series reuses its fitted forecast. By default only the full-data
+    model is fitted; see forc_with_rmse for the holdout evaluation.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Date' and 'Value' columns.
+        forecast_days (int, optional): Number of days to forecast. Defaults to 56 (8 weeks).
+        order (tuple, optional): SARIMAX (p, d, q) order.
+        seasonal_order (tuple, optional): SARIMAX (P, D, Q, s) seasonal order.
+        evaluate (bool, optional): Also fit the holdout model (warm-starting the full fit).
+        use_cache (bool, optional): Look up / store the result in FORECAST_CACHE.
+
+    Returns:
+        pd.DataFrame: DataFrame with 'Date' and 'Value' columns for the forecast period.
+    """
+    forecast_df, _ = forc_with_rmse(df, forecast_days, order, seasonal_order,
+                                    evaluate=evaluate, use_cache=use_cache)
+    return forecast_df
+
+
+# Parallel forecasting
+FORECAST_WORKERS = int(os.environ.get('FORECAST_WORKERS', os.cpu_count() or 1))
+FORECAST_TIMEOUT = float(os.environ.get('FORECAST_TIMEOUT', 120))  # seconds per series
+
+def _watch_worker(parent_pid, stop):
+    # Pool worker initializer: exit once the pool is closed ('stop' set, even mid-fit) or the
+    # process that started it is gone. Dash kills cancelled background jobs outright, which
+    # would otherwise leave their pool workers running
+    def watch():
+        while os.getppid() == parent_pid and not stop.wait(1):
+            pass
+        os._exit(1)
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def _new_forecast_pool(max_workers):
+    """A (pool, stop event) pair; _close_forecast_pool(pool, stop) tears it down."""
+    context = multiprocessing.get_context()
+    stop = context.Event()
+    pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                               initializer=_watch_worker, initargs=(os.getpid(), stop))
+    return pool, stop
+
+
+def _close_forecast_pool(pool, stop):
+    # shutdown() alone lets fits that already started run to the end; the stop event makes
+    # every worker exit so nothing outlives the batch
+    pool.shutdown(wait=False, cancel_futures=True)
+    stop.set()
+
+
+def _forc_job(df, forecast_days, order, seasonal_order):
+    # Runs in a pool worker: the parent owns the cache, so the fitted parameters are
+    # returned along with the forecast for it to store
+    df = _prepare_series(df)
+    model_fit = _fit_sarimax(df['Value'], order, seasonal_order)
+    return _forecast_frame(model_fit, forecast_days), np.asarray(model_fit.params)
+
+
+def _map_pooled(fn, jobs, max_workers, timeout, on_result, what='Forecast'):
+    """
+    Runs fn(*args) for every {name: args} in jobs, serially in-process or in the forecast pool,
+    and calls on_result(name, result) as each one finishes. result is None for jobs that
+    failed or timed out.
+
+    A future can't be cancelled once its fit runs, so a timeout recycles the pool: the stuck
+    worker is terminated with it, and the jobs that hadn't finished are resubmitted to a fresh
+    pool. (The serial in-process path has no way to stop a fit and ignores timeout.)
+    """
+    if max_workers <= 1 or len(jobs) == 1:
+        for name, args in jobs.items():
+            try:
+                result = fn(*args)
+            except Exception as e:
+                print(f"{what} failed for {name}: {e}")
+                result = None
+            on_result(name, result)
+        return
+
+    def _finish(name, future):
+        result = None
+        try:
+            result = future.result(timeout=0)
+        except Exception as e:
+            print(f"{what} failed for {name}: {e}")
+        del pending[name]
+        on_result(name, result)
+
+    pending = dict(jobs)
+    deadline = time.monotonic() + timeout * -(-len(jobs) // max_workers)
+    while pending:
+        if time.monotonic() >= deadline:
+            # the whole batch is out of time
+            for name in list(pending):
+                print(f"{what} timed out for {name} after {timeout}s")
+                del pending[name]
+                on_result(name, None)
+            return
+        # A pool per batch (and per retry), torn down when it's done: the callers are Dash
+        # background jobs, each its own short-lived process, so there's nothing to reuse it for
+        pool, stop = _new_forecast_pool(max_workers)
+        try:
+            futures = {name: pool.submit(fn, *args) for name, args in pending.items()}
+            for name, future in futures.items():
+                # per-series budget, but never past the deadline for the whole batch
+                wait = max(0.0, min(timeout, deadline - time.monotonic()))
+                try:
+                    future.result(timeout=wait)
+                except FuturesTimeout:
+                    print(f"{what} timed out for {name} after {timeout}s")
+                    del pending[name]
+                    on_result(name, None)
+                    # keep what already finished, the rest goes to the next pool
+                    for other, done in futures.items():
+                        if other in pending and done.done():
+                            _finish(other, done)
+                    break
+                except Exception:
+                    pass  # reported by _finish
+                _finish(name, future)
+        finally:
+            _close_forecast_pool(pool, stop)
+
+
+def _sarimax_key(prepared, forecast_days, order, seasonal_order):
+    # FORECAST_CACHE key of a prepared series' forecast, and the seasonal order it is fitted with
+    seasonal_order = seasonal_order or auto_seasonal_order(prepared)
+    return series_hash(prepared, 'sarimax', order, seasonal_order, forecast_days), seasonal_order
+
+
+def _extended_forecast(df, prepared, appended, forecast_days, order, seasonal_order):
+    """
+    Forecast of a series that grew by appends, from the cached parameters of the most
+    recent earlier version that has them. 'appended' lists the dates where appended
+    rows began, newest first. None if no earlier version has cached parameters.
+
+    The earlier version's model orders are kept, even if the seasonal period detected
+    on the longer series has drifted by a day.
+    """
+    for first_new in appended:
+        parent = _prepare_series(df[pd.to_datetime(df['Date']) < pd.Timestamp(first_new)])
+        if len(parent) == 0:
+            break
+        parent_key, parent_order = _sarimax_key(parent, forecast_days, order, seasonal_order)
+        params = FORECAST_CACHE.get(_params_key(parent_key))
+        if params is not None:
+            try:
+                return _extend_sarimax(prepared, params, forecast_days, order, parent_order), params
+            except Exception as e:
+                print(f"Forecast extension failed, refitting: {e}")
+                return None
+    return None
+
+
+def forecast_many(series_dict, forecast_days=56, order=(1, 1, 1), seasonal_order=(1, 1, 1, 15),
+                  max_workers=None, timeout=None, on_done=None, appended=None):
+    """
+    Forecasts every series in series_dict, fitting uncached series concurrently in a process pool.
+
+    Args:
+        series_dict (dict): {name: DataFrame with 'Date' and 'Value' columns}
+        forecast_days (int, optional): Number of days to forecast.
+        order, seasonal_order (tuple, optional): SARIMAX orders, see forc. seasonal_order=None
+            uses auto_seasonal_order per series.
+        max_workers (int, optional): Pool size. Defaults to FORECAST_WORKERS; 1 fits serially in-process.
+        timeout (float, optional): Seconds to wait for each series. Defaults to FORECAST_TIMEOUT.
+        on_done (callable, optional): Called as on_done(n_done, n_total) after each series finishes.
+        appended (dict, optional): {name: dates where appended rows began, newest first} for
+            series that grew by appends (SeriesStore.appended_since). Their forecast is extended
+            from an earlier version's fitted parameters instead of refitting, when those are cached.
+
+    Returns:
+        dict: {name: forecast DataFrame}, series that failed or timed out are left out.
+    """
+    max_workers = max_workers or FORECAST_WORKERS
+    timeout = timeout or FORECAST_TIMEOUT
+    appended = appended or {}
+    total = len(series_dict)
+    results, pending = {}, {}
+
+    for name, df in series_dict.items():
+        prepared = _prepare_series(df)
+        key, series_order = _sarimax_key(prepared, forecast_days, order, seasonal_order)
+        cached = FORECAST_CACHE.get(key)
+        if cached is not None:
+            results[name] = cached[0].copy()
+            continue
+        extended = _extended_forecast(df, prepared, appended[name], forecast_days, order, seasonal_order) \
+            if appended.get(name) else None
+        if extended is not None:
+            forecast_df, params = extended
+            FORECAST_CACHE.set(key, (forecast_df.copy(), None))
+            FORECAST_CACHE.set(_params_key(key), params)
+            results[name] = forecast_df
+        else:
+            pending[name] = (key, prepared.reset_index(), series_order)
+
+    def _done():
+        if on_done is not None:
+            on_done(total - len(pending), total)
+
+    def _finish(name, result):
+        key = pending.pop(name)[0]
+        if result is not None:
+            forecast_df, params = result
+            FORECAST_CACHE.set(key, (forecast_df.copy(), None))
+            FORECAST_CACHE.set(_params_key(key), params)
+            results[name] = forecast_df
+        _done()
+
+    _done()
+    if pending:
+        jobs = {name: (df, forecast_days, order, series_order) for name, (key, df, series_order) in pending.items()}
+        _map_pooled(_forc_job, jobs, max_workers, timeout, _finish)
+    return results
+
+
+# Rolling-origin backtesting
+def _backtest_origins(n_obs, horizon, n_folds, step, min_train):
+    # Forecast origins (index of the first forecast day), oldest first, the last one
+    # leaving exactly 'horizon' days to score
+    origins = [n_obs - horizon - k * step for k in range(n_folds)]
+    return [o for o in reversed(origins) if o >= min_train]
+
+
+def _error_table(actuals, preds):
+    # Per-horizon error table from (folds, horizon) arrays of actual and forecast values
+    errors = actuals - preds
+    horizon = actuals.shape[1]
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN horizons (gaps in the data)
+        ape = np.where(actuals != 0, np.abs(errors / actuals), np.nan)
+        return pd.DataFrame({
+            'Horizon': np.arange(1, horizon + 1),
+            'RMSE': np.sqrt(np.nanmean(errors ** 2, axis=0)),
+            'MAE': np.nanmean(np.abs(errors), axis=0),
+            'MAPE': 100 * np.nanmean(ape, axis=0),
+            'Folds': np.sum(~np.isnan(errors), axis=0),
+        })
+
+
+def backtest(df, horizon=28, n_folds=4, step=7, order=(1, 1, 1), seasonal_order=None, use_cache=True):
+    """
+    Rolling-origin backtest of the SARIMAX forecast without refitting per fold.
+
+    The model is fitted once on the data before the first (oldest) origin. Its parameters
+    are then applied to the full series with a single Kalman filter pass and every origin
+    is scored with a dynamic prediction, i.e. a 'horizon' day forecast that only uses the
+    observations before that origin. Only the parameters are shared across folds, so one
+    fit replaces n_folds refits.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Date' and 'Value' columns.
+        horizon (int, optional): Days forecast from each origin. Defaults to 28.
+        n_folds (int, optional): Number of forecast origins. Defaults to 4.
+        step (int, optional): Days between consecutive origins. Defaults to 7.
+        order, seasonal_order (tuple, optional): SARIMAX orders, see forc. seasonal_order=None
+            uses auto_seasonal_order of the whole series, the model the SARIMAX engine plots.
+        use_cache (bool, optional): Look up / store the result in FORECAST_CACHE.
+
+    Returns:
+        tuple: (DataFrame with 'Horizon', 'RMSE', 'MAE', 'MAPE' (in %) and 'Folds' columns,
+                one row per forecast day; error message). One of the two is None.
+    """
+    df = _prepare_series(df)
+    seasonal_order = seasonal_order or auto_seasonal_order(df)
+    key = series_hash(df, 'backtest', order, seasonal_order, horizon, n_folds, step)
+    cached = FORECAST_CACHE.get(key) if use_cache else None
+    if cached is not None:
+        return cached.copy(), None
+
+    # enough history for the first fit to see a few seasonal cycles
+    min_train = max(2 * seasonal_order[3] + order[1] + seasonal_order[1], 30)
+    origins = _backtest_origins(len(df), horizon, n_folds, step, min_train)
+    if not origins:
+        return None, f"Need at least {min_train + horizon} days of data for a {horizon} day backtest."
+
+    endog = df['Value']
+    model_fit = _fit_sarimax(endog.iloc[:origins[0]], order, seasonal_order)
+    # same parameters, filtered over the whole series - no refit
+    full_fit = model_fit.apply(endog, refit=False)
+
+    actual = endog.to_numpy(dtype=float)
+    preds = np.empty((len(origins), horizon))
+    actuals = np.empty((len(origins), horizon))
+    for i, origin in enumerate(origins):
+        preds[i] = np.asarray(full_fit.predict(start=origin, end=origin + horizon - 1, dynamic=True), dtype=float)
+        actuals[i] = actual[origin:origin + horizon]
+
+    result = _error_table(actuals, preds)
+    if use_cache:
+        FORECAST_CACHE.set(key, result.copy())
+    return result, None
+
+
+def _backtest_job(df, horizon, n_folds, step, order, seasonal_order):
+    # Runs in a pool worker: the parent owns the cache, so skip it here
+    return backtest(df, horizon, n_folds, step, order, seasonal_order, use_cache=False)
+
+
+def backtest_many(series_dict, horizon=28, n_folds=4, step=7, order=(1, 1, 1), seasonal_order=None,
+                  max_workers=None, timeout=None, on_done=None):
+    """
+    Backtests every series in series_dict (see backtest), running uncached series
+    concurrently in the forecast process pool.
+
+    Returns:
+        tuple: ({name: per-horizon error DataFrame}, {name: error message}) - series that
+               failed or timed out are in neither.
+    """
+    max_workers = max_workers or FORECAST_WORKERS
+    timeout = timeout or FORECAST_TIMEOUT
+    total = len(series_dict)
+    results, errors, pending = {}, {}, {}
+
+    for name, df in series_dict.items():
+        prepared = _prepare_series(df)
+        series_order = seasonal_order or auto_seasonal_order(prepared)
+        key = series_hash(prepared, 'backtest', order, series_order, horizon, n_folds, step)
+        cached = FORECAST_CACHE.get(key)
+        if cached is not None:
+            results[name] = cached.copy()
+        else:
+            pending[name] = (key, prepared.reset_index(), series_order)
+
+    def _done():
+        if on_done is not None:
+            on_done(total - len(pending), total)
+
+    def _finish(name, result):
+        key = pending.pop(name)[0]
+        if result is not None:
+            table, msg = result
+            if table is not None:
+                FORECAST_CACHE.set(key, table.copy())
+                results[name] = table
+            else:
+                errors[name] = msg
+        _done()
+
+    _done()
+    if pending:
+        jobs = {name: (df, horizon, n_folds, step, order, series_order)
+                for name, (key, df, series_order) in pending.items()}
+        _map_pooled(_backtest_job, jobs, max_workers, timeout, _finish, what='Backtest')
+    return results, errors
+
+
+def summarize_backtest(tables, period=7):
+    """
+    Combines per-horizon backtest tables into one table with a row per series and
+    'period' day horizon bucket (e.g. days 1-7, 8-14, ...), for display.
+
+    Args:
+        tables (dict): {name: DataFrame from backtest}
+        period (int, optional): Bucket size in days. Defaults to 7.
+
+    Returns:
+        pd.DataFrame: 'Timeseries', 'Horizon' (e.g. 'Days 1-7'), 'RMSE', 'MAE', 'MAPE (%)'
+    """
+    rows = []
+    for name, table in tables.items():
+        bucket = (table['Horizon'] - 1) // period
+        # RMSE over a bucket: root of the fold-weighted mean squared error
+        weights = table['Folds'].where(table['Folds'] > 0)
+        grouped = pd.DataFrame({
+            'sq': table['RMSE'] ** 2 * weights,
+            'ae': table['MAE'] * weights,
+            'ape': table['MAPE'] * weights,
+            'w': weights,
+            'first': table['Horizon'],
+            'last': table['Horizon'],
+        }).groupby(bucket).agg({'sq': 'sum', 'ae': 'sum', 'ape': 'sum', 'w': 'sum', 'first': 'min', 'last': 'max'})
+        rows.append(pd.DataFrame({
+            'Timeseries': name,
+            'Horizon': 'Days ' + grouped['first'].astype(str) + '-' + grouped['last'].astype(str),
+            'RMSE': np.sqrt(grouped['sq'] / grouped['w']),
+            'MAE': grouped['ae'] / grouped['w'],
+            'MAPE (%)': grouped['ape'] / grouped['w'],
+        }))
+    if not rows:
+        return pd.DataFrame(columns=['Timeseries', 'Horizon', 'RMSE', 'MAE', 'MAPE (%)'])
+    return pd.concat(rows, ignore_index=True)
+
+
+# Seasonality detection
+def detect_seasonal_period(values, max_period=60, min_acf=0.3):
+    """
+    Seasonal period of each row of 'values' from the autocorrelation of the linearly
+    detrended row (computed with an FFT, all rows at once).
+
+    Candidates are the local maxima of the autocorrelation between lags 2 and max_period
+    (at most a third of the row's observations) that reach min_acf, after the autocorrelation
+    has first dropped below zero. The shortest candidate
+    within 90% of the strongest one wins, so multiples of the period are not picked.
+
+    Args:
+        values (np.ndarray): (N, L) array, rows NaN-padded to a common length, or a 1-D array.
+        max_period (int, optional): Longest period considered. Defaults to 60 days.
+        min_acf (float, optional): Minimum autocorrelation for a period to count.
+
+    Returns:
+        np.ndarray: (N,) int array of periods, 1 for rows without seasonality (a 1-D input gives an int).
+    """
+    values = np.asarray(values, dtype=float)
+    single = values.ndim == 1
+    values = np.atleast_2d(values)
+    n_rows, n = values.shape
+    periods = np.ones(n_rows, dtype=int)
+    top = min(max_period, n - 2)
+    if top < 2:
+        return int(periods[0]) if single else periods
+
+    # least-squares line per row, over its observed values only
+    valid = ~np.isnan(values)
+    n_valid = valid.sum(axis=1)
+    t = np.where(valid, np.arange(n)[None, :], 0.0)
+    y = np.where(valid, values, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_mean = t.sum(axis=1, keepdims=True) / n_valid[:, None]
+        y_mean = y.sum(axis=1, keepdims=True) / n_valid[:, None]
+        t_c = np.where(valid, t - t_mean, 0.0)
+        slope = (t_c * (y - y_mean)).sum(axis=1, keepdims=True) / (t_c * t_c).sum(axis=1, keepdims=True)
+    residual = np.nan_to_num(np.where(valid, y - y_mean - slope * t_c, 0.0))
+
+    nfft = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(residual, nfft, axis=1)
+    acf = np.fft.irfft(spectrum * np.conj(spectrum), nfft, axis=1)[:, :n]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acf = np.nan_to_num(acf / acf[:, :1])
+
+    lags = np.arange(2, top + 1)
+    peak = acf[:, lags]
+    is_peak = (peak > acf[:, lags - 1]) & (peak >= acf[:, lags + 1]) & (peak >= min_acf)
+    is_peak &= lags[None, :] <= (n_valid[:, None] // 3)  # at least three cycles observed
+    is_peak &= np.minimum.accumulate(acf, axis=1)[:, lags] < 0  # past the main lobe around lag 0
+    scores = np.where(is_peak, peak, -np.inf)
+    strongest = scores.max(axis=1, keepdims=True)
+    near_best = is_peak & (scores >= 0.9 * strongest)
+    found = near_best.any(axis=1)
+    periods[found] = lags[near_best[found].argmax(axis=1)]
+    return int(periods[0]) if single else periods
+
+
+def auto_seasonal_order(df, max_period=60):
+    """SARIMAX seasonal order (1, 1, 1, s) for the detected period of a prepared series, (0, 0, 0, 0) if none."""
+    period = detect_seasonal_period(df['Value'].to_numpy(dtype=float), max_period=max_period)
+    return (1, 1, 1, period) if period > 1 else (0, 0, 0, 0)
+
+
+# Vectorized Holt-Winters (additive trend and season)
+ETS_ALPHAS = (0.05, 0.1, 0.2, 0.4, 0.7)
+ETS_BETAS = (0.0, 0.02, 0.1, 0.3)
+ETS_GAMMAS = (0.0, 0.05, 0.15, 0.3, 0.5)
+
+
+def _stack_series(arrays):
+    # Left-aligned (N, L) array, rows padded with NaN after their own last observation
+    lengths = np.array([len(a) for a in arrays])
+    stacked = np.full((len(arrays), lengths.max()), np.nan)
+    for i, a in enumerate(arrays):
+        stacked[i, :len(a)] = a
+    return stacked, lengths
+
+
+def holt_winters_batch(values, lengths, periods, forecast_days):
+    """
+    Fits additive Holt-Winters models to every row of 'values' at once and forecasts
+    'forecast_days' steps past the end of each row.
+
+    The smoothing parameters are grid-searched (ETS_ALPHAS x ETS_BETAS x ETS_GAMMAS) per row:
+    all rows and parameter combinations are filtered together, one time step per iteration,
+    and each row keeps the combination with the lowest one-step-ahead squared error.
+    Missing days inside a row are filled with the model's own prediction.
+
+    Args:
+        values (np.ndarray): (N, L) array, row i holding lengths[i] observations then NaN padding.
+        lengths (np.ndarray): (N,) number of observations per row.
+        periods (np.ndarray): (N,) seasonal period per row, 1 for none.
+        forecast_days (int): Steps to forecast.
+
+    Returns:
+        np.ndarray: (N, forecast_days) forecasts.
+    """
+    n_rows, n_cols = values.shape
+    periods = np.maximum(np.asarray(periods, dtype=int), 1)
+    rows = np.arange(n_rows)
+    grid = np.array([(a, b, g) for a in ETS_ALPHAS for b in ETS_BETAS for g in ETS_GAMMAS])
+    alpha, beta = grid[:, 0][None, :], grid[:, 1][None, :]
+    # rows without a season keep their (zero) seasonal state
+    gamma = np.where(periods[:, None] > 1, grid[:, 2][None, :], 0.0)
+
+    # Initial state from the first two seasons (or first 10 days) of each row
+    level0, trend0 = np.empty(n_rows), np.empty(n_rows)
+    season0 = np.zeros((n_rows, periods.max()))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN windows
+        for i in range(n_rows):
+            m, y = periods[i], values[i, :lengths[i]]
+            if m > 1 and lengths[i] >= 2 * m:
+                first, second = np.nanmean(y[:m]), np.nanmean(y[m:2 * m])
+                trend0[i] = (second - first) / m
+                level0[i] = first
+                season0[i, :m] = np.nan_to_num(y[:m] - (first + trend0[i] * (np.arange(m) - (m - 1) / 2)))
+                season0[i, :m] -= season0[i, :m].mean()
+            else:
+                level0[i] = np.nanmean(y[:m])
+                trend0[i] = np.nanmean(np.diff(y[:10])) if lengths[i] > 1 else 0.0
+    level0, trend0 = np.nan_to_num(level0), np.nan_to_num(trend0)
+    n_grid = grid.shape[0]
+    # level/trend before the first observation (the means above sit mid-season)
+    level = np.repeat((level0 - trend0 * ((periods - 1) / 2 + 1))[:, None], n_grid, axis=1)
+    trend = np.repeat(trend0[:, None], n_grid, axis=1)
+    season = np.repeat(season0[:, None, :], n_grid, axis=1)  # (N, G, max period)
+    sse = np.zeros((n_rows, n_grid))
+    warmup = np.where(periods > 1, 2 * periods, 2)
+
+    for t in range(n_cols):
+        slot = t % periods
+        s_cur = season[rows, :, slot]
+        pred = level + trend + s_cur
+        y = values[:, t][:, None]
+        active = (t < lengths)[:, None]
+        observed = ~np.isnan(y)
+        err = np.where(observed & (t >= warmup)[:, None], y - pred, 0.0)
+        sse += err * err
+        y_eff = np.where(observed, y, pred)
+        new_level = alpha * (y_eff - s_cur) + (1 - alpha) * (level + trend)
+        trend = np.where(active, beta * (new_level - level) + (1 - beta) * trend, trend)
+        season[rows, :, slot] = np.where(active, gamma * (y_eff - new_level) + (1 - gamma) * s_cur, s_cur)
+        level = np.where(active, new_level, level)
+
+    best = sse.argmin(axis=1)
+    level, trend = level[rows, best], trend[rows, best]
+    season = season[rows, best]  # (N, max period)
+    steps = np.arange(1, forecast_days + 1)
+    slots = (lengths[:, None] + steps[None, :] - 1) % periods[:, None]
+    return level[:, None] + steps[None, :] * trend[:, None] + season[rows[:, None], slots]
+
+
+def forecast_ets_many(series_dict, forecast_days=56, max_period=60, on_done=None):
+    """
+    Holt-Winters forecasts for every series in series_dict, fitted together as one 2-D
+    array (see holt_winters_batch) with a per-series seasonal period from detect_seasonal_period.
+    Forecasts are cached by series content like the SARIMAX ones.
+
+    Returns:
+        dict: {name: forecast DataFrame with 'Date' and 'Value' columns}
+    """
+    total = len(series_dict)
+    results, pending = {}, {}
+    for name, df in series_dict.items():
+        prepared = _prepare_series(df)
+        key = series_hash(prepared, 'ets', ETS_ALPHAS, ETS_BETAS, ETS_GAMMAS, max_period, forecast_days)
+        cached = FORECAST_CACHE.get(key)
+        if cached is not None:
+            results[name] = cached[0].copy()
+        elif len(prepared):
+            pending[name] = (key, prepared)
+    if on_done is not None:
+        on_done(len(results), total)
+    if not pending:
+        return results
+
+    start = time.perf_counter()
+    values, lengths = _stack_series([prepared['Value'].to_numpy(dtype=float) for _, prepared in pending.values()])
+    periods = detect_seasonal_period(values, max_period=max_period)
+    forecasts = holt_winters_batch(values, lengths, periods, forecast_days)
+    seconds = time.perf_counter() - start
+    _observe_fit('ets', seconds)
+    _record_fit_rate('ets', seconds, int(lengths.sum()))
+
+    for (name, (key, prepared)), forecast in zip(pending.items(), forecasts):
+        dates = pd.date_range(prepared.index[-1] + pd.Timedelta(days=1), periods=forecast_days, freq='D')
+        forecast_df = pd.DataFrame({'Date': dates, 'Value': forecast})
+        FORECAST_CACHE.set(key, (forecast_df.copy(), None))
+        results[name] = forecast_df
+    if on_done is not None:
+        on_done(total, total)
+    return results
+
+
+def backtest_ets_many(series_dict, horizon=28, n_folds=4, step=7, max_period=60, on_done=None):
+    """
+    Rolling-origin backtest of the Holt-Winters forecasts of forecast_ets_many. The seasonal
+    period is detected on the whole series, as for the plotted forecast; every fold is then a
+    fresh fit on the data before its origin, all folds of all series in one holt_winters_batch.
+
+    Returns:
+        tuple: ({name: per-horizon error DataFrame, see backtest}, {name: error message})
+    """
+    total = len(series_dict)
+    results, errors, pending = {}, {}, {}
+    for name, df in series_dict.items():
+        prepared = _prepare_series(df)
+        key = series_hash(prepared, 'backtest-ets', ETS_ALPHAS, ETS_BETAS, ETS_GAMMAS, max_period,
+                          horizon, n_folds, step)
+        cached = FORECAST_CACHE.get(key)
+        if cached is not None:
+            results[name] = cached.copy()
+            continue
+        values = prepared['Value'].to_numpy(dtype=float)
+        period = detect_seasonal_period(values, max_period=max_period)
+        # enough history to initialise the season from two full cycles
+        min_train = max(2 * period, 30)
+        origins = _backtest_origins(len(values), horizon, n_folds, step, min_train)
+        if origins:
+            pending[name] = (key, values, period, origins)
+        else:
+            errors[name] = f"Need at least {min_train + horizon} days of data for a {horizon} day backtest."
+    if on_done is not None:
+        on_done(total - len(pending), total)
+    if not pending:
+        return results, errors
+
+    # one row per (series, fold): the series up to that fold's origin
+    rows = [(values[:origin], period) for _, values, period, origins in pending.values() for origin in origins]
+    stacked, lengths = _stack_series([row for row, _ in rows])
+    preds = holt_winters_batch(stacked, lengths, np.array([period for _, period in rows]), horizon)
+    i = 0
+    for name, (key, values, _, origins) in pending.items():
+        actuals = np.array([values[origin:origin + horizon] for origin in origins])
+        table = _error_table(actuals, preds[i:i + len(origins)])
+        i += len(origins)
+        FORECAST_CACHE.set(key, table.copy())
+        results[name] = table
+    if on_done is not None:
+        on_done(total, total)
+    return results, errors
+
+
+# Forecast engines
+FORECAST_LATENCY_BUDGET = float(os.environ.get('FORECAST_LATENCY_BUDGET', 10))  # seconds, for engine='auto'
+
+
+class ForecastEngine(abc.ABC):
+    """
+    A forecast backend: forecasts a whole {name: DataFrame} dict in one call.
+    Register new backends with register_forecast_engine.
+    """
+    name = None
+    label = None
+
+    @abc.abstractmethod
+    def forecast_many(self, series_dict, forecast_days=56, on_done=None, appended=None):
+        """
+        Returns {name: forecast DataFrame with 'Date' and 'Value' columns}. 'appended' is
+        {name: dates where appended rows began, newest first}, for engines that can extend
+        an earlier forecast instead of refitting.
+        """
+
+    @abc.abstractmethod
+    def backtest_many(self, series_dict, horizon=28, n_folds=4, step=7, on_done=None):
+        """
+        Rolling-origin backtest of the forecasts forecast_many plots, see backtest. Returns
+        ({name: per-horizon error DataFrame}, {name: error message}).
+        """
+
+    def estimate_seconds(self, series_dict, forecast_days=56):
+        """Rough wall time of forecast_many for series_dict, from the measured fit rate."""
+        n_obs = sum(len(df) for df in series_dict.values())
+        return n_obs * fit_rate(self.name)
+
+
+class SarimaxEngine(ForecastEngine):
+    """SARIMAX per series in the forecast process pool, seasonal period detected per series."""
+    name = 'sarimax'
+    label = 'SARIMAX'
+
+    def forecast_many(self, series_dict, forecast_days=56, on_done=None, appended=None):
+        return forecast_many(series_dict, forecast_days, seasonal_order=None, on_done=on_done, appended=appended)
+
+    def backtest_many(self, series_dict, horizon=28, n_folds=4, step=7, on_done=None):
+        return backtest_many(series_dict, horizon, n_folds, step, seasonal_order=None, on_done=on_done)
+
+    def estimate_seconds(self, series_dict, forecast_days=56):
+        # only uncached series are fitted, FORECAST_WORKERS at a time
+        lengths = []
+        for df in series_dict.values():
+            prepared = _prepare_series(df)
+            key, _ = _sarimax_key(prepared, forecast_days, (1, 1, 1), None)
+            if FORECAST_CACHE.get(key) is None:
+                lengths.append(len(prepared))
+        workers = max(1, min(FORECAST_WORKERS, len(lengths)))
+        return sum(lengths) * fit_rate(self.name) / workers
+
+
+class EtsEngine(ForecastEngine):
+    """Holt-Winters exponential smoothing, all series fitted at once (forecast_ets_many)."""
+    name = 'ets'
+    label = 'Exponential smoothing'
+
+    def forecast_many(self, series_dict, forecast_days=56, on_done=None, appended=None):
+        # refitting the whole batch is cheap, appends are simply refitted
+        return forecast_ets_many(series_dict, forecast_days, on_done=on_done)
+
+    def backtest_many(self, series_dict, horizon=28, n_folds=4, step=7, on_done=None):
+        return backtest_ets_many(series_dict, horizon, n_folds, step, on_done=on_done)
+
+
+FORECAST_ENGINES = {}
+
+
+def register_forecast_engine(engine):
+    FORECAST_ENGINES[engine.name] = engine
+    return engine
+
+
+register_forecast_engine(SarimaxEngine())
+register_forecast_engine(EtsEngine())
+
+
+def select_forecast_engine(name, series_dict=None, budget=None, forecast_days=56):
+    """
+    Returns the ForecastEngine called 'name'. For 'auto', the most accurate engine
+    (SARIMAX) is used if its estimated time for series_dict fits in the latency budget
+    (FORECAST_LATENCY_BUDGET seconds by default), exponential smoothing otherwise.
+    """
+    if name != 'auto':
+        return FORECAST_ENGINES[name]
+    budget = FORECAST_LATENCY_BUDGET if budget is None else budget
+    sarimax = FORECAST_ENGINES['sarimax']
+    if series_dict is None or sarimax.estimate_seconds(series_dict, forecast_days) <= budget:
+        return sarimax
+    return FORECAST_ENGINES['ets']